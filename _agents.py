@@ -1,10 +1,29 @@
 import asyncio
 import random
-from typing import Awaitable, Callable, List
-from uuid import uuid4
+from typing import Any, Awaitable, Callable, List, Sequence
 
-from _types import GroupChatMessage, MessageChunk, RequestToSpeak, UIAgentConfig
-from autogen_core import DefaultTopicId, MessageContext, RoutedAgent, message_handler
+from _context import ContextWindow
+from _gc_tuning import after_turn
+from _readiness import agent_ready
+from _sessions import session_activity
+from _speaker_selection import FINISH, SpeakerSelector, parse_selection
+from _startup import mark_startup
+from _state_extraction import StateExtractor
+from _state_report import StateReporter
+from _telemetry import annotate_span, receive_span, record_publish, span, trace_carrier, turn_span
+from _ui_stream import TimeToFirstToken, UIChunkPublisher, conversation_topic_id
+from _transcript import ParticipantCatalog, RollingTranscript, format_transcript_line
+from _types import (
+    ContextPolicyConfig,
+    GroupChatMessage,
+    MessageChunk,
+    ReadinessProbe,
+    RequestToSpeak,
+    SpeakerSelectionConfig,
+    StateReportConfig,
+    UIAgentConfig,
+)
+from autogen_core import AgentRuntime, MessageContext, RoutedAgent, message_handler
 from autogen_core.models import (
     AssistantMessage,
     ChatCompletionClient,
@@ -12,10 +31,9 @@ from autogen_core.models import (
     SystemMessage,
     UserMessage,
 )
-from autogen_ext.runtimes.grpc import GrpcWorkerAgentRuntime
 from rich.console import Console
 from rich.markdown import Markdown
-from agent_timeslices import track_time_and_memory
+from agent_timeslices import annotate_metric, track_time_and_memory
 
 
 class BaseGroupChatAgent(RoutedAgent):
@@ -28,60 +46,149 @@ class BaseGroupChatAgent(RoutedAgent):
         model_client: ChatCompletionClient,
         system_message: str,
         ui_config: UIAgentConfig,
+        context_policy: ContextPolicyConfig | None = None,
+        state_report: StateReportConfig | None = None,
+        stream_from_model: bool = False,
+        state_store: Any = None,
     ) -> None:
         super().__init__(description=description)
         self._group_chat_topic_type = group_chat_topic_type
         self._model_client = model_client
         self._system_message = SystemMessage(content=system_message)
-        self._chat_history: List[LLMMessage] = []
+        self._chat_history = ContextWindow(self._system_message, context_policy, summarizer=self._summarize)
         self._ui_config = ui_config
+        self._stream_from_model = stream_from_model
         self.console = Console()
-        self._state_report_message = SystemMessage(content=""" Please provide updates to the state based on your last message and the previous state, if any. Use the following JSON format, replacing the 'type' values with the actual values. 
-        {
-            "writer_topic": str,
-            "writer_total_lines_written": int,
-            "editor_feedback_addressed": boolean,
-            "editor_num_lines_edited": int,
-        }
-        """)
-        self._state_history: List[LLMMessage] = []
+        state_report = state_report or StateReportConfig()
+        self._state_reporter = StateReporter(
+            model_client,
+            label=self.id.type,
+            mode=state_report.mode,
+            max_concurrency=state_report.max_concurrency,
+            extractor=(
+                StateExtractor(model_client, agent_type=self.id.type, state_store=state_store)
+                if state_report.extraction == "hybrid"
+                else None
+            ),
+        )
 
     @message_handler
     async def handle_message(self, message: GroupChatMessage, ctx: MessageContext) -> None:
-        self._chat_history.extend(
-            [
-                UserMessage(content=f"Transferred to {message.body.source}", source="system"),  # type: ignore[union-attr]
-                message.body,
-            ]
-        )
+        with session_activity(self.id), receive_span(
+            "agent.receive", message.trace_context, "GroupChatMessage", agent=self.id.type, session=self.id.key
+        ):
+            self._chat_history.extend(
+                [
+                    UserMessage(content=f"Transferred to {message.body.source}", source="system"),  # type: ignore[union-attr]
+                    message.body,
+                ]
+            )
 
     @message_handler
     @track_time_and_memory(get_label=lambda self: self.id.type)
     async def handle_request_to_speak(self, message: RequestToSpeak, ctx: MessageContext) -> None:
+        with session_activity(self.id), receive_span(
+            "agent.request_to_speak", message.trace_context, "RequestToSpeak", agent=self.id.type, session=self.id.key
+        ):
+            await self._speak()
+        after_turn()
+
+    @message_handler
+    async def handle_readiness_probe(self, message: ReadinessProbe, ctx: MessageContext) -> ReadinessProbe:
+        return ReadinessProbe(ready=agent_ready(self.id.type))
+
+    async def close(self) -> None:
+        """Called when the session is evicted; lets its pending state reports and summary refresh finish."""
+        await self._state_reporter.drain()
+        await self._chat_history.aclose()
+
+    async def _speak(self) -> None:
+        """Generates the reply, publishes it and reports the new state."""
         self._chat_history.append(
             UserMessage(content=f"Transferred to {self.id.type}, adopt the persona immediately.", source="system")
         )
-        completion = await self._model_client.create([self._system_message] + self._chat_history)
-        assert isinstance(completion.content, str)
-        new_message = AssistantMessage(content=completion.content, source=self.id.type)
+        annotate_metric(
+            session=self.id.key,
+            context_mode=self._chat_history.mode,
+            prompt_tokens=self._chat_history.prompt_tokens,
+            context_tokens_saved=self._chat_history.tokens_saved,
+        )
+        with span("llm.reply", streaming=self._stream_from_model):
+            if self._stream_from_model:
+                content = await self._stream_reply_to_ui()
+            else:
+                completion = await self._model_client.create(self._chat_history.prompt())
+                assert isinstance(completion.content, str)
+                content = completion.content
+        new_message = AssistantMessage(content=content, source=self.id.type)
         self._chat_history.append(new_message)
 
-        state = await self._model_client.create(
-            [self._state_report_message] + self._state_history + [new_message]
-        )
-        new_state = AssistantMessage(content=state.content, source=self.id.type)
-        self._state_history.append(new_state)
+        if self._state_reporter.mode == "inline":
+            await self._state_reporter.submit(new_message)
 
-        console_message = f"\n{'-'*80}\n**{self.id.type}**: {completion.content}"
+        console_message = f"\n{'-'*80}\n**{self.id.type}**: {content}"
         self.console.print(Markdown(console_message))
 
-        await publish_message_to_ui_and_backend(
-            runtime=self,
-            source=self.id.type,
-            user_message=completion.content,
-            ui_config=self._ui_config,
-            group_chat_topic_type=self._group_chat_topic_type,
+        if self._stream_from_model:
+            # The UI already received the reply while it was generated.
+            await publish_message_to_backend(
+                runtime=self,
+                source=self.id.type,
+                user_message=content,
+                group_chat_topic_type=self._group_chat_topic_type,
+            )
+        else:
+            await publish_message_to_ui_and_backend(
+                runtime=self,
+                source=self.id.type,
+                user_message=content,
+                ui_config=self._ui_config,
+                group_chat_topic_type=self._group_chat_topic_type,
+            )
+
+        # In background mode the report runs off the reply path, after the reply is out.
+        if self._state_reporter.mode == "background":
+            await self._state_reporter.submit(new_message)
+
+    async def _stream_reply_to_ui(self) -> str:
+        """Generates the reply with the streaming API, forwarding coalesced deltas to the UI."""
+        publisher = UIChunkPublisher(runtime=self, source=self.id.type, ui_config=self._ui_config)
+        ttft = TimeToFirstToken()
+        content: str | None = None
+        try:
+            async for item in self._model_client.create_stream(self._chat_history.prompt()):
+                if isinstance(item, str):
+                    ttft.mark()
+                    await publisher.write(item)
+                else:
+                    assert isinstance(item.content, str)
+                    content = item.content
+        finally:
+            # Sends the finished frame and stops the sender task and flush timer even if the stream failed.
+            await publisher.close()
+        annotate_metric(
+            ttft_sec=ttft.seconds,
+            ui_frames=publisher.frames_published,
+            ui_frames_merged=publisher.frames_merged,
         )
+        assert content is not None
+        return content
+
+    @track_time_and_memory(get_label=lambda self: self.id.type)
+    async def _summarize(self, previous_summary: str, messages: Sequence[LLMMessage]) -> str:
+        lines = [line for line in map(format_transcript_line, messages) if line is not None]
+        transcript = "\n".join(lines)
+        prompt = f"""Update the summary of a group chat with the new messages below. Keep names, decisions and open feedback. Reply with the summary only.
+
+Current summary: {previous_summary or "(none)"}
+
+New messages:
+{transcript}
+"""
+        with span("llm.summary"):
+            completion = await self._model_client.create([SystemMessage(content=prompt)])
+        assert isinstance(completion.content, str)
+        return completion.content
 
 
 class GroupChatManager(RoutedAgent):
@@ -92,67 +199,61 @@ class GroupChatManager(RoutedAgent):
         participant_descriptions: List[str],
         ui_config: UIAgentConfig,
         max_rounds: int = 3,
+        transcript_max_chars: int | None = None,
+        transcript_max_tokens: int | None = None,
+        speaker_selection: SpeakerSelectionConfig | None = None,
     ) -> None:
         super().__init__("Group chat manager")
         self._model_client = model_client
-        self._num_rounds = 0
         self._participant_topic_types = participant_topic_types
-        self._chat_history: List[GroupChatMessage] = []
         self._max_rounds = max_rounds
         self.console = Console()
         self._participant_descriptions = participant_descriptions
-        self._previous_participant_topic_type: str | None = None
+        speaker_selection = speaker_selection or SpeakerSelectionConfig()
+        self._selector = SpeakerSelector(
+            participant_topic_types, speaker_selection.mode, max_rounds, speaker_selection.transitions
+        )
         self._ui_config = ui_config
+        self._transcript = RollingTranscript(max_chars=transcript_max_chars, max_tokens=transcript_max_tokens)
+        self._participant_catalog = ParticipantCatalog(participant_topic_types, participant_descriptions)
+        self._selector_message = SystemMessage(
+            content=f"""You are in a role play game. The following roles are available:
+{self._participant_catalog.roles}.
+Read the conversation you are given. Then select the next role to play. Only return the role. If you think it's enough talking (for example they have talked for {max_rounds} rounds), return 'FINISH'.
+"""
+        )
 
     @message_handler
     @track_time_and_memory(get_label=lambda self: self.id.type)
     async def handle_message(self, message: GroupChatMessage, ctx: MessageContext) -> None:
         assert isinstance(message.body, UserMessage)
 
-        self._chat_history.append(message.body)  # type: ignore[reportargumenttype,arg-type]
-
-        # Format message history.
-        messages: List[str] = []
-        for msg in self._chat_history:
-            if isinstance(msg.content, str):  # type: ignore[attr-defined]
-                messages.append(f"{msg.source}: {msg.content}")  # type: ignore[attr-defined]
-            elif isinstance(msg.content, list):  # type: ignore[attr-defined]
-                messages.append(f"{msg.source}: {', '.join(msg.content)}")  # type: ignore[attr-defined,reportUnknownArgumentType]
-        history = "\n".join(messages)
-        # Format roles.
-        roles = "\n".join(
-            [
-                f"{topic_type}: {description}".strip()
-                for topic_type, description in zip(
-                    self._participant_topic_types, self._participant_descriptions, strict=True
-                )
-                if topic_type != self._previous_participant_topic_type
-            ]
-        )
-        participants = str(
-            [
-                topic_type
-                for topic_type in self._participant_topic_types
-                if topic_type != self._previous_participant_topic_type
-            ]
-        )
-
-        selector_prompt = f"""You are in a role play game. The following roles are available:
-{roles}.
-Read the following conversation. Then select the next role from {participants} to play. Only return the role.
+        annotate_metric(session=self.id.key)
+        with session_activity(self.id):
+            # Receiving the reply ends the previous turn's trace; selecting the next speaker starts a new one.
+            with receive_span(
+                "manager.receive", message.trace_context, "GroupChatMessage", source=message.body.source, session=self.id.key
+            ):
+                # Only the new message is formatted; earlier lines are already in the transcript.
+                self._transcript.append(message.body)
+            with turn_span("chat.turn", previous_speaker=message.body.source, session=self.id.key):
+                await self._select_next_speaker(ctx)
+        after_turn()
 
-{history}
+    async def _select_next_speaker(self, ctx: MessageContext) -> None:
+        selection = self._selector.decide()
+        llm_calls = 0
+        if selection is None:
+            candidates = self._selector.candidates()
+            answer = await self._ask_selector(candidates, ctx)
+            llm_calls = 1
+            selection = parse_selection(answer, candidates)
+            if selection is None:
+                selection = self._selector.least_recently_heard(candidates)
+                self.console.print(f"Selector answer {answer!r} names no candidate; asking `{selection}`.")
+        annotate_metric(selector_mode=self._selector.mode, selector_llm_calls=llm_calls)
 
-Read the above conversation. Then select the next role from {participants} to play. if you think it's enough talking (for example they have talked for {self._max_rounds} rounds), return 'FINISH'.
-"""
-        system_message = SystemMessage(content=selector_prompt)
-        completion = await self._model_client.create([system_message], cancellation_token=ctx.cancellation_token)
-
-        assert isinstance(
-            completion.content, str
-        ), f"Completion content must be a string, but is: {type(completion.content)}"
-
-        if completion.content.upper() == "FINISH":
+        if selection == FINISH:
             finish_msg = "I think it's enough iterations on the story! Thanks for collaborating!"
             manager_message = f"\n{'-'*80}\n Manager ({id(self)}): {finish_msg}"
             await publish_message_to_ui(
@@ -161,17 +262,29 @@ Read the above conversation. Then select the next role from {participants} to pl
             self.console.print(Markdown(manager_message))
             return
 
-        selected_topic_type: str
-        for topic_type in self._participant_topic_types:
-            if topic_type.lower() in completion.content.lower():
-                selected_topic_type = topic_type
-                self._previous_participant_topic_type = selected_topic_type
-                self.console.print(
-                    Markdown(f"\n{'-'*80}\n Manager ({id(self)}): Asking `{selected_topic_type}` to speak")
-                )
-                await self.publish_message(RequestToSpeak(), DefaultTopicId(type=selected_topic_type))
-                return
-        raise ValueError(f"Invalid role selected: {completion.content}")
+        self._selector.record(selection)
+        self.console.print(Markdown(f"\n{'-'*80}\n Manager ({id(self)}): Asking `{selection}` to speak"))
+        annotate_span(next_speaker=selection, selector_llm_calls=llm_calls)
+        await self.publish_message(RequestToSpeak(trace_context=trace_carrier()), conversation_topic_id(self, selection))
+        record_publish(selection, "RequestToSpeak")
+        mark_startup("first_turn")
+
+    async def _ask_selector(self, candidates: List[str], ctx: MessageContext) -> str:
+        # Stable head, then the append-only transcript, then the per-turn candidates, so consecutive
+        # selector calls (and those of other sessions) share their prefix with the previous one.
+        participants = self._participant_catalog.participants(candidates)
+        request = f"""{self._transcript.render()}
+
+Read the above conversation. Then select the next role from {participants} to play, or 'FINISH' if it's enough talking. Only return the role.
+"""
+        messages = [self._selector_message, UserMessage(content=request, source=self.id.type)]
+        with span("llm.select_speaker", candidates=len(candidates)):
+            completion = await self._model_client.create(messages, cancellation_token=ctx.cancellation_token)
+
+        assert isinstance(
+            completion.content, str
+        ), f"Completion content must be a string, but is: {type(completion.content)}"
+        return completion.content
 
 
 class UIAgent(RoutedAgent):
@@ -187,32 +300,29 @@ class UIAgent(RoutedAgent):
 
 
 async def publish_message_to_ui(
-    runtime: RoutedAgent | GrpcWorkerAgentRuntime,
+    runtime: RoutedAgent | AgentRuntime,
     source: str,
     user_message: str,
     ui_config: UIAgentConfig,
 ) -> None:
-    message_id = str(uuid4())
-    # Stream the message to UI
-    message_chunks = (
-        MessageChunk(message_id=message_id, text=token + " ", author=source, finished=False)
-        for token in user_message.split()
-    )
-    for chunk in message_chunks:
-        await runtime.publish_message(
-            chunk,
-            DefaultTopicId(type=ui_config.topic_type),
-        )
-        await asyncio.sleep(random.uniform(ui_config.min_delay, ui_config.max_delay))
-
-    await runtime.publish_message(
-        MessageChunk(message_id=message_id, text=" ", author=source, finished=True),
-        DefaultTopicId(type=ui_config.topic_type),
+    # Stream the message to UI, packing words into as few frames as the latency budget allows.
+    publisher = UIChunkPublisher(runtime=runtime, source=source, ui_config=ui_config)
+    with span("ui.publish", source=source):
+        try:
+            for token in user_message.split():
+                await publisher.write(token + " ")
+                if ui_config.stream_delay_enabled:
+                    await asyncio.sleep(random.uniform(ui_config.min_delay, ui_config.max_delay))
+        finally:
+            await publisher.close()
+    annotate_metric(
+        ui_frames=publisher.frames_published,
+        ui_frames_merged=publisher.frames_merged,
     )
 
 
 async def publish_message_to_ui_and_backend(
-    runtime: RoutedAgent | GrpcWorkerAgentRuntime,
+    runtime: RoutedAgent | AgentRuntime,
     source: str,
     user_message: str,
     ui_config: UIAgentConfig,
@@ -227,7 +337,22 @@ async def publish_message_to_ui_and_backend(
     )
 
     # Publish message to backend
+    await publish_message_to_backend(
+        runtime=runtime,
+        source=source,
+        user_message=user_message,
+        group_chat_topic_type=group_chat_topic_type,
+    )
+
+
+async def publish_message_to_backend(
+    runtime: RoutedAgent | AgentRuntime,
+    source: str,
+    user_message: str,
+    group_chat_topic_type: str,
+) -> None:
     await runtime.publish_message(
-        GroupChatMessage(body=UserMessage(content=user_message, source=source)),
-        topic_id=DefaultTopicId(type=group_chat_topic_type),
-    )
\ No newline at end of file
+        GroupChatMessage(body=UserMessage(content=user_message, source=source), trace_context=trace_carrier()),
+        topic_id=conversation_topic_id(runtime, group_chat_topic_type),
+    )
+    record_publish(group_chat_topic_type, "GroupChatMessage")
\ No newline at end of file
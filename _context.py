@@ -0,0 +1,160 @@
+import asyncio
+import weakref
+from collections import deque
+from typing import Awaitable, Callable, Deque, List, Optional, Sequence
+
+from _transcript import estimate_tokens, format_transcript_line
+from _types import ContextPolicyConfig
+from autogen_core.models import LLMMessage, SystemMessage
+
+Summarizer = Callable[[str, Sequence[LLMMessage]], Awaitable[str]]
+
+# Windows whose summary refresh may still be pending, so entry points can drain them before exit.
+_windows: "weakref.WeakSet[ContextWindow]" = weakref.WeakSet()
+
+
+def message_tokens(message: LLMMessage) -> int:
+    line = format_transcript_line(message)
+    return estimate_tokens(line) if line is not None else 0
+
+
+class ContextWindow:
+    """
+    Prompt history for a chat agent, bounded by a `ContextPolicyConfig`.
+
+    The prompt is kept as a single list that starts with the system message (and the running
+    summary in "summary" mode), so `prompt()` hands it to the model client without copying.
+    Summaries are produced by a background task and swapped in when ready, so turns never wait
+    on them. History is only appended between trims, so consecutive prompts share their prefix
+    and the server's prefix cache can reuse it.
+    """
+
+    def __init__(
+        self,
+        system_message: SystemMessage,
+        policy: ContextPolicyConfig | None = None,
+        summarizer: Optional[Summarizer] = None,
+    ) -> None:
+        self._policy = policy or ContextPolicyConfig()
+        if self._policy.mode == "summary" and summarizer is None:
+            raise ValueError("Context mode 'summary' requires a summarizer.")
+        self._summarizer = summarizer
+        self._system_tokens = message_tokens(system_message)
+        self._prompt: List[LLMMessage] = [system_message]
+        # Token estimates of the history messages currently in the prompt, oldest first.
+        self._window_tokens: Deque[int] = deque()
+        self._window_token_total = 0
+        self._history_token_total = 0
+        self._summary = ""
+        self._summary_tokens = 0
+        self._summary_task: Optional[asyncio.Task[None]] = None
+        _windows.add(self)
+
+    @property
+    def mode(self) -> str:
+        return self._policy.mode
+
+    @property
+    def _head(self) -> int:
+        """Index of the first history message in the prompt list."""
+        return 2 if self._summary else 1
+
+    def append(self, message: LLMMessage) -> None:
+        tokens = message_tokens(message)
+        self._prompt.append(message)
+        self._window_tokens.append(tokens)
+        self._window_token_total += tokens
+        self._history_token_total += tokens
+        self._trim()
+
+    def extend(self, messages: Sequence[LLMMessage]) -> None:
+        for message in messages:
+            self.append(message)
+
+    def prompt(self) -> Sequence[LLMMessage]:
+        """Returns the live prompt list; callers must not mutate it."""
+        return self._prompt
+
+    @property
+    def prompt_tokens(self) -> int:
+        return self._system_tokens + self._summary_tokens + self._window_token_total
+
+    @property
+    def tokens_saved(self) -> int:
+        """Estimated tokens this policy saves compared with sending the full history."""
+        return self._system_tokens + self._history_token_total - self.prompt_tokens
+
+    def _drop_oldest(self, count: int) -> None:
+        if count <= 0:
+            return
+        head = self._head
+        del self._prompt[head : head + count]
+        for _ in range(count):
+            self._window_token_total -= self._window_tokens.popleft()
+
+    def _trim(self) -> None:
+        policy = self._policy
+        # Once over the cap, trim `trim_slack` of it further, so the prompt keeps its prefix for the
+        # next turns instead of shifting by one message each turn.
+        if policy.mode == "last_n":
+            excess = len(self._window_tokens) - policy.max_messages
+            if excess > 0:
+                slack = int(policy.max_messages * policy.trim_slack)
+                self._drop_oldest(min(excess + slack, len(self._window_tokens) - 1))
+        elif policy.mode == "token_budget":
+            budget = policy.max_tokens - self._system_tokens
+            total = self._window_token_total
+            if total <= budget:
+                return
+            target = budget * (1 - policy.trim_slack)
+            count = 0
+            # Keep at least the newest message.
+            while total > target and count < len(self._window_tokens) - 1:
+                total -= self._window_tokens[count]
+                count += 1
+            self._drop_oldest(count)
+        elif policy.mode == "summary":
+            self._maybe_refresh_summary()
+
+    def _maybe_refresh_summary(self) -> None:
+        if self._summary_task is not None:
+            return
+        policy = self._policy
+        fold = len(self._window_tokens) - policy.summary_keep_messages
+        if fold < policy.summary_refresh_messages:
+            return
+        head = self._head
+        to_fold = self._prompt[head : head + fold]
+        self._summary_task = asyncio.create_task(self._refresh_summary(to_fold))
+
+    async def _refresh_summary(self, to_fold: List[LLMMessage]) -> None:
+        assert self._summarizer is not None
+        try:
+            summary = await self._summarizer(self._summary, to_fold)
+        except Exception as e:
+            # Keep the verbatim history; the next append retries.
+            print(f"[context] Summary refresh failed: {e}")
+            return
+        finally:
+            self._summary_task = None
+        # Only this task removes history in summary mode, so the folded messages are still the oldest.
+        had_summary = bool(self._summary)
+        self._drop_oldest(len(to_fold))
+        summary_message = SystemMessage(content=f"Summary of the earlier conversation: {summary}")
+        # A non-empty summary marks that the prompt holds a summary message at index 1.
+        self._summary = summary or " "
+        self._summary_tokens = message_tokens(summary_message)
+        if had_summary:
+            self._prompt[1] = summary_message
+        else:
+            self._prompt.insert(1, summary_message)
+
+    async def aclose(self) -> None:
+        """Waits for a pending summary refresh."""
+        if self._summary_task is not None:
+            await asyncio.gather(self._summary_task, return_exceptions=True)
+
+
+async def drain_context_windows() -> None:
+    """Waits for the pending summary refresh of every context window in this process."""
+    await asyncio.gather(*(window.aclose() for window in list(_windows)))
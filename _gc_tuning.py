@@ -0,0 +1,164 @@
+"""
+Garbage-collector pause instrumentation and tuning for the agent processes.
+
+`configure_gc` is called once by the `run_*.py` entry points:
+
+- `monitor`: hooks `gc.callbacks` and records every collection (wall-clock timestamp,
+  generation, pause, objects collected) in fixed-size `array` columns, written to
+  `<log_dir>/gc_<agent>.csv` by `stop_gc_monitor`. The timestamps line up with the handler records
+  of agent_timeslices, every tracked handler record gets the GC pause time that fell inside it
+  (`gc_pause_sec`, `gc_collections`), and with tracing on each pause is an event on the current span.
+- `mode`:
+  - "default": CPython's thresholds.
+  - "freeze": `after_startup` collects once and moves everything allocated during startup
+    (modules, clients, config) to the permanent generation, so full collections stop rescanning it.
+  - "thresholds": `gc.set_threshold(*thresholds)`.
+  - "between_turns": automatic collection only as a safety net (threshold0 raised to
+    `thresholds[0]`, 50000 by default); `after_turn` instead runs, right after each handler
+    once the reply is out, the collection CPython's normal thresholds would have made due.
+
+`bench_gc.py` compares the handler latency of the modes.
+"""
+import asyncio
+import gc
+import os
+import time
+from array import array
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from opentelemetry import trace
+
+GC_MODES = ("default", "freeze", "thresholds", "between_turns")
+GC_COLUMNS = ("timestamp", "generation", "pause_sec", "collected", "uncollectable")
+
+# Safety-net threshold0 of the "between_turns" mode when none is configured.
+BETWEEN_TURNS_THRESHOLD = 50000
+
+_config: Dict[str, Any] = {"mode": "default", "due_thresholds": gc.get_threshold()}
+_monitor: Optional["GCMonitor"] = None
+
+
+class GCMonitor:
+    """Records every collection through `gc.callbacks` into a ring of `capacity` entries."""
+
+    def __init__(self, capacity: int = 65536) -> None:
+        self.capacity = capacity
+        self._columns = {name: array("d", bytes(8 * capacity)) for name in GC_COLUMNS}
+        self.collections = 0
+        self.pause_sec = 0.0
+        self.max_pause_sec = 0.0
+        self._start = 0.0
+
+    def install(self) -> None:
+        gc.callbacks.append(self._callback)
+
+    def uninstall(self) -> None:
+        if self._callback in gc.callbacks:
+            gc.callbacks.remove(self._callback)
+
+    def _callback(self, phase: str, info: Dict[str, int]) -> None:
+        if phase == "start":
+            self._start = time.perf_counter()
+            return
+        pause = time.perf_counter() - self._start
+        slot = self.collections % self.capacity
+        values = (time.time(), info["generation"], pause, info["collected"], info["uncollectable"])
+        for name, value in zip(GC_COLUMNS, values):
+            self._columns[name][slot] = value
+        self.collections += 1
+        self.pause_sec += pause
+        self.max_pause_sec = max(self.max_pause_sec, pause)
+        span = trace.get_current_span()
+        if span.is_recording():
+            span.add_event(
+                "gc", {"gc.generation": info["generation"], "gc.pause_sec": pause, "gc.collected": info["collected"]}
+            )
+
+    def records(self) -> List[Dict[str, float]]:
+        """The retained collections, oldest first."""
+        count = min(self.collections, self.capacity)
+        first = self.collections - count
+        return [
+            {name: self._columns[name][(first + i) % self.capacity] for name in GC_COLUMNS} for i in range(count)
+        ]
+
+    def write_csv(self, path: str) -> None:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w") as f:
+            f.write(",".join(GC_COLUMNS) + "\n")
+            for record in self.records():
+                f.write(
+                    f"{record['timestamp']!r},{int(record['generation'])},{record['pause_sec']!r},"
+                    f"{int(record['collected'])},{int(record['uncollectable'])}\n"
+                )
+
+    def summary(self) -> str:
+        return (
+            f"{self.collections} collections, {self.pause_sec * 1000:.1f} ms paused in total, "
+            f"longest {self.max_pause_sec * 1000:.2f} ms"
+        )
+
+
+def configure_gc(
+    mode: str = "default",
+    thresholds: Optional[Sequence[int]] = None,
+    monitor: bool = False,
+) -> Optional[GCMonitor]:
+    """Applies the GC tuning `mode` to this process and optionally starts the pause monitor."""
+    global _monitor
+    if mode not in GC_MODES:
+        raise ValueError(f"Unknown GC mode {mode!r}; expected one of {GC_MODES}")
+    _config.update(mode=mode, due_thresholds=gc.get_threshold())
+    if mode == "thresholds":
+        if not thresholds:
+            raise ValueError('GC mode "thresholds" needs `thresholds`')
+        gc.set_threshold(*thresholds)
+    elif mode == "between_turns":
+        _, threshold1, threshold2 = gc.get_threshold()
+        gc.set_threshold(*(thresholds or (BETWEEN_TURNS_THRESHOLD, threshold1, threshold2)))
+    if monitor and _monitor is None:
+        _monitor = GCMonitor()
+        _monitor.install()
+    return _monitor
+
+
+def after_startup() -> None:
+    """Call once the process is ready to serve; freezes the startup heap in "freeze" mode."""
+    if _config["mode"] == "freeze":
+        gc.collect()
+        gc.freeze()
+
+
+def after_turn() -> None:
+    """Call at the end of a turn's handler; schedules the deferred collection in "between_turns" mode."""
+    if _config["mode"] != "between_turns":
+        return
+    # Runs once the handler has returned, so the pause is not part of the turn.
+    asyncio.get_running_loop().call_soon(_collect_between_turns)
+
+
+def _collect_between_turns() -> None:
+    # Oldest generation whose count passed its normal threshold, as CPython would have picked.
+    counts = gc.get_count()
+    due = [generation for generation in range(3) if counts[generation] > _config["due_thresholds"][generation]]
+    if due:
+        gc.collect(due[-1])
+
+
+def gc_pause_totals() -> Optional[Tuple[float, int]]:
+    """Total GC pause seconds and collections so far, or None while the monitor is off."""
+    if _monitor is None:
+        return None
+    return _monitor.pause_sec, _monitor.collections
+
+
+def stop_gc_monitor(agent_name: str, log_dir: str = "logs") -> None:
+    """Writes `<log_dir>/gc_<agent_name>.csv` and stops recording collections."""
+    global _monitor
+    if _monitor is None:
+        return
+    _monitor.uninstall()
+    path = os.path.join(log_dir, f"gc_{agent_name}.csv")
+    _monitor.write_csv(path)
+    print(f"[gc] {agent_name}: {_monitor.summary()} ({path})")
+    _monitor = None
@@ -0,0 +1,211 @@
+import csv
+import json
+import math
+import os
+import threading
+import time
+from array import array
+from typing import IO, Any, Dict, Iterator, List, Optional
+
+# Columns every record has; anything else a handler annotates goes to the JSON `extra` column.
+NUMERIC_COLUMNS = ("timestamp", "duration_sec", "peak_memory_bytes", "net_memory_bytes", "tracker_overhead_sec")
+STRING_COLUMNS = ("agent", "function", "memory_mode")
+CSV_COLUMNS = (
+    "timestamp",
+    "agent",
+    "function",
+    "thread_id",
+    "duration_sec",
+    "peak_memory_bytes",
+    "net_memory_bytes",
+    "memory_mode",
+    "concurrent",
+    "tracker_overhead_sec",
+    "extra",
+)
+_CORE_KEYS = set(NUMERIC_COLUMNS) | set(STRING_COLUMNS) | {"thread_id", "concurrent"}
+
+
+class MetricsRing:
+    """
+    Fixed-capacity, column-oriented buffer of handler metric records.
+
+    Numeric fields live in preallocated `array` columns and strings are interned to small integer
+    ids, so memory does not grow with the length of the run. Records that have not been flushed
+    when the ring wraps are overwritten and counted in `dropped`. It accepts the same dicts the
+    tracker used to append to a list, and iterating it yields the retained records as dicts.
+    """
+
+    def __init__(self, capacity: int = 65536) -> None:
+        self._lock = threading.Lock()
+        self.resize(capacity)
+
+    def resize(self, capacity: int) -> None:
+        """Reallocates the columns for `capacity` records, discarding the current contents."""
+        self.capacity = capacity
+        self._numeric = {name: array("d", bytes(8 * capacity)) for name in NUMERIC_COLUMNS}
+        self._strings = {name: array("i", bytes(4 * capacity)) for name in STRING_COLUMNS}
+        self._thread_id = array("q", bytes(8 * capacity))
+        self._concurrent = array("b", bytes(capacity))
+        self._extra: List[Optional[str]] = [None] * capacity
+        self._interned: Dict[str, int] = {}
+        self._names: List[str] = []
+        # Total records appended and the first record not yet handed to a flusher.
+        self._written = 0
+        self._flushed = 0
+        self.dropped = 0
+
+    def _intern(self, value: Any) -> int:
+        text = "" if value is None else str(value)
+        index = self._interned.get(text)
+        if index is None:
+            index = self._interned[text] = len(self._names)
+            self._names.append(text)
+        return index
+
+    def append(self, record: Dict[str, Any]) -> None:
+        extra = {key: value for key, value in record.items() if key not in _CORE_KEYS}
+        with self._lock:
+            slot = self._written % self.capacity
+            if self._written - self._flushed >= self.capacity:
+                self._flushed += 1
+                self.dropped += 1
+            for name in NUMERIC_COLUMNS:
+                value = record.get(name)
+                self._numeric[name][slot] = math.nan if value is None else float(value)
+            if math.isnan(self._numeric["timestamp"][slot]):
+                self._numeric["timestamp"][slot] = time.time()
+            for name in STRING_COLUMNS:
+                self._strings[name][slot] = self._intern(record.get(name))
+            self._thread_id[slot] = record.get("thread_id", 0)
+            self._concurrent[slot] = 1 if record.get("concurrent") else 0
+            self._extra[slot] = json.dumps(extra, default=str) if extra else None
+            self._written += 1
+
+    def _record(self, slot: int) -> Dict[str, Any]:
+        record: Dict[str, Any] = {}
+        for name in CSV_COLUMNS:
+            if name in self._numeric:
+                value = self._numeric[name][slot]
+                record[name] = None if math.isnan(value) else value
+            elif name in self._strings:
+                record[name] = self._names[self._strings[name][slot]]
+            elif name == "thread_id":
+                record[name] = self._thread_id[slot]
+            elif name == "concurrent":
+                record[name] = bool(self._concurrent[slot])
+        if self._extra[slot]:
+            record.update(json.loads(self._extra[slot]))  # type: ignore[arg-type]
+        return record
+
+    def take_unflushed(self) -> List[Dict[str, Any]]:
+        """Returns the records appended since the last call and marks them flushed."""
+        with self._lock:
+            records = [self._record(i % self.capacity) for i in range(self._flushed, self._written)]
+            self._flushed = self._written
+        return records
+
+    def __len__(self) -> int:
+        return min(self._written, self.capacity)
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        with self._lock:
+            start = max(0, self._written - self.capacity)
+            records = [self._record(i % self.capacity) for i in range(start, self._written)]
+        return iter(records)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._written = self._flushed = 0
+            self.dropped = 0
+
+
+def to_csv_row(record: Dict[str, Any]) -> Dict[str, Any]:
+    row = {name: record.get(name) for name in CSV_COLUMNS if name != "extra"}
+    extra = {key: value for key, value in record.items() if key not in _CORE_KEYS}
+    row["extra"] = json.dumps(extra, default=str) if extra else ""
+    return row
+
+
+def read_metrics_csv(path: str) -> List[Dict[str, Any]]:
+    """Reads a flushed metrics file back into records, expanding the `extra` column."""
+    records = []
+    with open(path, newline="") as f:
+        for row in csv.DictReader(f):
+            record: Dict[str, Any] = {}
+            for name, value in row.items():
+                if name == "extra":
+                    continue
+                if name in NUMERIC_COLUMNS:
+                    record[name] = float(value) if value not in ("", None) else None
+                elif name == "thread_id":
+                    record[name] = int(value)
+                elif name == "concurrent":
+                    record[name] = value == "True"
+                else:
+                    record[name] = value
+            if row.get("extra"):
+                record.update(json.loads(row["extra"]))
+            records.append(record)
+    return records
+
+
+class MetricsFlusher:
+    """
+    Background thread that appends new records from a `MetricsRing` to one CSV file per agent
+    (`<out_dir>/metrics_<agent>.csv`) every `interval` seconds. Each batch is flushed to the OS,
+    so a killed process loses at most the last interval.
+    """
+
+    def __init__(self, ring: MetricsRing, out_dir: str, interval: float = 1.0) -> None:
+        self._ring = ring
+        self.out_dir = out_dir
+        self._interval = interval
+        self._files: Dict[str, IO[str]] = {}
+        # File of each agent this flusher opened, kept after `stop`.
+        self.paths: Dict[str, str] = {}
+        self._writers: Dict[str, "csv.DictWriter[str]"] = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="metrics-flusher", daemon=True)
+        self._flush_lock = threading.Lock()
+
+    def start(self) -> None:
+        os.makedirs(self.out_dir, exist_ok=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self._interval):
+            self.flush()
+
+    def flush(self) -> None:
+        with self._flush_lock:
+            records = self._ring.take_unflushed()
+            touched = set()
+            for record in records:
+                agent = record["agent"]
+                writer = self._writers.get(agent)
+                if writer is None:
+                    # A restarted process appends to the records of its earlier runs.
+                    path = os.path.join(self.out_dir, f"metrics_{agent}.csv")
+                    new = not os.path.exists(path) or os.path.getsize(path) == 0
+                    f = open(path, "a", newline="")
+                    writer = csv.DictWriter(f, fieldnames=CSV_COLUMNS)
+                    if new:
+                        writer.writeheader()
+                    self._files[agent] = f
+                    self._writers[agent] = writer
+                    self.paths[agent] = path
+                writer.writerow(to_csv_row(record))
+                touched.add(agent)
+            for agent in touched:
+                self._files[agent].flush()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
+        self.flush()
+        for f in self._files.values():
+            f.close()
+        self._files.clear()
+        self._writers.clear()
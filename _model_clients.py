@@ -0,0 +1,275 @@
+import hashlib
+import json
+import os
+import tempfile
+import time
+from collections import OrderedDict
+from typing import Any, AsyncGenerator, Dict, Mapping, Optional, Sequence, Tuple, Union
+
+from _telemetry import record_cache_lookup, record_llm_call
+from _types import AppConfig, LLMCacheConfig
+from autogen_core.models import (
+    ChatCompletionClient,
+    CreateResult,
+    LLMMessage,
+    ModelCapabilities,  # type: ignore[attr-defined]
+    ModelInfo,
+    RequestUsage,
+)
+from autogen_core.tools import Tool, ToolSchema
+
+
+class DelegatingChatCompletionClient(ChatCompletionClient):
+    """Base class for wrappers that forward every call to an inner `ChatCompletionClient`."""
+
+    def __init__(self, inner: ChatCompletionClient) -> None:
+        self._inner = inner
+
+    async def create(self, messages: Sequence[LLMMessage], **kwargs: Any) -> CreateResult:
+        return await self._inner.create(messages, **kwargs)
+
+    def create_stream(  # type: ignore[override]
+        self, messages: Sequence[LLMMessage], **kwargs: Any
+    ) -> AsyncGenerator[Union[str, CreateResult], None]:
+        return self._inner.create_stream(messages, **kwargs)
+
+    async def close(self) -> None:
+        await self._inner.close()
+
+    def actual_usage(self) -> RequestUsage:
+        return self._inner.actual_usage()
+
+    def total_usage(self) -> RequestUsage:
+        return self._inner.total_usage()
+
+    def count_tokens(self, messages: Sequence[LLMMessage], *, tools: Sequence[Tool | ToolSchema] = []) -> int:
+        return self._inner.count_tokens(messages, tools=tools)
+
+    def remaining_tokens(self, messages: Sequence[LLMMessage], *, tools: Sequence[Tool | ToolSchema] = []) -> int:
+        return self._inner.remaining_tokens(messages, tools=tools)
+
+    @property
+    def capabilities(self) -> ModelCapabilities:  # type: ignore[override]
+        return self._inner.capabilities
+
+    @property
+    def model_info(self) -> ModelInfo:
+        return self._inner.model_info
+
+
+class MeteredChatCompletionClient(DelegatingChatCompletionClient):
+    """Records the count and latency of every model call under `agent_type` in the live metrics."""
+
+    def __init__(self, inner: ChatCompletionClient, agent_type: str) -> None:
+        super().__init__(inner)
+        self._agent_type = agent_type
+
+    async def create(self, messages: Sequence[LLMMessage], **kwargs: Any) -> CreateResult:
+        start = time.perf_counter()
+        result = await super().create(messages, **kwargs)
+        record_llm_call(self._agent_type, "create", time.perf_counter() - start, cached=bool(result.cached))
+        return result
+
+    async def create_stream(  # type: ignore[override]
+        self, messages: Sequence[LLMMessage], **kwargs: Any
+    ) -> AsyncGenerator[Union[str, CreateResult], None]:
+        start = time.perf_counter()
+        cached = False
+        async for item in super().create_stream(messages, **kwargs):
+            if isinstance(item, CreateResult):
+                cached = bool(item.cached)
+            yield item
+        record_llm_call(self._agent_type, "create_stream", time.perf_counter() - start, cached=cached)
+
+
+# Client settings that do not change what the model answers, left out of cache keys.
+_UNKEYED_CLIENT_SETTINGS = {
+    "api_key",
+    "base_url",
+    "azure_ad_token_provider",
+    "default_headers",
+    "timeout",
+    "max_retries",
+    "model_capabilities",
+    "model_info",
+}
+
+
+def cache_key(
+    messages: Sequence[LLMMessage], model_params: Mapping[str, Any], create_args: Mapping[str, Any]
+) -> str:
+    """
+    SHA-256 over the normalized prompt, the model parameters and the per-call arguments.
+    Messages are compared by their JSON form with surrounding whitespace stripped from text.
+    """
+    normalized = []
+    for message in messages:
+        data = message.model_dump(mode="json")
+        if isinstance(data.get("content"), str):
+            data["content"] = data["content"].strip()
+        normalized.append(data)
+    payload = {"messages": normalized, "model": dict(model_params), "args": dict(create_args)}
+    blob = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(blob.encode()).hexdigest()
+
+
+class CachingChatCompletionClient(DelegatingChatCompletionClient):
+    """
+    Content-addressed response cache in front of a `ChatCompletionClient`.
+
+    Modes: "off" forwards every call; "read_through" answers repeated prompts from the cache and
+    stores new answers; "record_only" always calls the model but stores the answers, to build a
+    cache for later read-through runs. Entries are kept in an in-memory LRU bounded by
+    `max_bytes` and, with `disk_dir`, in one file per key that every process can read. A hit
+    returns the stored `CreateResult` with `cached=True`; streaming hits replay it word by word.
+    """
+
+    def __init__(
+        self,
+        inner: ChatCompletionClient,
+        agent_type: str,
+        mode: str = "read_through",
+        model_params: Optional[Mapping[str, Any]] = None,
+        max_bytes: int = 64 * 1024 * 1024,
+        disk_dir: Optional[str] = None,
+    ) -> None:
+        super().__init__(inner)
+        self._agent_type = agent_type
+        self.mode = mode
+        self._model_params = {
+            key: value for key, value in (model_params or {}).items() if key not in _UNKEYED_CLIENT_SETTINGS
+        }
+        self._max_bytes = max_bytes
+        self._disk_dir = disk_dir
+        if disk_dir is not None:
+            os.makedirs(disk_dir, exist_ok=True)
+        # key -> (serialized entry, size in bytes)
+        self._memory: "OrderedDict[str, Tuple[str, int]]" = OrderedDict()
+        self._memory_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.latency_saved_sec = 0.0
+
+    async def create(self, messages: Sequence[LLMMessage], **kwargs: Any) -> CreateResult:
+        if self.mode == "off":
+            return await super().create(messages, **kwargs)
+        key = self._key(messages, kwargs)
+        if self.mode == "read_through":
+            cached = self._lookup(key)
+            if cached is not None:
+                return cached
+        start = time.perf_counter()
+        result = await super().create(messages, **kwargs)
+        self._store(key, result, time.perf_counter() - start)
+        return result
+
+    async def create_stream(  # type: ignore[override]
+        self, messages: Sequence[LLMMessage], **kwargs: Any
+    ) -> AsyncGenerator[Union[str, CreateResult], None]:
+        key = None if self.mode == "off" else self._key(messages, kwargs)
+        if self.mode == "read_through":
+            cached = self._lookup(key)  # type: ignore[arg-type]
+            if cached is not None:
+                if isinstance(cached.content, str):
+                    for index, word in enumerate(cached.content.split(" ")):
+                        yield word if index == 0 else " " + word
+                yield cached
+                return
+        start = time.perf_counter()
+        async for item in super().create_stream(messages, **kwargs):
+            if key is not None and isinstance(item, CreateResult):
+                self._store(key, item, time.perf_counter() - start)
+            yield item
+
+    def _key(self, messages: Sequence[LLMMessage], kwargs: Mapping[str, Any]) -> str:
+        create_args = {name: value for name, value in kwargs.items() if name != "cancellation_token"}
+        return cache_key(messages, self._model_params, create_args)
+
+    def _lookup(self, key: str) -> Optional[CreateResult]:
+        entry = self._memory.get(key)
+        if entry is not None:
+            self._memory.move_to_end(key)
+            serialized = entry[0]
+        else:
+            serialized = self._read_disk(key)
+            if serialized is not None:
+                self._remember(key, serialized)
+        if serialized is None:
+            self.misses += 1
+            record_cache_lookup(self._agent_type, hit=False)
+            return None
+        data = json.loads(serialized)
+        self.hits += 1
+        self.latency_saved_sec += data["latency_sec"]
+        record_cache_lookup(self._agent_type, hit=True, latency_saved=data["latency_sec"])
+        result = CreateResult.model_validate(data["result"])
+        result.cached = True
+        return result
+
+    def _store(self, key: str, result: CreateResult, latency_sec: float) -> None:
+        serialized = json.dumps({"latency_sec": latency_sec, "result": result.model_dump(mode="json")})
+        self._remember(key, serialized)
+        if self._disk_dir is not None:
+            self._write_disk(key, serialized)
+
+    def _remember(self, key: str, serialized: str) -> None:
+        size = len(serialized)
+        if size > self._max_bytes:
+            return
+        previous = self._memory.pop(key, None)
+        if previous is not None:
+            self._memory_bytes -= previous[1]
+        self._memory[key] = (serialized, size)
+        self._memory_bytes += size
+        while self._memory_bytes > self._max_bytes:
+            _, (_, evicted) = self._memory.popitem(last=False)
+            self._memory_bytes -= evicted
+
+    def _path(self, key: str) -> str:
+        assert self._disk_dir is not None
+        return os.path.join(self._disk_dir, key[:2], f"{key}.json")
+
+    def _read_disk(self, key: str) -> Optional[str]:
+        if self._disk_dir is None:
+            return None
+        try:
+            with open(self._path(key)) as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def _write_disk(self, key: str, serialized: str) -> None:
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write-then-rename, so concurrent readers in other processes never see a partial entry.
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            f.write(serialized)
+        os.replace(tmp_path, path)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "latency_saved_sec": self.latency_saved_sec,
+            "entries": len(self._memory),
+            "bytes": self._memory_bytes,
+        }
+
+
+def build_model_client(config: AppConfig, agent_type: str) -> ChatCompletionClient:
+    """The model client of an entry point: OpenAI client, then the response cache, then metering."""
+    from autogen_ext.models.openai import OpenAIChatCompletionClient
+
+    client: ChatCompletionClient = OpenAIChatCompletionClient(**config.client_config)
+    cache: LLMCacheConfig = config.llm_cache
+    if cache.mode != "off":
+        client = CachingChatCompletionClient(
+            client,
+            agent_type,
+            mode=cache.mode,
+            model_params=config.client_config,
+            max_bytes=cache.max_bytes,
+            disk_dir=cache.disk_dir,
+        )
+    return MeteredChatCompletionClient(client, agent_type)
@@ -0,0 +1,239 @@
+"""
+CPU placement of the LLM server and the agent processes, computed from the machine topology.
+
+The topology comes from sysfs: every CPU this process may run on (so a Slurm allocation is
+respected), its socket, physical core and NUMA node; CPUs sharing a physical core are SMT
+siblings. `plan` first reserves `placement.llm_cores` whole physical cores for the LLM server's
+CPU threads, on `placement.llm_numa_node`, and places the agents on the remaining cores only:
+
+- "none": no pinning; every process may run on every CPU.
+- "compact": one hardware thread per agent, filling both SMT siblings of a core before the next
+  core, on the NUMA node with the most free cores; the agents share caches.
+- "cores": one whole physical core per agent (its SMT siblings stay idle), on the NUMA node with
+  the most free cores while it has room.
+- "spread": one whole physical core per agent, alternating between NUMA nodes and sockets.
+
+When there are more agents than free cores, agents share them and the placement carries a
+warning; the LLM reservation always leaves at least one core for the agents. The launchers print
+`describe` and write `report` to `logs/placement.json`. Shell scripts use the command line:
+
+    python _placement.py [--policy cores] report
+    eval "$(python _placement.py shell)"   # LLM_CPUS=0-11 HOST_CPUS=12-13 ...
+"""
+import argparse
+import glob
+import json
+import os
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+from _types import PlacementConfig
+
+LLM = "llm"
+
+
+@dataclass(frozen=True)
+class LogicalCPU:
+    cpu: int
+    socket: int
+    core: int
+    node: int
+
+
+@dataclass
+class Core:
+    """A physical core: its SMT siblings, socket and NUMA node."""
+
+    socket: int
+    node: int
+    cpus: List[int]
+
+
+def parse_cpulist(text: str) -> List[int]:
+    """Parses a sysfs/taskset CPU list such as "0-3,8,10-11"."""
+    cpus: List[int] = []
+    for part in text.strip().split(","):
+        if not part:
+            continue
+        first, _, last = part.partition("-")
+        cpus.extend(range(int(first), int(last or first) + 1))
+    return cpus
+
+
+def format_cpulist(cpus: Iterable[int]) -> str:
+    """Formats CPUs as a taskset list, collapsing runs: [0, 1, 2, 5] -> "0-2,5"."""
+    ranges: List[List[int]] = []
+    for cpu in sorted(set(cpus)):
+        if ranges and cpu == ranges[-1][1] + 1:
+            ranges[-1][1] = cpu
+        else:
+            ranges.append([cpu, cpu])
+    return ",".join(str(first) if first == last else f"{first}-{last}" for first, last in ranges)
+
+
+def _read_int(path: str, default: int) -> int:
+    try:
+        with open(path) as f:
+            return int(f.read().strip())
+    except (OSError, ValueError):
+        return default
+
+
+def read_topology(sysfs: str = "/sys/devices/system") -> List[LogicalCPU]:
+    """The CPUs this process may run on; without sysfs every CPU is its own core on socket and node 0."""
+    node_of: Dict[int, int] = {}
+    for path in glob.glob(os.path.join(sysfs, "node", "node[0-9]*", "cpulist")):
+        node = int(os.path.basename(os.path.dirname(path))[len("node"):])
+        with open(path) as f:
+            for cpu in parse_cpulist(f.read()):
+                node_of[cpu] = node
+    topology = []
+    for cpu in sorted(os.sched_getaffinity(0)):
+        directory = os.path.join(sysfs, "cpu", f"cpu{cpu}", "topology")
+        topology.append(LogicalCPU(
+            cpu=cpu,
+            socket=_read_int(os.path.join(directory, "physical_package_id"), 0),
+            core=_read_int(os.path.join(directory, "core_id"), cpu),
+            node=node_of.get(cpu, 0),
+        ))
+    return topology
+
+
+def physical_cores(topology: Sequence[LogicalCPU]) -> List[Core]:
+    """Groups SMT siblings into physical cores, ordered by NUMA node, socket and core."""
+    cores: Dict[tuple, Core] = {}
+    for cpu in topology:
+        key = (cpu.node, cpu.socket, cpu.core)
+        cores.setdefault(key, Core(cpu.socket, cpu.node, [])).cpus.append(cpu.cpu)
+    return [cores[key] for key in sorted(cores)]
+
+
+@dataclass
+class Placement:
+    """CPUs of the LLM server and of each agent; None means not pinned."""
+
+    policy: str
+    llm: Optional[List[int]]
+    agents: Dict[str, Optional[List[int]]]
+    warnings: List[str] = field(default_factory=list)
+
+    def cpus(self, name: str) -> Optional[List[int]]:
+        return self.llm if name == LLM else self.agents.get(name)
+
+    def report(self, topology: Sequence[LogicalCPU]) -> Dict[str, Any]:
+        by_cpu = {cpu.cpu: cpu for cpu in topology}
+
+        def where(pinned: Optional[List[int]]) -> Dict[str, Any]:
+            cpus = pinned if pinned is not None else sorted(by_cpu)
+            return {
+                "cpus": format_cpulist(cpus),
+                "cores": len({(by_cpu[c].socket, by_cpu[c].core) for c in cpus if c in by_cpu}),
+                "sockets": sorted({by_cpu[c].socket for c in cpus if c in by_cpu}),
+                "numa_nodes": sorted({by_cpu[c].node for c in cpus if c in by_cpu}),
+                "pinned": pinned is not None,
+            }
+
+        return {
+            "policy": self.policy,
+            "machine": {
+                "cpus": len(topology),
+                "cores": len(physical_cores(topology)),
+                "sockets": len({cpu.socket for cpu in topology}),
+                "numa_nodes": len({cpu.node for cpu in topology}),
+            },
+            "processes": {name: where(cpus) for name, cpus in [(LLM, self.llm)] + list(self.agents.items())},
+            "warnings": list(self.warnings),
+        }
+
+    def describe(self, topology: Sequence[LogicalCPU]) -> str:
+        report = self.report(topology)
+        machine = report["machine"]
+        lines = [
+            f"[placement] {self.policy}: {machine['cpus']} CPUs, {machine['cores']} cores, "
+            f"{machine['sockets']} sockets, {machine['numa_nodes']} NUMA nodes"
+        ]
+        for name, where in report["processes"].items():
+            cpus = where["cpus"] if where["pinned"] else "any"
+            lines.append(f"[placement]   {name:<20} CPUs {cpus:<12} NUMA {where['numa_nodes']} sockets {where['sockets']}")
+        lines.extend(f"[placement] Warning: {warning}" for warning in self.warnings)
+        return "\n".join(lines)
+
+
+def plan(topology: Sequence[LogicalCPU], agents: Sequence[str], config: PlacementConfig) -> Placement:
+    """Places the LLM server and `agents` according to `config.policy`."""
+    if config.policy == "none":
+        return Placement(config.policy, None, {name: None for name in agents})
+
+    cores = physical_cores(topology)
+    warnings: List[str] = []
+    reserved: List[Core] = []
+    if config.llm_cores > 0:
+        node = config.llm_numa_node if config.llm_numa_node is not None else cores[0].node
+        candidates = [core for core in cores if core.node == node] + [core for core in cores if core.node != node]
+        reserved = candidates[: min(config.llm_cores, len(cores) - 1)]
+        if len(reserved) < config.llm_cores:
+            warnings.append(f"only {len(reserved)} of {config.llm_cores} LLM cores reserved, {len(cores)} available")
+    free = [core for core in cores if core not in reserved]
+    llm = sorted(cpu for core in reserved for cpu in core.cpus) if reserved else None
+
+    free_by_node: Dict[int, List[Core]] = {}
+    for core in free:
+        free_by_node.setdefault(core.node, []).append(core)
+    # "compact" and "cores" start on the node with the most free cores.
+    nodes = sorted(free_by_node, key=lambda node: -len(free_by_node[node]))
+    by_room = [core for node in nodes for core in free_by_node[node]]
+
+    if config.policy == "compact":
+        slots = [[cpu] for core in by_room for cpu in core.cpus]
+    elif config.policy == "cores":
+        slots = [core.cpus for core in by_room]
+    else:
+        queues = [list(free_by_node[node]) for node in nodes]
+        slots = []
+        while any(queues):
+            for queue in queues:
+                if queue:
+                    slots.append(queue.pop(0).cpus)
+    if len(agents) > len(slots):
+        warnings.append(f"{len(agents)} agents share {len(slots)} {'CPUs' if config.policy == 'compact' else 'cores'}")
+    placed = {name: sorted(slots[i % len(slots)]) for i, name in enumerate(agents)}
+    return Placement(config.policy, llm, placed, warnings)
+
+
+def plan_and_report(
+    agents: Sequence[str], config: PlacementConfig, report_path: Optional[str] = "logs/placement.json"
+) -> Placement:
+    """Plans the placement for this machine, prints it and writes the report to `report_path`."""
+    topology = read_topology()
+    placement = plan(topology, agents, config)
+    print(placement.describe(topology))
+    if report_path:
+        os.makedirs(os.path.dirname(report_path) or ".", exist_ok=True)
+        with open(report_path, "w") as f:
+            json.dump(placement.report(topology), f, indent=2)
+    return placement
+
+
+if __name__ == "__main__":
+    from _utils import load_config
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--config", help="Defaults to the config.yaml next to this file.")
+    parser.add_argument("--policy", choices=("none", "compact", "cores", "spread"), help="Overrides placement.policy.")
+    parser.add_argument("--agents", nargs="+", default=["host", "ui_agent", "writer_agent", "editor_agent", "group_chat_manager"])
+    parser.add_argument("command", choices=("report", "shell"))
+    args = parser.parse_args()
+
+    placement_config = (load_config(args.config) if args.config else load_config()).placement
+    if args.policy is not None:
+        placement_config.policy = args.policy
+    if args.command == "report":
+        plan_and_report(args.agents, placement_config)
+    else:
+        # Unpinned processes get every CPU, so `taskset -c $<NAME>_CPUS` works for any policy.
+        topology = read_topology()
+        placement = plan(topology, args.agents, placement_config)
+        everywhere = [cpu.cpu for cpu in topology]
+        for name in [LLM] + list(args.agents):
+            cpus = placement.cpus(name)
+            print(f"{name.upper()}_CPUS={format_cpulist(cpus if cpus is not None else everywhere)}")
@@ -0,0 +1,173 @@
+"""
+Readiness signals used instead of fixed sleeps when starting the group chat.
+
+- The host is ready once its address accepts TCP connections (`host_listening`).
+- An agent process is ready once its startup profile has the `subscriptions_ready` mark
+  (`has_mark`, see `_startup`); inside the runtime, a participant answers a `ReadinessProbe`
+  with `ready=True` once `register` has added all its subscriptions (`mark_agent_ready`).
+- The LLM endpoint is ready once `GET <base_url>/models` lists a model (`llm_ready`).
+
+The `wait_for_*` helpers poll these checks every `poll_interval` seconds until `timeout`. The
+launchers and the manager use them, and so does the command line for shell scripts:
+
+    python _readiness.py [--timeout 120] host [--address localhost:50060]
+    python _readiness.py llm [--url http://localhost:8000/v1]
+    python _readiness.py mark writer_agent subscriptions_ready [--log-dir logs]
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import time
+import urllib.request
+from typing import Any, Callable, Iterable, Optional, Set
+
+# Agent types of this process whose subscriptions are all in place.
+_ready_agent_types: Set[str] = set()
+
+
+def mark_agent_ready(agent_type: str) -> None:
+    _ready_agent_types.add(agent_type)
+
+
+def agent_ready(agent_type: str) -> bool:
+    return agent_type in _ready_agent_types
+
+
+def host_listening(address: str) -> bool:
+    hostname, port = address.rsplit(":", 1)
+    try:
+        with socket.create_connection((hostname, int(port)), timeout=1):
+            return True
+    except OSError:
+        return False
+
+
+def llm_ready(base_url: str) -> bool:
+    try:
+        with urllib.request.urlopen(f"{base_url.rstrip('/')}/models", timeout=1) as response:
+            return b'"id"' in response.read()
+    except OSError:
+        return False
+
+
+def has_mark(log_dir: str, name: str, mark: str) -> bool:
+    """True once `<log_dir>/startup_<name>.json` records `mark`."""
+    try:
+        with open(os.path.join(log_dir, f"startup_{name}.json")) as f:
+            return mark in json.load(f)["marks"]
+    except (FileNotFoundError, json.JSONDecodeError, KeyError):
+        return False
+
+
+def mark_time(log_dir: str, name: str, mark: str) -> Optional[float]:
+    """Wall-clock time of `mark` in `<log_dir>/startup_<name>.json`, or None if it is not there yet."""
+    try:
+        with open(os.path.join(log_dir, f"startup_{name}.json")) as f:
+            profile = json.load(f)
+        return profile["process_start"] + profile["marks"][mark]
+    except (FileNotFoundError, json.JSONDecodeError, KeyError):
+        return None
+
+
+def wait_until(
+    check: Callable[[], bool],
+    what: str,
+    timeout: float,
+    poll_interval: float = 0.1,
+    alive: Optional[Callable[[], bool]] = None,
+) -> float:
+    """Polls `check` until it passes and returns the seconds waited; `alive` going False aborts."""
+    start = time.monotonic()
+    while True:
+        if check():
+            return time.monotonic() - start
+        if alive is not None and not alive():
+            raise RuntimeError(f"Exited before {what}")
+        if time.monotonic() - start > timeout:
+            raise TimeoutError(f"No {what} within {timeout}s")
+        time.sleep(poll_interval)
+
+
+def wait_for_host(address: str, timeout: float, poll_interval: float = 0.1) -> float:
+    return wait_until(lambda: host_listening(address), f"host listening at {address}", timeout, poll_interval)
+
+
+def wait_for_llm(base_url: str, timeout: float, poll_interval: float = 0.1) -> float:
+    return wait_until(lambda: llm_ready(base_url), f"LLM server at {base_url}", timeout, poll_interval)
+
+
+def wait_for_mark(
+    log_dir: str,
+    name: str,
+    mark: str,
+    timeout: float,
+    poll_interval: float = 0.1,
+    alive: Optional[Callable[[], bool]] = None,
+) -> float:
+    return wait_until(lambda: has_mark(log_dir, name, mark), f"{mark} of {name}", timeout, poll_interval, alive)
+
+
+async def wait_for_host_async(address: str, timeout: float, poll_interval: float = 0.1) -> float:
+    return await asyncio.to_thread(wait_for_host, address, timeout, poll_interval)
+
+
+async def wait_for_participants(
+    runtime: Any, agent_types: Iterable[str], timeout: float, poll_interval: float = 0.1
+) -> float:
+    """
+    Sends a `ReadinessProbe` to every agent type until each answers ready; returns the seconds
+    waited. Sending to a type no worker has registered yet fails, so that is retried as well.
+    """
+    from autogen_core import AgentId
+
+    from _types import ReadinessProbe
+
+    start = time.monotonic()
+    pending = list(agent_types)
+    while pending:
+        still_pending = []
+        for agent_type in pending:
+            try:
+                answer = await runtime.send_message(ReadinessProbe(), AgentId(agent_type, "readiness"))
+                ready = isinstance(answer, ReadinessProbe) and answer.ready
+            except Exception:
+                ready = False
+            if not ready:
+                still_pending.append(agent_type)
+        pending = still_pending
+        if not pending:
+            break
+        if time.monotonic() - start > timeout:
+            raise TimeoutError(f"Participants {pending} not subscribed within {timeout}s")
+        await asyncio.sleep(poll_interval)
+    return time.monotonic() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--timeout", type=float, default=600.0)
+    parser.add_argument("--config", help="Defaults to the config.yaml next to this file.")
+    checks = parser.add_subparsers(dest="check", required=True)
+    host_parser = checks.add_parser("host", help="Wait until the host accepts connections.")
+    host_parser.add_argument("--address", help="Defaults to host.address of the config.")
+    llm_parser = checks.add_parser("llm", help="Wait until the LLM endpoint lists a model.")
+    llm_parser.add_argument("--url", help="Defaults to client_config.base_url of the config.")
+    mark_parser = checks.add_parser("mark", help="Wait until an entry point's startup profile has a mark.")
+    mark_parser.add_argument("name")
+    mark_parser.add_argument("mark", nargs="?", default="subscriptions_ready")
+    mark_parser.add_argument("--log-dir", default="logs")
+    args = parser.parse_args()
+
+    if args.check == "mark":
+        waited = wait_for_mark(args.log_dir, args.name, args.mark, args.timeout)
+    else:
+        from _utils import load_config
+
+        config = load_config(args.config) if args.config else load_config()
+        if args.check == "host":
+            waited = wait_for_host(args.address or config.host.address, args.timeout)
+        else:
+            waited = wait_for_llm(args.url or config.client_config["base_url"], args.timeout)
+    print(f"[readiness] {args.check} ready after {waited:.2f}s")
@@ -0,0 +1,127 @@
+"""
+Per-session agent instances and idle-session eviction.
+
+A conversation is a session: its messages are published on topics whose source is the session id
+(see `_ui_stream.conversation_topic_id`), and `TypeSubscription` maps that source to the agent
+key, so every agent process keeps one instance, with its own history, transcript and state
+reporter, per session. Any number of conversations thus share the host and agent processes.
+
+The runtimes never drop an instance, so each entry point starts a `SessionReaper`:
+
+- agents wrap their handlers in `session_activity(self.id)`, which records the last activity of
+  the session and keeps it from being evicted while a handler runs;
+- every `sweep_interval_seconds` the reaper closes and removes the instances idle for longer
+  than `idle_timeout_seconds`, and beyond `max_sessions` instances the least recently active
+  idle ones as well.
+
+A message for an evicted session creates a fresh instance, so the timeout has to exceed the
+longest wait of an agent for the others' replies.
+"""
+import asyncio
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+from autogen_core import AgentId
+
+from _types import SessionsConfig
+
+# Last activity (monotonic seconds) of every session instance, least recently active first.
+_last_active: Dict[AgentId, float] = {}
+# Handlers currently running per session instance.
+_busy: Dict[AgentId, int] = {}
+_reaper: Optional["SessionReaper"] = None
+
+
+@contextmanager
+def session_activity(agent_id: AgentId) -> Iterator[None]:
+    """Marks the session instance `agent_id` busy for the duration of a handler."""
+    _busy[agent_id] = _busy.get(agent_id, 0) + 1
+    try:
+        yield
+    finally:
+        _busy[agent_id] -= 1
+        if not _busy[agent_id]:
+            del _busy[agent_id]
+        _last_active.pop(agent_id, None)
+        _last_active[agent_id] = time.monotonic()
+
+
+def live_sessions() -> int:
+    """Session instances of this process that have handled a message and are not evicted."""
+    return len(_last_active.keys() | _busy.keys())
+
+
+class SessionReaper:
+    """Periodically evicts idle session instances from `runtime`."""
+
+    def __init__(self, runtime: Any, config: SessionsConfig) -> None:
+        self._runtime = runtime
+        self._config = config
+        self._task: Optional[asyncio.Task[None]] = None
+        self.evicted = 0
+        self.peak_sessions = 0
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self._config.sweep_interval_seconds)
+            try:
+                await self.sweep()
+            except Exception as e:
+                print(f"[sessions] Sweep failed: {e}")
+
+    def _victims(self, now: float) -> List[AgentId]:
+        idle = [agent_id for agent_id in _last_active if agent_id not in _busy]
+        timeout = self._config.idle_timeout_seconds
+        victims = [agent_id for agent_id in idle if timeout is not None and now - _last_active[agent_id] > timeout]
+        if self._config.max_sessions is not None:
+            excess = live_sessions() - len(victims) - self._config.max_sessions
+            if excess > 0:
+                chosen = set(victims)
+                victims += [agent_id for agent_id in idle if agent_id not in chosen][:excess]
+        return victims
+
+    async def sweep(self) -> int:
+        """Evicts the idle session instances; returns how many were evicted."""
+        self.peak_sessions = max(self.peak_sessions, live_sessions())
+        victims = self._victims(time.monotonic())
+        # Both the gRPC worker and the single-threaded runtime keep their instances in this dict.
+        instances: Dict[AgentId, Any] = self._runtime._instantiated_agents
+        for agent_id in victims:
+            _last_active.pop(agent_id, None)
+            agent = instances.pop(agent_id, None)
+            if agent is not None:
+                await agent.close()
+        self.evicted += len(victims)
+        return len(victims)
+
+    def summary(self) -> str:
+        return f"{live_sessions()} live sessions, peak {self.peak_sessions}, {self.evicted} evicted"
+
+
+def start_session_reaper(runtime: Any, config: SessionsConfig) -> Optional[SessionReaper]:
+    """Starts evicting idle sessions of `runtime`; does nothing when eviction is disabled."""
+    global _reaper
+    if config.idle_timeout_seconds is None and config.max_sessions is None:
+        return None
+    _reaper = SessionReaper(runtime, config)
+    _reaper.start()
+    return _reaper
+
+
+async def stop_session_reaper(agent_name: str) -> None:
+    global _reaper
+    if _reaper is None:
+        return
+    await _reaper.stop()
+    print(f"[sessions] {agent_name}: {_reaper.summary()}")
+    _reaper = None
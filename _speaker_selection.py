@@ -0,0 +1,100 @@
+"""
+Speaker selection strategies of the group chat manager, set by `group_chat_manager.speaker_selection.mode`:
+
+- "llm": the selector LLM picks among all participants but the previous speaker, every turn.
+- "round_robin": participants speak in their configured order; FINISH after `max_rounds` turns.
+- "graph": the next speaker is one of `transitions[previous]` (`transitions["start"]` for the
+  first turn), the least recently heard one when several are allowed; FINISH after `max_rounds`
+  turns.
+- "hybrid": candidates as in "graph", or everyone but the previous speaker without
+  `transitions`. The LLM is asked only when more than one candidate remains, or from
+  `max_rounds` turns on to decide whether to FINISH.
+
+Without transitions, two participants and the previous speaker excluded, "hybrid" makes no LLM
+call until `max_rounds`. LLM answers are matched to a candidate by `parse_selection`; an answer
+naming no candidate falls back to the one "graph" would pick instead of failing the turn.
+"""
+from typing import Dict, List, Optional, Sequence
+
+FINISH = "FINISH"
+START = "start"
+SELECTION_MODES = ("llm", "round_robin", "graph", "hybrid")
+
+
+def parse_selection(answer: str, candidates: Sequence[str]) -> Optional[str]:
+    """Maps the selector's answer to one of `candidates` or FINISH; None if it names neither."""
+    text = answer.strip().strip("'\"`*.").strip()
+    if text.upper() == FINISH:
+        return FINISH
+    for candidate in candidates:
+        if text.lower() == candidate.lower():
+            return candidate
+    mentioned = [candidate for candidate in candidates if candidate.lower() in answer.lower()]
+    if len(mentioned) == 1:
+        return mentioned[0]
+    if not mentioned and FINISH in answer.upper():
+        return FINISH
+    return None
+
+
+class SpeakerSelector:
+    """Speaker selection state of one conversation: previous speaker, turns taken, who spoke when."""
+
+    def __init__(
+        self,
+        participant_topic_types: List[str],
+        mode: str = "llm",
+        max_rounds: int = 3,
+        transitions: Optional[Dict[str, List[str]]] = None,
+    ) -> None:
+        if mode not in SELECTION_MODES:
+            raise ValueError(f"Unknown speaker selection mode {mode!r}; expected one of {SELECTION_MODES}")
+        transitions = transitions or {}
+        if mode == "graph" and not transitions:
+            raise ValueError('Speaker selection mode "graph" needs `transitions`')
+        for source, targets in transitions.items():
+            unknown = [name for name in (source, *targets) if name not in participant_topic_types and name != START]
+            if unknown:
+                raise ValueError(f"Speaker transitions name unknown participants {unknown}")
+        self.mode = mode
+        self._participants = list(participant_topic_types)
+        self._max_rounds = max_rounds
+        self._transitions = transitions
+        self.previous: Optional[str] = None
+        self.turns = 0
+        self._last_turn: Dict[str, int] = {}
+
+    def candidates(self) -> List[str]:
+        """Participants allowed to speak next."""
+        if self._transitions and self.mode in ("graph", "hybrid"):
+            allowed = self._transitions.get(self.previous or START)
+            if allowed:
+                return list(allowed)
+        if self.mode == "round_robin":
+            if self.previous is None:
+                return self._participants[:1]
+            return [self._participants[(self._participants.index(self.previous) + 1) % len(self._participants)]]
+        others = [name for name in self._participants if name != self.previous]
+        return others or list(self._participants)
+
+    def least_recently_heard(self, candidates: Sequence[str]) -> str:
+        return min(candidates, key=lambda name: self._last_turn.get(name, -1))
+
+    def decide(self) -> Optional[str]:
+        """The next speaker or FINISH when the rules settle it, None when the LLM has to choose."""
+        if self.mode == "llm":
+            return None
+        candidates = self.candidates()
+        if self.mode == "hybrid":
+            if self.turns >= self._max_rounds or len(candidates) > 1:
+                return None
+            return candidates[0]
+        if self.turns >= self._max_rounds:
+            return FINISH
+        return self.least_recently_heard(candidates)
+
+    def record(self, speaker: str) -> None:
+        """Call once `speaker` has been asked to speak."""
+        self._last_turn[speaker] = self.turns
+        self.previous = speaker
+        self.turns += 1
@@ -0,0 +1,63 @@
+"""
+Cold-start profile for the `run_*.py` entry points.
+
+Import this module first in an entry point so `IMPORT_START` is taken before the heavy imports,
+then create a `StartupProfile` once they are done and `mark` the startup milestones. Times are
+seconds since the process was created, so interpreter start-up is included. The profile is
+written to `<log_dir>/startup_<name>.json` on every mark, so it survives a crash during startup.
+Code without access to the profile, like the agents, marks milestones with `mark_startup`.
+"""
+import json
+import os
+import time
+from typing import Dict, Optional
+
+IMPORT_START = time.time()
+# The most recently created profile of this process.
+_current: Optional["StartupProfile"] = None
+
+
+def _process_start_time() -> float:
+    try:
+        import psutil
+
+        return psutil.Process().create_time()
+    except Exception:
+        return IMPORT_START
+
+
+class StartupProfile:
+    def __init__(self, name: str, log_dir: str = "logs") -> None:
+        self.name = name
+        self._path = os.path.join(log_dir, f"startup_{name}.json")
+        os.makedirs(log_dir, exist_ok=True)
+        self._process_start = _process_start_time()
+        self.marks: Dict[str, float] = {"interpreter_ready": IMPORT_START - self._process_start}
+        self.mark("imports_done")
+        global _current
+        _current = self
+
+    def mark(self, event: str) -> float:
+        """Records `event` once (the first occurrence wins) and returns its time since process start."""
+        if event not in self.marks:
+            self.marks[event] = time.time() - self._process_start
+            self._save()
+        return self.marks[event]
+
+    def since(self, event: str, start: str = "imports_done") -> Optional[float]:
+        if event not in self.marks or start not in self.marks:
+            return None
+        return self.marks[event] - self.marks[start]
+
+    def _save(self) -> None:
+        with open(self._path, "w") as f:
+            json.dump({"name": self.name, "process_start": self._process_start, "marks": self.marks}, f, indent=2)
+
+    def summary(self) -> str:
+        return f"[startup] {self.name}: " + ", ".join(f"{event}={t:.3f}s" for event, t in self.marks.items())
+
+
+def mark_startup(event: str) -> None:
+    """Marks `event` on this process's startup profile, if there is one."""
+    if _current is not None and event not in _current.marks:
+        _current.mark(event)
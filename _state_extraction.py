@@ -0,0 +1,146 @@
+import inspect
+import json
+import re
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from autogen_core.models import AssistantMessage, ChatCompletionClient, SystemMessage, UserMessage
+from unified_state_config import PREDEFINED_STATE
+
+# Derives a field from the reply text and the previous state snapshot.
+LocalDeriver = Callable[[str, Dict[str, Any]], Any]
+
+_SENTENCE_END = re.compile(r"[.!?]+(?:\s|$)")
+_JSON_OBJECT = re.compile(r"\{.*\}", re.DOTALL)
+
+
+def count_lines(text: str) -> int:
+    """Counts non-empty lines, or sentences when the reply is a single line of prose."""
+    lines = [line for line in text.splitlines() if line.strip()]
+    if len(lines) > 1:
+        return len(lines)
+    if not lines:
+        return 0
+    return max(1, len(_SENTENCE_END.findall(lines[0].strip() + " ")))
+
+
+# Fields computed in code; everything else an agent owns is asked from the LLM.
+LOCAL_FIELDS: Dict[str, LocalDeriver] = {
+    "writer_total_lines_written": lambda text, prev: prev["writer_total_lines_written"] + count_lines(text),
+    "editor_num_lines_edited": lambda text, prev: prev["editor_num_lines_edited"] + count_lines(text),
+}
+
+# LLM fields that are only asked for while they still hold their schema default.
+STICKY_FIELDS = {"writer_topic"}
+
+
+def validate_state(values: Dict[str, Any], schema: Dict[str, Any] = PREDEFINED_STATE) -> Dict[str, Any]:
+    """Keeps schema keys only and coerces each value to the type of its schema default."""
+    validated: Dict[str, Any] = {}
+    for key, value in values.items():
+        if key not in schema:
+            continue
+        kind = type(schema[key])
+        try:
+            if kind is bool and isinstance(value, str):
+                validated[key] = value.strip().lower() in ("true", "yes", "1")
+            else:
+                validated[key] = kind(value)
+        except (TypeError, ValueError):
+            continue
+    return validated
+
+
+class StateExtractor:
+    """
+    Builds an agent's state update from its latest reply.
+
+    An agent owns the schema fields prefixed with its lower-cased type (e.g. `writer_`). Owned fields
+    in `LOCAL_FIELDS` are derived in code; the remaining ones are requested from the LLM with only the
+    previous snapshot as context, and the LLM call is skipped entirely when nothing needs it. `query`
+    may run concurrently for several turns, while `apply` must be called in turn order: it derives
+    the local fields from the current snapshot, validates the merged result against the schema and
+    writes it to the state store.
+    """
+
+    def __init__(
+        self,
+        model_client: ChatCompletionClient,
+        agent_type: str,
+        state_store: Any = None,
+        schema: Dict[str, Any] = PREDEFINED_STATE,
+    ) -> None:
+        self._model_client = model_client
+        self._schema = schema
+        self._state_store = state_store
+        prefix = f"{agent_type.lower()}_"
+        self._owned = [key for key in schema if key.startswith(prefix)]
+        self._local_fields = [key for key in self._owned if key in LOCAL_FIELDS]
+        self._llm_fields = [key for key in self._owned if key not in LOCAL_FIELDS]
+        self.snapshot: Dict[str, Any] = dict(schema)
+        self._instructions: Dict[Tuple[str, ...], SystemMessage] = {}
+        self._refresh(owned=True)
+        self.llm_calls = 0
+
+    def _refresh(self, owned: bool = False) -> None:
+        """Pulls other agents' fields from stores that expose a cheap snapshot."""
+        snapshot = getattr(self._state_store, "snapshot", None)
+        if snapshot is None:
+            return
+        # Our own fields may have writes in flight, so the local copy stays authoritative after startup.
+        for key, value in snapshot().items():
+            if owned or key not in self._owned:
+                self.snapshot[key] = value
+
+    def _pending_llm_fields(self) -> List[str]:
+        return [
+            key
+            for key in self._llm_fields
+            if key not in STICKY_FIELDS or self.snapshot[key] == self._schema[key]
+        ]
+
+    def _instruction(self, fields: List[str]) -> SystemMessage:
+        key = tuple(fields)
+        instruction = self._instructions.get(key)
+        if instruction is None:
+            field_types = ", ".join(f'"{field}": {type(self._schema[field]).__name__}' for field in fields)
+            instruction = self._instructions[key] = SystemMessage(
+                content="Update the state based on the last message and the previous state. Reply with a JSON object "
+                f"containing only these keys, replacing the types with actual values: {{{field_types}}}"
+            )
+        return instruction
+
+    async def query(self, message: AssistantMessage) -> Dict[str, Any]:
+        """Asks the LLM for the fields that cannot be derived locally; returns {} when none are needed."""
+        fields = self._pending_llm_fields()
+        if not fields:
+            return {}
+        self._refresh()
+        # The instruction only changes with the requested fields and leads the prompt; the previous
+        # snapshot changes every turn and goes last.
+        previous_state = UserMessage(content=f"The previous state is:\n{json.dumps(self.snapshot)}", source="system")
+        self.llm_calls += 1
+        result = await self._model_client.create([self._instruction(fields), message, previous_state])
+        assert isinstance(result.content, str)
+        match = _JSON_OBJECT.search(result.content)
+        if match is None:
+            return {}
+        try:
+            parsed = json.loads(match.group(0))
+        except json.JSONDecodeError:
+            return {}
+        return {key: value for key, value in validate_state(parsed, self._schema).items() if key in fields}
+
+    async def apply(self, message: AssistantMessage, llm_fields: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Merges local and LLM fields into the snapshot and writes the update to the state store."""
+        assert isinstance(message.content, str)
+        self._refresh()
+        updates = {key: LOCAL_FIELDS[key](message.content, self.snapshot) for key in self._local_fields}
+        updates.update(llm_fields or {})
+        updates = validate_state(updates, self._schema)
+        self.snapshot.update(updates)
+        if self._state_store is not None and updates:
+            result = self._state_store.update(updates)
+            # The shared memory and Manager backends are synchronous, the state service client is not.
+            if inspect.isawaitable(result):
+                await result
+        return updates
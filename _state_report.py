@@ -0,0 +1,138 @@
+import asyncio
+import weakref
+from typing import Any, Dict, List, Optional, Set
+
+from _state_extraction import StateExtractor
+from _telemetry import span
+
+from autogen_core.models import AssistantMessage, ChatCompletionClient, LLMMessage, SystemMessage
+from agent_timeslices import annotate_metric, track_time_and_memory
+
+STATE_REPORT_PROMPT = """ Please provide updates to the state based on your last message and the previous state, if any. Use the following JSON format, replacing the 'type' values with the actual values.
+        {
+            "writer_topic": str,
+            "writer_total_lines_written": int,
+            "editor_feedback_addressed": boolean,
+            "editor_num_lines_edited": int,
+        }
+        """
+
+# Reporters with work that may still be pending, so entry points can drain them before exit.
+_reporters: "weakref.WeakSet[StateReporter]" = weakref.WeakSet()
+
+
+class StateReporter:
+    """
+    Produces the per-turn JSON state report of a chat agent.
+
+    In "inline" mode the report is awaited by the caller, as part of the turn. In "background"
+    mode it runs as a separate task so the reply is published without waiting for it; at most
+    `max_concurrency` reports call the model at once and results are appended to the state
+    history in turn order. "off" disables state reports.
+    """
+
+    def __init__(
+        self,
+        model_client: ChatCompletionClient,
+        label: str,
+        mode: str = "inline",
+        max_concurrency: int = 1,
+        extractor: Optional[StateExtractor] = None,
+    ) -> None:
+        if mode not in ("inline", "background", "off"):
+            raise ValueError(f"Invalid state report mode: {mode}")
+        self._model_client = model_client
+        self.label = label
+        self._mode = mode
+        self._extractor = extractor
+        self._report_message = SystemMessage(content=STATE_REPORT_PROMPT)
+        self._history: List[LLMMessage] = []
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._applied = asyncio.Condition()
+        self._next_turn = 0
+        self._applied_turn = 0
+        # Turns whose report was cancelled before it was applied; `_applied_turn` skips them.
+        self._abandoned: Set[int] = set()
+        self._pending: Set[asyncio.Task[None]] = set()
+        _reporters.add(self)
+
+    @property
+    def mode(self) -> str:
+        return self._mode
+
+    @property
+    def history(self) -> List[LLMMessage]:
+        return self._history
+
+    async def submit(self, message: AssistantMessage) -> None:
+        """Reports the state after `message`; returns immediately unless the mode is "inline"."""
+        if self._mode == "off":
+            return
+        turn = self._next_turn
+        self._next_turn += 1
+        if self._mode == "inline":
+            await self.state_report(turn, message)
+            return
+        task = asyncio.create_task(self.state_report(turn, message))
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    @track_time_and_memory(get_label=lambda self: self.label)
+    async def state_report(self, turn: int, message: AssistantMessage) -> None:
+        new_state: LLMMessage | None = None
+        llm_fields: Dict[str, Any] = {}
+        try:
+            async with self._semaphore:
+                with span("llm.state_report", agent=self.label, mode=self.mode, turn=turn):
+                    if self._extractor is not None:
+                        llm_calls = self._extractor.llm_calls
+                        llm_fields = await self._extractor.query(message)
+                        annotate_metric(state_llm_calls=self._extractor.llm_calls - llm_calls)
+                    else:
+                        state = await self._model_client.create([self._report_message] + self._history + [message])
+                        new_state = AssistantMessage(content=state.content, source=self.label)  # type: ignore[arg-type]
+                        annotate_metric(state_llm_calls=1)
+        except Exception as e:
+            print(f"[state_report] {self.label} turn {turn} failed: {e}")
+        finally:
+            # Apply in turn order even if this report failed, so later turns are not blocked.
+            try:
+                async with self._applied:
+                    await self._applied.wait_for(lambda: self._applied_turn == turn)
+                    try:
+                        if self._extractor is not None:
+                            await self._extractor.apply(message, llm_fields)
+                        elif new_state is not None:
+                            self._history.append(new_state)
+                    except Exception as e:
+                        print(f"[state_report] {self.label} turn {turn} could not be applied: {e}")
+                    finally:
+                        self._applied_turn += 1
+                        self._skip_abandoned()
+            except asyncio.CancelledError:
+                # Cancelled while waiting for its turn: later turns must not wait for it forever.
+                if turn >= self._applied_turn:
+                    self._abandoned.add(turn)
+                    asyncio.get_running_loop().create_task(self._notify_abandoned())
+                raise
+
+    def _skip_abandoned(self) -> None:
+        """Moves `_applied_turn` past cancelled turns and wakes the waiting reports; needs the lock."""
+        while self._applied_turn in self._abandoned:
+            self._abandoned.discard(self._applied_turn)
+            self._applied_turn += 1
+        self._applied.notify_all()
+
+    async def _notify_abandoned(self) -> None:
+        async with self._applied:
+            self._skip_abandoned()
+
+    async def drain(self) -> None:
+        """Waits for all pending background reports."""
+        while self._pending:
+            await asyncio.gather(*list(self._pending), return_exceptions=True)
+
+
+async def drain_state_reports() -> None:
+    """Waits for the pending background reports of every reporter in this process."""
+    await asyncio.gather(*(reporter.drain() for reporter in list(_reporters)))
@@ -0,0 +1,244 @@
+"""
+Live OpenTelemetry metrics and traces for the agent processes.
+
+`init_telemetry` installs a meter provider (`telemetry.enabled`) and a tracer provider
+(`telemetry.tracing`) that export to the console, to JSON-lines files
+(`<out_dir>/otel_<service>.jsonl`, `<out_dir>/traces_<service>.jsonl`) or to an OTLP collector,
+so no collector is needed for local runs. The recording helpers are cheap no-ops until it is
+called, and when the OpenTelemetry SDK is not installed.
+
+Instruments:
+- `agent.handler.duration` (s): handler latency by `agent_type` and `handler`.
+- `llm.calls` / `llm.latency` (s): model calls by `agent_type`, `operation` and `cached`.
+- `messages.published`: messages published by `topic` and `message_type`.
+- `llm.cache.lookups` / `llm.cache.latency_saved` (s): response cache lookups by `agent_type`
+  and `hit`, and the model latency the hits avoided.
+
+Traces: one trace per chat turn. The manager opens a `chat.turn` root span, and the W3C trace
+context travels inside `RequestToSpeak` / `GroupChatMessage` (`trace_context`), because the gRPC
+runtime only links, rather than parents, spans across processes. The receiving side records the
+hop as a `grpc.hop <message type>` span from the moment the sender built the message, so a
+turn reads: `chat.turn` > `llm.select_speaker`, `grpc.hop RequestToSpeak` > `agent.request_to_speak`
+> `llm.reply`, `llm.state_report`, `ui.publish`, `grpc.hop GroupChatMessage` > `manager.receive`.
+`python metrics_report.py --traces logs` turns this into a per-turn critical-path breakdown.
+"""
+import json
+import os
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Mapping, Optional
+
+from _types import TelemetryConfig
+from opentelemetry import context as otel_context
+from opentelemetry import propagate, trace
+
+# Latency buckets in seconds, from sub-millisecond handler work to long LLM calls.
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+# Carrier key for the wall-clock time (ns) at which the sender built the message.
+SENT_AT_KEY = "sent_at_ns"
+
+_instruments: Dict[str, Any] = {}
+_provider: Any = None
+_tracer_provider: Any = None
+_tracer: Any = None
+
+
+def init_telemetry(service_name: str, config: TelemetryConfig) -> bool:
+    """Starts exporting metrics and traces for this process; returns False when both are off or unavailable."""
+    metrics_on = _init_metrics(service_name, config) if config.enabled else _provider is not None
+    tracing_on = _init_tracing(service_name, config) if config.tracing else _tracer is not None
+    return metrics_on or tracing_on
+
+
+def _init_metrics(service_name: str, config: TelemetryConfig) -> bool:
+    global _provider
+    if _provider is not None:
+        return True
+    try:
+        from opentelemetry import metrics
+        from opentelemetry.sdk.metrics import MeterProvider
+        from opentelemetry.sdk.metrics.export import ConsoleMetricExporter, PeriodicExportingMetricReader
+        from opentelemetry.sdk.metrics.view import ExplicitBucketHistogramAggregation, View
+        from opentelemetry.sdk.resources import Resource
+    except ImportError:
+        print("[telemetry] OpenTelemetry SDK is not installed; live metrics are disabled.")
+        return False
+
+    if config.exporter == "otlp":
+        from opentelemetry.exporter.otlp.proto.grpc.metric_exporter import OTLPMetricExporter
+
+        exporter: Any = OTLPMetricExporter(endpoint=config.otlp_endpoint) if config.otlp_endpoint else OTLPMetricExporter()
+    elif config.exporter == "file":
+        os.makedirs(config.out_dir, exist_ok=True)
+        out = open(os.path.join(config.out_dir, f"otel_{service_name}.jsonl"), "a", buffering=1)
+        exporter = ConsoleMetricExporter(out=out, formatter=lambda data: data.to_json(indent=None) + "\n")
+    else:
+        exporter = ConsoleMetricExporter()
+
+    reader = PeriodicExportingMetricReader(exporter, export_interval_millis=int(config.export_interval_seconds * 1000))
+    views = [
+        View(instrument_name=name, aggregation=ExplicitBucketHistogramAggregation(boundaries=LATENCY_BUCKETS))
+        for name in ("agent.handler.duration", "llm.latency")
+    ]
+    _provider = MeterProvider(
+        metric_readers=[reader],
+        resource=Resource.create({"service.name": service_name}),
+        views=views,
+    )
+    metrics.set_meter_provider(_provider)
+    meter = metrics.get_meter("distributed_group_chat")
+    _instruments["handler_duration"] = meter.create_histogram(
+        "agent.handler.duration", unit="s", description="Agent message handler latency"
+    )
+    _instruments["llm_calls"] = meter.create_counter("llm.calls", description="Model client calls")
+    _instruments["llm_latency"] = meter.create_histogram("llm.latency", unit="s", description="Model client latency")
+    _instruments["messages_published"] = meter.create_counter(
+        "messages.published", description="Messages published to runtime topics"
+    )
+    _instruments["cache_lookups"] = meter.create_counter("llm.cache.lookups", description="LLM response cache lookups")
+    _instruments["cache_latency_saved"] = meter.create_counter(
+        "llm.cache.latency_saved", unit="s", description="Model latency avoided by cache hits"
+    )
+    return True
+
+
+def _init_tracing(service_name: str, config: TelemetryConfig) -> bool:
+    global _tracer_provider, _tracer
+    if _tracer is not None:
+        return True
+    try:
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter
+    except ImportError:
+        print("[telemetry] OpenTelemetry SDK is not installed; tracing is disabled.")
+        return False
+
+    if config.exporter == "otlp":
+        from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPSpanExporter
+
+        exporter: Any = OTLPSpanExporter(endpoint=config.otlp_endpoint) if config.otlp_endpoint else OTLPSpanExporter()
+    elif config.exporter == "file":
+        os.makedirs(config.out_dir, exist_ok=True)
+        out = open(os.path.join(config.out_dir, f"traces_{service_name}.jsonl"), "a", buffering=1)
+        exporter = ConsoleSpanExporter(
+            out=out, formatter=lambda span: json.dumps(_span_record(service_name, span)) + "\n"
+        )
+    else:
+        exporter = ConsoleSpanExporter()
+
+    _tracer_provider = TracerProvider(resource=Resource.create({"service.name": service_name}))
+    # Batched so exporting never runs on the message handler path.
+    _tracer_provider.add_span_processor(BatchSpanProcessor(exporter))
+    _tracer = _tracer_provider.get_tracer("distributed_group_chat")
+    return True
+
+
+def _span_record(service_name: str, span: Any) -> Dict[str, Any]:
+    """Flat span record read back by `metrics_report.py --traces`."""
+    return {
+        "service": service_name,
+        "trace_id": format(span.context.trace_id, "032x"),
+        "span_id": format(span.context.span_id, "016x"),
+        "parent_id": format(span.parent.span_id, "016x") if span.parent is not None else None,
+        "name": span.name,
+        "start_ns": span.start_time,
+        "end_ns": span.end_time,
+        "attributes": dict(span.attributes or {}),
+    }
+
+
+def shutdown_telemetry() -> None:
+    """Exports the last interval and pending spans and stops the exporters."""
+    global _provider, _tracer_provider, _tracer
+    if _provider is not None:
+        _provider.shutdown()
+        _provider = None
+        _instruments.clear()
+    if _tracer_provider is not None:
+        _tracer_provider.shutdown()
+        _tracer_provider = None
+        _tracer = None
+
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Any]:
+    """Child span of the current one; yields None while tracing is off."""
+    if _tracer is None:
+        yield None
+        return
+    with _tracer.start_as_current_span(name, attributes=attributes) as current:
+        yield current
+
+
+@contextmanager
+def turn_span(name: str, **attributes: Any) -> Iterator[Any]:
+    """Root span of a new trace, used by the manager to start each chat turn."""
+    if _tracer is None:
+        yield None
+        return
+    with _tracer.start_as_current_span(name, context=otel_context.Context(), attributes=attributes) as current:
+        yield current
+
+
+@contextmanager
+def receive_span(name: str, carrier: Mapping[str, str], message_type: str, **attributes: Any) -> Iterator[Any]:
+    """
+    Handler span continuing the trace in `carrier`, preceded by a `grpc.hop <message_type>` span
+    covering serialization, the host and delivery, from the sender's timestamp to now.
+    """
+    if _tracer is None:
+        yield None
+        return
+    parent = propagate.extract(carrier) if carrier else otel_context.Context()
+    sent_at = carrier.get(SENT_AT_KEY)
+    if sent_at is not None:
+        hop = _tracer.start_span(f"grpc.hop {message_type}", context=parent, start_time=int(sent_at))
+        hop.end()
+        parent = trace.set_span_in_context(hop, parent)
+    with _tracer.start_as_current_span(name, context=parent, attributes=attributes) as current:
+        yield current
+
+
+def trace_carrier() -> Dict[str, str]:
+    """Trace context of the current span for an outgoing message; empty while tracing is off."""
+    if _tracer is None:
+        return {}
+    carrier: Dict[str, str] = {}
+    propagate.inject(carrier)
+    carrier[SENT_AT_KEY] = str(time.time_ns())
+    return carrier
+
+
+def annotate_span(**attributes: Any) -> None:
+    """Adds attributes to the current span, if any."""
+    trace.get_current_span().set_attributes(attributes)
+
+
+def record_handler(agent_type: str, handler: str, seconds: float) -> None:
+    instrument = _instruments.get("handler_duration")
+    if instrument is not None:
+        instrument.record(seconds, {"agent_type": agent_type, "handler": handler})
+
+
+def record_llm_call(agent_type: str, operation: str, seconds: float, cached: bool = False) -> None:
+    calls = _instruments.get("llm_calls")
+    if calls is not None:
+        attributes = {"agent_type": agent_type, "operation": operation, "cached": cached}
+        calls.add(1, attributes)
+        _instruments["llm_latency"].record(seconds, attributes)
+
+
+def record_cache_lookup(agent_type: str, hit: bool, latency_saved: float = 0.0) -> None:
+    lookups = _instruments.get("cache_lookups")
+    if lookups is not None:
+        lookups.add(1, {"agent_type": agent_type, "hit": hit})
+        if hit:
+            _instruments["cache_latency_saved"].add(latency_saved, {"agent_type": agent_type})
+
+
+def record_publish(topic: str, message_type: Optional[str] = None) -> None:
+    instrument = _instruments.get("messages_published")
+    if instrument is not None:
+        instrument.add(1, {"topic": topic, "message_type": message_type or ""})
@@ -0,0 +1,119 @@
+from collections import deque
+from typing import Deque, Dict, List, Optional, Sequence, Tuple
+
+from autogen_core.models import LLMMessage
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token) used for budgeting prompts."""
+    return (len(text) + 3) // 4
+
+
+def format_transcript_line(message: LLMMessage) -> Optional[str]:
+    """Formats a message as a `source: content` transcript line, or None if it has no text content."""
+    content = message.content  # type: ignore[union-attr]
+    source = getattr(message, "source", "system")
+    if isinstance(content, str):
+        return f"{source}: {content}"
+    if isinstance(content, list):
+        return f"{source}: {', '.join(content)}"  # type: ignore[arg-type]
+    return None
+
+
+class RollingTranscript:
+    """
+    Append-only conversation transcript for the group chat manager.
+
+    Each message is formatted exactly once when it is appended, and the rendered text is extended
+    with the new line instead of being joined again. The oldest lines are dropped when an optional
+    character or token cap is exceeded; only then is the rendered text cut at the new first line.
+    """
+
+    def __init__(self, max_chars: Optional[int] = None, max_tokens: Optional[int] = None) -> None:
+        self._max_chars = max_chars
+        self._max_tokens = max_tokens
+        self._lines: Deque[Tuple[str, int]] = deque()
+        self._num_chars = 0
+        self._num_tokens = 0
+        self._num_dropped = 0
+        self._rendered = ""
+
+    def __len__(self) -> int:
+        return len(self._lines)
+
+    @property
+    def num_chars(self) -> int:
+        return self._num_chars
+
+    @property
+    def num_tokens(self) -> int:
+        return self._num_tokens
+
+    @property
+    def num_dropped(self) -> int:
+        """Number of lines evicted because of the size cap."""
+        return self._num_dropped
+
+    def append(self, message: LLMMessage) -> None:
+        line = format_transcript_line(message)
+        if line is None:
+            return
+        tokens = estimate_tokens(line)
+        if self._lines:
+            # The newline joining this line to the previous one.
+            self._rendered += "\n" + line
+            self._num_chars += len(line) + 1
+        else:
+            self._rendered = line
+            self._num_chars = len(line)
+        self._lines.append((line, tokens))
+        self._num_tokens += tokens
+        self._enforce_cap()
+
+    def _over_cap(self) -> bool:
+        if self._max_chars is not None and self._num_chars > self._max_chars:
+            return True
+        if self._max_tokens is not None and self._num_tokens > self._max_tokens:
+            return True
+        return False
+
+    def _enforce_cap(self) -> None:
+        # Always keep the newest line, even if it alone exceeds the cap.
+        cut = 0
+        while len(self._lines) > 1 and self._over_cap():
+            line, tokens = self._lines.popleft()
+            # The line and the newline after it.
+            cut += len(line) + 1
+            self._num_chars -= len(line) + 1
+            self._num_tokens -= tokens
+            self._num_dropped += 1
+        if cut:
+            self._rendered = self._rendered[cut:]
+
+    def render(self) -> str:
+        return self._rendered
+
+
+class ParticipantCatalog:
+    """
+    Caches the roles and participants strings of the selector prompt.
+
+    `roles` describes every participant and never changes, so it can sit in the stable head of the
+    prompt. The participants list depends on which participants are candidates for the next turn,
+    so it is built once per distinct candidate set instead of on every turn.
+    """
+
+    def __init__(self, topic_types: List[str], descriptions: List[str]) -> None:
+        self.roles = "\n".join(
+            f"{topic_type}: {description}".strip()
+            for topic_type, description in zip(topic_types, descriptions, strict=True)
+        )
+        self._cache: Dict[Tuple[str, ...], str] = {}
+
+    def participants(self, candidates: Sequence[str]) -> str:
+        """Returns the `candidates` as a list literal, in the order given."""
+        key = tuple(candidates)
+        cached = self._cache.get(key)
+        if cached is None:
+            cached = self._cache[key] = str(list(key))
+        return cached
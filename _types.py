@@ -1,5 +1,5 @@
 from dataclasses import dataclass
-from typing import Dict
+from typing import Dict, List, Literal, Optional
 
 from autogen_core.models import (
     LLMMessage,
@@ -12,12 +12,20 @@ class GroupChatMessage(BaseModel):
     """Implements a sample message sent by an LLM agent"""
 
     body: LLMMessage
+    # W3C trace context of the turn that produced the message; see _telemetry.trace_carrier.
+    trace_context: Dict[str, str] = {}
 
 
 class RequestToSpeak(BaseModel):
     """Message type for agents to speak"""
 
-    pass
+    trace_context: Dict[str, str] = {}
+
+
+class ReadinessProbe(BaseModel):
+    """Sent directly to a participant; answered with `ready=True` once all its subscriptions are added"""
+
+    ready: bool = False
 
 
 @dataclass
@@ -41,10 +49,195 @@ class HostConfig(BaseModel):
         return f"{self.hostname}:{self.port}"
 
 
+# Define handler tracking configuration model
+class TrackingConfig(BaseModel):
+    # See agent_timeslices.configure_tracking: off | timing | sampled | continuous
+    mode: Literal["off", "timing", "sampled", "continuous"] = "sampled"
+    # "sampled" traces 1 in sample_every calls
+    sample_every: int = 50
+
+
+# Define metrics sink configuration model
+class MetricsConfig(BaseModel):
+    # Directory the handler records are streamed to; defaults to the entry point's report folder.
+    out_dir: Optional[str] = None
+    flush_interval_seconds: float = 1.0
+    # Maximum number of unflushed records kept in memory.
+    capacity: int = 65536
+
+
+# Define per-process resource timeline configuration model
+class ResourceSamplerConfig(BaseModel):
+    # See agent_metrics.ResourceSampler; appends to logs/timeline_<agent>.csv every metrics.flush_interval_seconds.
+    enabled: bool = True
+    interval_seconds: float = 0.5
+    uss_every: int = 10
+    # Fraction of one core the sampler may use before it lengthens its interval.
+    max_overhead: float = 0.01
+
+
+# Define local LLM stand-in configuration models
+class DistributionConfig(BaseModel):
+    # constant | uniform | normal | lognormal, described by mean and standard deviation; samples are clamped at 0.
+    kind: Literal["constant", "uniform", "normal", "lognormal"] = "constant"
+    mean: float = 0.0
+    stddev: float = 0.0
+
+
+class FakeLLMConfig(BaseModel):
+    hostname: str = "localhost"
+    port: int = 8000
+    model: str = "fake-model"
+    ttft_seconds: DistributionConfig = DistributionConfig(kind="lognormal", mean=0.2, stddev=0.05)
+    per_token_seconds: DistributionConfig = DistributionConfig(kind="normal", mean=0.02, stddev=0.005)
+    response_tokens: DistributionConfig = DistributionConfig(kind="normal", mean=120, stddev=30)
+    # Speaker selection answers by turn; empty picks the first offered participant (alternating speakers).
+    role_sequence: List[str] = []
+    # Answer FINISH to the selector once this many speaker turns are in the transcript.
+    finish_after: int = 6
+    # Sequences decoded at once, like vLLM's max_num_seqs; further requests queue.
+    max_concurrency: int = 16
+    # Per-token slowdown per additional running sequence (0.05 = 5% slower per extra sequence).
+    batch_slowdown: float = 0.0
+    # Blocks of the simulated prefix cache (0 disables it) and the prefill time of each uncached prompt token.
+    prefix_cache_blocks: int = 65536
+    prefill_seconds_per_token: float = 0.0
+    seed: int = 0
+
+
+# Define LLM response cache configuration model
+class LLMCacheConfig(BaseModel):
+    # See _model_clients.CachingChatCompletionClient: off | read_through | record_only
+    mode: Literal["off", "read_through", "record_only"] = "off"
+    # In-memory LRU size; least recently used entries are evicted beyond it.
+    max_bytes: int = 64 * 1024 * 1024
+    # Optional directory shared by all processes; null keeps the cache in memory only.
+    disk_dir: Optional[str] = None
+
+
+# Define garbage-collector instrumentation and tuning configuration model
+class GCConfig(BaseModel):
+    # See _gc_tuning: default | freeze | thresholds | between_turns
+    mode: Literal["default", "freeze", "thresholds", "between_turns"] = "default"
+    # gc.set_threshold values for "thresholds"; for "between_turns", the safety-net thresholds.
+    thresholds: Optional[List[int]] = None
+    # Record every collection to logs/gc_<agent>.csv and into the handler records.
+    monitor: bool = False
+
+
+# Define live OpenTelemetry metrics and tracing configuration model
+class TelemetryConfig(BaseModel):
+    enabled: bool = False
+    # "console" prints to stdout, "file" appends JSON lines to <out_dir>/otel_<service>.jsonl, "otlp" sends to a collector.
+    exporter: Literal["console", "file", "otlp"] = "file"
+    export_interval_seconds: float = 10.0
+    out_dir: str = "logs"
+    otlp_endpoint: Optional[str] = None
+    # One trace per chat turn across processes, exported to <out_dir>/traces_<service>.jsonl with the "file" exporter.
+    tracing: bool = False
+
+
+# Define per-session instance eviction configuration model
+class SessionsConfig(BaseModel):
+    # See _sessions.SessionReaper; null disables the idle timeout.
+    idle_timeout_seconds: Optional[float] = 600.0
+    sweep_interval_seconds: float = 30.0
+    # Optional cap on the session instances per agent process; the least recently active idle ones go first.
+    max_sessions: Optional[int] = None
+
+
+# Define startup readiness configuration model
+class ReadinessConfig(BaseModel):
+    # See _readiness: how long startup waits for the host, the LLM endpoint and the participants, and how often it checks.
+    timeout_seconds: float = 120.0
+    # Loading model weights can take minutes, so the LLM endpoint gets its own limit.
+    llm_timeout_seconds: float = 600.0
+    poll_interval_seconds: float = 0.1
+
+
+# Define process supervisor configuration model
+class SupervisorConfig(BaseModel):
+    # See supervisor.Supervisor: crashed children are restarted after a backoff that doubles up to the maximum.
+    restart: bool = True
+    restart_backoff_seconds: float = 0.5
+    max_backoff_seconds: float = 30.0
+    # Restarts allowed per child; the backoff resets once a child stays up for `stable_seconds`.
+    max_restarts: int = 5
+    stable_seconds: float = 60.0
+    # Time a child gets to drain and save its metrics after SIGTERM before its process group is killed.
+    drain_timeout_seconds: float = 30.0
+
+
+# Define CPU placement configuration model
+class PlacementConfig(BaseModel):
+    # See _placement: none | compact | cores | spread
+    policy: Literal["none", "compact", "cores", "spread"] = "cores"
+    # Physical cores (with their SMT siblings) reserved for the LLM server's CPU threads; agents never run on them.
+    llm_cores: int = 6
+    # NUMA node of the reserved cores, the one closest to the LLM server's GPUs; null takes the first node.
+    llm_numa_node: Optional[int] = None
+
+
+# Define agent runtime configuration model
+class RuntimeConfig(BaseModel):
+    # "distributed" runs every agent in its own process behind the gRPC host (run_host.py and the
+    # run_*_agent.py scripts); "in_process" registers all of them in one runtime (run_in_process.py).
+    mode: Literal["distributed", "in_process"] = "distributed"
+
+
+# Define shared state service configuration model
+class StateServiceConfig(BaseModel):
+    enabled: bool = False
+    hostname: str = "localhost"
+    port: int = 50070
+    # Run the service inside run_host.py instead of run_state_service.py.
+    cohost: bool = True
+
+
+# Define speaker selection configuration model
+class SpeakerSelectionConfig(BaseModel):
+    # See _speaker_selection: llm | round_robin | graph | hybrid
+    mode: Literal["llm", "round_robin", "graph", "hybrid"] = "llm"
+    # Allowed next speakers per previous speaker ("start" for the first turn), used by "graph" and "hybrid".
+    transitions: Dict[str, List[str]] = {}
+
+
 # Define GroupChatManager configuration model
 class GroupChatManagerConfig(BaseModel):
     topic_type: str
     max_rounds: int
+    # Message the manager posts on behalf of the user at startup; null waits for conversations started elsewhere.
+    initial_message: Optional[str] = "Please write a short story about the gingerbread in halloween!"
+    # Optional cap on the selector transcript; the oldest lines are dropped first.
+    transcript_max_chars: Optional[int] = None
+    transcript_max_tokens: Optional[int] = None
+    speaker_selection: SpeakerSelectionConfig = SpeakerSelectionConfig()
+
+
+# Define chat agent context policy configuration model
+class ContextPolicyConfig(BaseModel):
+    # "full" sends the whole history, "last_n" keeps the newest `max_messages`,
+    # "token_budget" keeps the newest messages that fit `max_tokens`, and "summary"
+    # folds older messages into a running summary while keeping `summary_keep_messages`.
+    mode: Literal["full", "last_n", "token_budget", "summary"] = "full"
+    max_messages: int = 20
+    max_tokens: int = 4096
+    # Fraction of the cap trimmed beyond what "last_n" and "token_budget" need, so the prompt prefix
+    # stays cacheable by the LLM server for several turns after each trim.
+    trim_slack: float = 0.0
+    summary_keep_messages: int = 6
+    # Number of messages beyond `summary_keep_messages` that triggers a background summary refresh.
+    summary_refresh_messages: int = 4
+
+
+# Define chat agent state report configuration model
+class StateReportConfig(BaseModel):
+    # "inline" awaits the report within the turn, "background" runs it after the reply is published.
+    mode: Literal["inline", "background", "off"] = "inline"
+    max_concurrency: int = 1
+    # "llm" asks the model for the whole report with the full state history; "hybrid" derives
+    # what it can in code and asks the model only for the rest, given the previous snapshot.
+    extraction: Literal["llm", "hybrid"] = "llm"
 
 
 # Define WriterAgent configuration model
@@ -52,12 +245,23 @@ class ChatAgentConfig(BaseModel):
     topic_type: str
     description: str
     system_message: str
+    context: ContextPolicyConfig = ContextPolicyConfig()
+    state_report: StateReportConfig = StateReportConfig()
+    # Stream model deltas to the UI as they arrive instead of replaying the finished reply.
+    stream_from_model: bool = False
 
 
 # Define UI Agent configuration model
 class UIAgentConfig(BaseModel):
     topic_type: str
-    artificial_stream_delay_seconds: Dict[str, float]
+    # Optional delay between words when replaying a finished reply; ignored in benchmark mode.
+    artificial_stream_delay_seconds: Dict[str, float] = {}
+    # Streamed text is coalesced into frames of up to this many characters or this much latency.
+    chunk_max_chars: int = 64
+    chunk_max_latency_seconds: float = 0.05
+    # Frames queued per message before new text is merged into the last queued frame.
+    max_pending_frames: int = 8
+    benchmark_mode: bool = False
 
     @property
     def min_delay(self) -> float:
@@ -67,6 +271,10 @@ class UIAgentConfig(BaseModel):
     def max_delay(self) -> float:
         return self.artificial_stream_delay_seconds.get("max", 0.0)
 
+    @property
+    def stream_delay_enabled(self) -> bool:
+        return not self.benchmark_mode and self.max_delay > 0
+
 
 # Define the overall AppConfig model
 class AppConfig(BaseModel):
@@ -75,4 +283,17 @@ class AppConfig(BaseModel):
     writer_agent: ChatAgentConfig
     editor_agent: ChatAgentConfig
     ui_agent: UIAgentConfig
+    runtime: RuntimeConfig = RuntimeConfig()
+    readiness: ReadinessConfig = ReadinessConfig()
+    supervisor: SupervisorConfig = SupervisorConfig()
+    placement: PlacementConfig = PlacementConfig()
+    state_service: StateServiceConfig = StateServiceConfig()
+    tracking: TrackingConfig = TrackingConfig()
+    metrics: MetricsConfig = MetricsConfig()
+    resources: ResourceSamplerConfig = ResourceSamplerConfig()
+    gc: GCConfig = GCConfig()
+    llm_cache: LLMCacheConfig = LLMCacheConfig()
+    fake_llm: FakeLLMConfig = FakeLLMConfig()
+    telemetry: TelemetryConfig = TelemetryConfig()
+    sessions: SessionsConfig = SessionsConfig()
     client_config: OpenAIClientConfiguration = None  # type: ignore[assignment] # This was required to do custom instantiation in `load_config`
\ No newline at end of file
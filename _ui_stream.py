@@ -0,0 +1,137 @@
+import asyncio
+import time
+from collections import deque
+from typing import Deque, Optional
+from uuid import uuid4
+
+from _telemetry import record_publish
+from _types import MessageChunk, UIAgentConfig
+from autogen_core import AgentRuntime, DefaultTopicId, RoutedAgent
+
+
+def conversation_topic_id(runtime: RoutedAgent | AgentRuntime, topic_type: str) -> DefaultTopicId:
+    """
+    Topic of `topic_type` in the conversation `runtime` belongs to.
+
+    Agents are keyed by the topic source of the conversation they serve, so an agent publishes to
+    its own key. `DefaultTopicId` cannot infer it under the gRPC worker runtime, which runs
+    handlers outside the message handler context, so it is passed explicitly. Publishing from a
+    runtime outside any agent uses the "default" conversation.
+    """
+    source = runtime.id.key if isinstance(runtime, RoutedAgent) else None
+    return DefaultTopicId(type=topic_type, source=source)
+
+
+class UIChunkPublisher:
+    """
+    Streams one message to the UI topic as coalesced `MessageChunk` frames.
+
+    Text passed to `write` is buffered and emitted as a single frame once the buffer reaches
+    `ui_config.chunk_max_chars` or has been pending for `ui_config.chunk_max_latency_seconds`,
+    so a long reply costs a handful of publishes instead of one per word. Frames are sent in
+    order by a single sender task. When the runtime falls behind and
+    `ui_config.max_pending_frames` frames are already queued, new text is merged into the last
+    queued frame instead of growing the queue. `close` flushes the remainder, sends the
+    `finished` frame and waits for the queue to drain.
+    """
+
+    def __init__(
+        self,
+        runtime: RoutedAgent | AgentRuntime,
+        source: str,
+        ui_config: UIAgentConfig,
+        message_id: Optional[str] = None,
+    ) -> None:
+        self._runtime = runtime
+        self._source = source
+        self._topic_id = conversation_topic_id(runtime, ui_config.topic_type)
+        self._max_chars = ui_config.chunk_max_chars
+        self._max_latency = ui_config.chunk_max_latency_seconds
+        self._max_pending = max(1, ui_config.max_pending_frames)
+        self.message_id = message_id or str(uuid4())
+        self._buffer: list[str] = []
+        self._buffered_chars = 0
+        self._flush_timer: Optional[asyncio.Task[None]] = None
+        self._pending: Deque[MessageChunk] = deque()
+        self._has_pending = asyncio.Event()
+        self._sender: Optional[asyncio.Task[None]] = None
+        self._closed = False
+        self.frames_published = 0
+        self.frames_merged = 0
+
+    async def write(self, text: str) -> None:
+        if not text:
+            return
+        self._buffer.append(text)
+        self._buffered_chars += len(text)
+        if self._buffered_chars >= self._max_chars:
+            self.flush()
+        elif self._flush_timer is None:
+            self._flush_timer = asyncio.create_task(self._flush_after_latency())
+        # Give the sender a chance to run when the caller never awaits anything else.
+        await asyncio.sleep(0)
+
+    async def _flush_after_latency(self) -> None:
+        await asyncio.sleep(self._max_latency)
+        self._flush_timer = None
+        self.flush()
+
+    def flush(self) -> None:
+        """Moves buffered text into the send queue."""
+        if not self._buffer:
+            return
+        text = "".join(self._buffer)
+        self._buffer.clear()
+        self._buffered_chars = 0
+        self._enqueue(text, finished=False)
+
+    def _enqueue(self, text: str, finished: bool) -> None:
+        if self._pending and len(self._pending) >= self._max_pending and not self._pending[-1].finished:
+            # Back-pressure: fold the text into the newest queued frame rather than queueing more.
+            last = self._pending[-1]
+            last.text += text
+            last.finished = finished
+            self.frames_merged += 1
+        else:
+            self._pending.append(
+                MessageChunk(message_id=self.message_id, text=text, author=self._source, finished=finished)
+            )
+        self._has_pending.set()
+        if self._sender is None:
+            self._sender = asyncio.create_task(self._send_loop())
+
+    async def _send_loop(self) -> None:
+        while True:
+            await self._has_pending.wait()
+            while self._pending:
+                chunk = self._pending.popleft()
+                await self._runtime.publish_message(chunk, self._topic_id)
+                self.frames_published += 1
+                record_publish(self._topic_id.type, "MessageChunk")
+                if chunk.finished:
+                    return
+            self._has_pending.clear()
+
+    async def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        if self._flush_timer is not None:
+            self._flush_timer.cancel()
+            self._flush_timer = None
+        self.flush()
+        self._enqueue(" ", finished=True)
+        assert self._sender is not None
+        await self._sender
+
+
+class TimeToFirstToken:
+    """Measures the time from construction to the first call of `mark`."""
+
+    def __init__(self) -> None:
+        self._start = time.perf_counter()
+        self.seconds: Optional[float] = None
+
+    def mark(self) -> None:
+        if self.seconds is None:
+            self.seconds = time.perf_counter() - self._start
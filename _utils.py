@@ -6,7 +6,6 @@ import yaml
 from _types import AppConfig
 from autogen_core import MessageSerializer, try_get_known_serializers_for_type
 from autogen_ext.models.openai.config import OpenAIClientConfiguration
-from azure.identity import DefaultAzureCredential, get_bearer_token_provider
 
 
 def load_config(file_path: str = os.path.join(os.path.dirname(__file__), "config.yaml")) -> AppConfig:
@@ -20,6 +19,9 @@ def load_config(file_path: str = os.path.join(os.path.dirname(__file__), "config
 
     aad_params = {}
     if len(model_client.get("api_key", "")) == 0:
+        # Only needed for Azure AD auth, and slow to import, so agents with an API key never load it.
+        from azure.identity import DefaultAzureCredential, get_bearer_token_provider
+
         aad_params["azure_ad_token_provider"] = get_bearer_token_provider(
             DefaultAzureCredential(), "https://cognitiveservices.azure.com/.default"
         )
@@ -1,21 +1,199 @@
 # agent_metrics.py
 import time
 import atexit
+import math
 import psutil
+import resource
 import socket
 import os
+import sys
+import threading
+from array import array
 from datetime import datetime
+from typing import Dict, Optional
 
 _process = psutil.Process()
 _start_time = time.time()
 
-def init_metrics(agent_name: str, log_dir: str = "logs"):
+# Columns of the resource timeline; `timestamp` is wall-clock seconds, like the handler records
+# of agent_timeslices, so both can be lined up (a handler ran from `timestamp - duration_sec`).
+TIMELINE_COLUMNS = (
+    "timestamp",
+    "rss_bytes",
+    "uss_bytes",
+    "cpu_percent",
+    "num_threads",
+    "ctx_switches_voluntary",
+    "ctx_switches_involuntary",
+    "num_fds",
+)
+
+
+class ResourceSampler:
+    """
+    Background thread sampling this process's RSS, USS, CPU percent, thread count, context
+    switches and open file descriptors every `interval_seconds`.
+
+    Samples live in fixed-size `array` columns and are appended to
+    `<log_dir>/timeline_<agent>.csv` every `flush_interval_seconds`, or sooner once `flush_every`
+    samples are buffered, so memory stays constant for any run length and a killed process loses
+    at most the last interval. A restarted agent appends to the file of its earlier runs; the
+    timestamps tell the runs apart. USS needs a full walk of the memory maps, so it is refreshed only every
+    `uss_every` samples and repeated in between. The thread's own CPU time is tracked and, when
+    it exceeds `max_overhead` of one core, the interval is doubled.
+    """
+
+    def __init__(
+        self,
+        agent_name: str,
+        log_dir: str = "logs",
+        interval_seconds: float = 0.5,
+        uss_every: int = 10,
+        flush_every: int = 120,
+        max_overhead: float = 0.01,
+        flush_interval_seconds: float = 1.0,
+    ) -> None:
+        self.agent_name = agent_name
+        self.interval_seconds = interval_seconds
+        self._uss_every = max(1, uss_every)
+        self._flush_every = max(1, flush_every)
+        self._flush_interval = flush_interval_seconds
+        self._last_flush = time.time()
+        self._max_overhead = max_overhead
+        self._columns = {name: array("d", bytes(8 * self._flush_every)) for name in TIMELINE_COLUMNS}
+        self._count = 0
+        self.samples = 0
+        self.peaks: Dict[str, float] = dict.fromkeys(TIMELINE_COLUMNS[1:], 0.0)
+        self.overhead_cpu_sec = 0.0
+        self._last_uss = math.nan
+        self._last_cpu: Optional[float] = None
+        self._last_wall = 0.0
+        os.makedirs(log_dir, exist_ok=True)
+        self.path = os.path.join(log_dir, f"timeline_{agent_name}.csv")
+        if not os.path.exists(self.path) or os.path.getsize(self.path) == 0:
+            with open(self.path, "w") as f:
+                f.write(",".join(TIMELINE_COLUMNS) + "\n")
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"resource-sampler-{agent_name}", daemon=True)
+
+    def start(self) -> None:
+        self._started_at = time.time()
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
+        self._flush()
+
+    @property
+    def overhead_fraction(self) -> float:
+        """Sampler CPU time as a fraction of one core over the sampler's lifetime."""
+        elapsed = time.time() - self._started_at
+        return self.overhead_cpu_sec / elapsed if elapsed > 0 else 0.0
+
+    def _run(self) -> None:
+        # Overhead is judged per window of `uss_every` samples, which includes one USS refresh.
+        window_spent = 0.0
+        while not self._stop.wait(self.interval_seconds):
+            cpu_start = time.thread_time()
+            self.sample()
+            spent = time.thread_time() - cpu_start
+            self.overhead_cpu_sec += spent
+            window_spent += spent
+            if self.samples % self._uss_every == 0:
+                if window_spent > self._max_overhead * self.interval_seconds * self._uss_every:
+                    self.interval_seconds *= 2
+                    print(
+                        f"[agent_metrics] Resource sampler used {window_spent * 1000:.2f} ms CPU in "
+                        f"{self._uss_every} samples; interval raised to {self.interval_seconds:.2f}s."
+                    )
+                window_spent = 0.0
+
+    def sample(self) -> None:
+        now = time.time()
+        with _process.oneshot():
+            cpu_times = _process.cpu_times()
+            rss = _process.memory_info().rss
+            num_threads = _process.num_threads()
+            ctx = _process.num_ctx_switches()
+            num_fds = _process.num_fds() if hasattr(_process, "num_fds") else _process.num_handles()
+        if self.samples % self._uss_every == 0:
+            try:
+                self._last_uss = _process.memory_full_info().uss
+            except (psutil.AccessDenied, AttributeError):
+                self._last_uss = math.nan
+        cpu = cpu_times.user + cpu_times.system
+        if self._last_cpu is None:
+            cpu_percent = math.nan
+        else:
+            cpu_percent = 100.0 * (cpu - self._last_cpu) / max(now - self._last_wall, 1e-9)
+        self._last_cpu, self._last_wall = cpu, now
+
+        values = (now, rss, self._last_uss, cpu_percent, num_threads, ctx.voluntary, ctx.involuntary, num_fds)
+        slot = self._count
+        for name, value in zip(TIMELINE_COLUMNS, values):
+            self._columns[name][slot] = value
+            if name != "timestamp" and value > self.peaks[name]:
+                self.peaks[name] = value
+        self._count += 1
+        self.samples += 1
+        if self._count == self._flush_every or now - self._last_flush >= self._flush_interval:
+            self._flush()
+
+    def _flush(self) -> None:
+        self._last_flush = time.time()
+        if not self._count:
+            return
+        with open(self.path, "a") as f:
+            for i in range(self._count):
+                f.write(",".join(_format(self._columns[name][i]) for name in TIMELINE_COLUMNS) + "\n")
+        self._count = 0
+
+
+def _format(value: float) -> str:
+    if math.isnan(value):
+        return ""
+    return repr(value) if value != int(value) else str(int(value))
+
+
+def _peak_rss_bytes() -> int:
+    """The kernel's RSS high-water mark, which also covers spikes between samples."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def init_metrics(
+    agent_name: str,
+    log_dir: str = "logs",
+    sample_interval_seconds: float | None = None,
+    uss_every: int = 10,
+    max_overhead: float = 0.01,
+    flush_interval_seconds: float = 1.0,
+) -> ResourceSampler | None:
+    """
+    Writes a run summary to `log_dir` at exit and, when `sample_interval_seconds` is set, starts
+    a `ResourceSampler` recording the resource timeline of the run.
+    """
     os.makedirs(log_dir, exist_ok=True)
     hostname = socket.gethostname()
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     _metrics_file = os.path.join(log_dir, f"{agent_name}_metrics_{timestamp}.txt")
+    sampler = None
+    if sample_interval_seconds:
+        sampler = ResourceSampler(
+            agent_name,
+            log_dir,
+            sample_interval_seconds,
+            uss_every,
+            max_overhead=max_overhead,
+            flush_interval_seconds=flush_interval_seconds,
+        )
+        sampler.start()
 
     def log_metrics():
+        if sampler is not None:
+            sampler.stop()
         end_time = time.time()
         cpu = _process.cpu_times()
         mem = _process.memory_info().rss / (1024 * 1024)  # MB
@@ -27,7 +205,19 @@ def init_metrics(agent_name: str, log_dir: str = "logs"):
             f.write(f"Wall-clock Duration: {end_time - _start_time:.2f} seconds\n")
             f.write(f"User CPU Time: {cpu.user:.2f} seconds\n")
             f.write(f"System CPU Time: {cpu.system:.2f} seconds\n")
-            f.write(f"Peak Memory (RSS): {mem:.2f} MB\n")
+            f.write(f"Peak Memory (RSS): {_peak_rss_bytes() / (1024 * 1024):.2f} MB\n")
+            f.write(f"Final Memory (RSS): {mem:.2f} MB\n")
+            if sampler is not None:
+                peaks = sampler.peaks
+                f.write(f"Sampled Peak RSS: {peaks['rss_bytes'] / (1024 * 1024):.2f} MB\n")
+                f.write(f"Sampled Peak USS: {peaks['uss_bytes'] / (1024 * 1024):.2f} MB\n")
+                f.write(f"Peak CPU: {peaks['cpu_percent']:.1f}%\n")
+                f.write(f"Peak Threads: {int(peaks['num_threads'])}\n")
+                f.write(f"Peak Open FDs: {int(peaks['num_fds'])}\n")
+                f.write(f"Samples: {sampler.samples} (final interval {sampler.interval_seconds:.2f}s)\n")
+                f.write(f"Sampler Overhead: {100 * sampler.overhead_fraction:.3f}% of a core\n")
+                f.write(f"Timeline: {sampler.path}\n")
 
     atexit.register(log_metrics)
-    print(f"Metrics logging initialized for agent '{agent_name}'. Logs will be saved to '{_metrics_file}'.")
\ No newline at end of file
+    print(f"Metrics logging initialized for agent '{agent_name}'. Logs will be saved to '{_metrics_file}'.")
+    return sampler
@@ -1,38 +1,195 @@
+import asyncio
+import itertools
 import time
 import tracemalloc
+import types
 import threading
-import csv
 import os
-from typing import Callable, Dict, List
-import matplotlib.pyplot as plt
-import numpy as np
+import shutil
+from typing import Any, Callable, Dict, List, Optional, Tuple
 import functools
+from contextvars import ContextVar
 
-# Use Gruvbox dark theme style
-plt.style.use("dark_background")
+from _gc_tuning import gc_pause_totals
+from _metrics_sink import MetricsFlusher, MetricsRing
+from _telemetry import record_handler
+
+# Shared, bounded metrics buffer; `start_metrics_sink` streams it to disk while the process runs.
+agent_metrics = MetricsRing()
+_flusher: Optional[MetricsFlusher] = None
+
+# Record of the innermost tracked handler running in the current task.
+_current_metric: ContextVar[Optional[Dict]] = ContextVar("_current_metric", default=None)
+
+
+def annotate_metric(**fields: Any) -> None:
+    """
+    Adds extra columns to the metric record of the tracked handler currently running.
+    Does nothing outside a tracked handler.
+    """
+    metric = _current_metric.get()
+    if metric is not None:
+        metric.update(fields)
+
+
+TRACKING_MODES = ("off", "timing", "sampled", "continuous")
+
+# Process-wide tracking configuration; see `configure_tracking`.
+_tracking: Dict[str, Any] = {"mode": "sampled", "sample_every": 50}
+_call_counter = itertools.count()
+# Tracked calls currently running, used to detect nesting and concurrency.
+_active_calls: List["_ActiveCall"] = []
+# Call that started tracemalloc in "sampled" mode and is the only one allowed to stop it.
+_sampling_owner: Optional["_ActiveCall"] = None
+
+
+class _ActiveCall:
+    __slots__ = ("task", "overlapped", "nested", "net_memory", "peak_memory", "_step_base")
+
+    def __init__(self, task: Optional[asyncio.Task]) -> None:
+        self.task = task
+        self.overlapped = False
+        self.nested = False
+        # "continuous" mode: memory allocated during this call's own steps, and the highest it reached.
+        self.net_memory = 0
+        self.peak_memory = 0
+        self._step_base = 0
+
+    def begin_step(self) -> None:
+        # A nested call runs inside a step of its caller, whose peak must not be reset.
+        if not self.nested:
+            tracemalloc.reset_peak()
+        self._step_base = tracemalloc.get_traced_memory()[0]
+
+    def end_step(self) -> None:
+        current, peak = tracemalloc.get_traced_memory()
+        if not self.nested:
+            self.peak_memory = max(self.peak_memory, self.net_memory + peak - self._step_base)
+        self.net_memory += current - self._step_base
+
+
+@types.coroutine
+def _attributed(coro: Any, call: _ActiveCall) -> Any:
+    """
+    Runs `coro` one step at a time and measures traced memory around each step. The event loop runs
+    one task at a time, so what changes during this call's steps was allocated by its own task;
+    other tasks run between the steps and are not counted.
+    """
+    value: Any = None
+    error: Optional[BaseException] = None
+    while True:
+        call.begin_step()
+        try:
+            yielded = coro.send(value) if error is None else coro.throw(error)
+        except StopIteration as stop:
+            call.end_step()
+            return stop.value
+        except BaseException:
+            call.end_step()
+            raise
+        call.end_step()
+        try:
+            value, error = (yield yielded), None
+        except BaseException as e:
+            value, error = None, e
+
+
+def configure_tracking(mode: str = "sampled", sample_every: int = 50) -> None:
+    """
+    Selects how `track_time_and_memory` measures handlers:
+
+    - "off": handlers run unwrapped and no records are produced.
+    - "timing": duration only; tracemalloc is never started.
+    - "sampled": memory is traced for 1 in `sample_every` calls. A sampled call owns tracemalloc for
+      its duration, so calls that start meanwhile (nested or concurrent) record timing only. If a
+      concurrent call overlapped it, its figures would include that call's allocations, so the
+      record is marked `concurrent` and carries no memory figures.
+    - "continuous": tracemalloc stays on for the process lifetime. The handler is stepped through
+      `_attributed`, so every call records the net and peak allocation of its own task, even when
+      handlers run concurrently; a nested call records its net allocation only.
+    """
+    if mode not in TRACKING_MODES:
+        raise ValueError(f"Invalid tracking mode: {mode}")
+    if _tracking["mode"] == "continuous" and mode != "continuous" and tracemalloc.is_tracing():
+        tracemalloc.stop()
+    _tracking["mode"] = mode
+    _tracking["sample_every"] = max(1, sample_every)
+    if mode == "continuous" and not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+
+def _begin_call(mode: str) -> Tuple[_ActiveCall, bool]:
+    global _sampling_owner
+    call = _ActiveCall(asyncio.current_task())
+    for other in _active_calls:
+        if other.task is call.task:
+            call.nested = True
+        else:
+            other.overlapped = True
+            call.overlapped = True
+    traced = False
+    if mode == "sampled":
+        if _sampling_owner is None and not tracemalloc.is_tracing() and next(_call_counter) % _tracking["sample_every"] == 0:
+            tracemalloc.start()
+            _sampling_owner = call
+            traced = True
+    elif mode == "continuous" and tracemalloc.is_tracing():
+        traced = True
+    _active_calls.append(call)
+    return call, traced
+
+
+def _end_call(call: _ActiveCall, mode: str, traced: bool, metric: Dict[str, Any]) -> None:
+    global _sampling_owner
+    _active_calls.remove(call)
+    metric["memory_mode"] = mode
+    metric["concurrent"] = call.overlapped
+    if not traced or not tracemalloc.is_tracing():
+        return
+    if mode == "sampled":
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        _sampling_owner = None
+        # Both figures would include what overlapping calls of other tasks allocated.
+        if not call.overlapped:
+            metric["peak_memory_bytes"] = peak
+            metric["net_memory_bytes"] = current
+    else:
+        metric["net_memory_bytes"] = call.net_memory
+        if not call.nested:
+            metric["peak_memory_bytes"] = call.peak_memory
 
-# Shared metrics list
-agent_metrics: List[Dict] = []
 
 def track_time_and_memory(get_label: Callable = lambda self: "unknown"):
     """
-    Decorator to measure execution time and peak memory usage.
+    Decorator to measure execution time and, depending on the tracking mode, memory usage.
+    Each record also reports the time spent in the tracker itself (`tracker_overhead_sec`).
     """
     def decorator(func):
         @functools.wraps(func)
         async def wrapper(self, *args, **kwargs):
+            mode = _tracking["mode"]
+            if mode == "off":
+                return await func(self, *args, **kwargs)
+
+            overhead_start = time.perf_counter()
             thread_id = threading.get_ident()
             agent_label = get_label(self)
 
+            extra: Dict[str, Any] = {}
+            token = _current_metric.set(extra)
+            call, traced = _begin_call(mode)
+            gc_before = gc_pause_totals()
             start_time = time.perf_counter()
-            tracemalloc.start()
 
             try:
-                result = await func(self, *args, **kwargs)
+                if traced and mode == "continuous":
+                    result = await _attributed(func(self, *args, **kwargs), call)
+                else:
+                    result = await func(self, *args, **kwargs)
             finally:
-                current, peak = tracemalloc.get_traced_memory()
-                tracemalloc.stop()
                 end_time = time.perf_counter()
+                _current_metric.reset(token)
 
                 duration = end_time - start_time
                 metric = {
@@ -40,69 +197,69 @@ def track_time_and_memory(get_label: Callable = lambda self: "unknown"):
                     "function": func.__name__,
                     "thread_id": thread_id,
                     "duration_sec": duration,
-                    "peak_memory_bytes": peak,
                 }
+                _end_call(call, mode, traced, metric)
+                if gc_before is not None:
+                    gc_after = gc_pause_totals() or gc_before
+                    metric["gc_pause_sec"] = gc_after[0] - gc_before[0]
+                    metric["gc_collections"] = gc_after[1] - gc_before[1]
+                metric.update(extra)
+                metric["tracker_overhead_sec"] = (start_time - overhead_start) + (time.perf_counter() - end_time)
                 agent_metrics.append(metric)
+                record_handler(agent_label, func.__name__, duration)
 
             return result
         return wrapper
     return decorator
 
-def save_metrics_to_csv_and_cdfs(out_dir: str = "metrics"):
+def start_metrics_sink(out_dir: str, flush_interval_seconds: float = 1.0, capacity: int = 65536) -> None:
     """
-    Saves one CSV and two CDF plots (duration, memory) per agent to a folder.
+    Starts appending metric records to `<out_dir>/metrics_<agent>.csv` every `flush_interval_seconds`,
+    keeping at most `capacity` unflushed records in memory.
     """
-    if not agent_metrics:
-        print("[agent_metrics] No data to save.")
+    global _flusher
+    if _flusher is not None:
         return
+    if capacity != agent_metrics.capacity and len(agent_metrics) == 0:
+        agent_metrics.resize(capacity)
+    _flusher = MetricsFlusher(agent_metrics, out_dir, interval=flush_interval_seconds)
+    _flusher.start()
+
+
+def stop_metrics_sink() -> Optional[Dict[str, str]]:
+    """Stops the background flusher after a final flush; returns the file it wrote for each agent."""
+    global _flusher
+    if _flusher is None:
+        return None
+    _flusher.stop()
+    paths = _flusher.paths
+    _flusher = None
+    return paths
 
-    os.makedirs(out_dir, exist_ok=True)
 
-    # Group by agent
-    by_agent: Dict[str, List[Dict]] = {}
-    for entry in agent_metrics:
-        by_agent.setdefault(entry["agent"], []).append(entry)
+def save_metrics_to_csv_and_cdfs(out_dir: str = "metrics"):
+    """
+    Flushes the remaining records to one CSV per agent in `out_dir`.
+    Only the files this process wrote are copied, so processes sharing a sink directory do not
+    copy each other's files.
+    The CDF plots are generated offline with `python metrics_report.py <out_dir>`, so agent
+    processes never import the plotting stack.
+    """
+    paths = stop_metrics_sink()
+    if paths is None:
+        # No sink was running; write what the buffer still holds.
+        os.makedirs(out_dir, exist_ok=True)
+        flusher = MetricsFlusher(agent_metrics, out_dir)
+        flusher.stop()
+        paths = flusher.paths
 
-    for agent, records in by_agent.items():
-        # CSV
+    if not paths:
+        print("[agent_metrics] No data to save.")
+        return
+    os.makedirs(out_dir, exist_ok=True)
+    for agent, path in sorted(paths.items()):
         csv_path = os.path.join(out_dir, f"metrics_{agent}.csv")
-        with open(csv_path, "w", newline="") as f:
-            writer = csv.DictWriter(f, fieldnames=records[0].keys())
-            writer.writeheader()
-            writer.writerows(records)
+        if os.path.abspath(csv_path) != os.path.abspath(path):
+            shutil.copyfile(path, csv_path)
         print(f"[agent_metrics] Saved CSV for {agent}: {csv_path}")
-
-        # CDF: Duration
-        durations = np.array([r["duration_sec"] for r in records])
-        if len(durations) > 1:
-            _plot_cdf(
-                durations,
-                xlabel="Duration (seconds)",
-                title=f"Active Time CDF: {agent}",
-                filename=os.path.join(out_dir, f"cdf_{agent}_duration.png"),
-            )
-
-        # CDF: Memory
-        memories = np.array([r["peak_memory_bytes"] for r in records])
-        if len(memories) > 1:
-            _plot_cdf(
-                memories,
-                xlabel="Peak Memory (bytes)",
-                title=f"Peak Memory CDF: {agent}",
-                filename=os.path.join(out_dir, f"cdf_{agent}_memory.png"),
-            )
-
-def _plot_cdf(data: np.ndarray, xlabel: str, title: str, filename: str):
-    data_sorted = np.sort(data)
-    cdf = np.arange(1, len(data_sorted) + 1) / len(data_sorted)
-
-    plt.figure(figsize=(8, 5))
-    plt.plot(data_sorted, cdf, marker=".", linestyle="none")
-    plt.xlabel(xlabel)
-    plt.ylabel("Cumulative Probability")
-    plt.title(title)
-    plt.grid(True)
-    plt.tight_layout()
-    plt.savefig(filename)
-    plt.close()
-    print(f"[agent_metrics] Saved CDF plot: {filename}")
+    print(f"[agent_metrics] Run `python metrics_report.py {out_dir}` for the CDF plots.")
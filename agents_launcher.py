@@ -1,32 +1,99 @@
-import multiprocessing
+import argparse
 import os
-import psutil
-import subprocess
+import sys
 import time
+from typing import Dict, List, Optional, Tuple
 
+from _placement import Placement, plan_and_report
+from _readiness import has_mark, host_listening, llm_ready, mark_time
+from _types import AppConfig
+from _utils import load_config
+from supervisor import ProcessSpec, Supervisor, print_report
+
+LOG_DIR = "logs"
+
+# (command, startup profile name, prerequisites). A script starts as soon as all its
+# prerequisites are ready: "host" once it accepts connections, "llm" once the endpoint lists a
+# model, an agent once its startup profile has `subscriptions_ready`. The Chainlit UI writes no
+# startup profile and counts as ready once it runs. CPUs come from the `placement` policy.
 AGENT_SCRIPTS = [
-    ("run_host.py", 0),
-    ("run_ui.py", 1),
-    ("run_writer_agent.py", 2),
-    ("run_editor_agent.py", 3),
-    ("run_group_chat_manager.py", 4),
+    (["run_host.py"], "host", ()),
+    (["-m", "chainlit", "run", "run_ui.py", "--headless", "--port", "8001"], "ui_agent", ("host",)),
+    (["run_writer_agent.py"], "writer_agent", ("host",)),
+    (["run_editor_agent.py"], "editor_agent", ("host",)),
+    (["run_group_chat_manager.py"], "group_chat_manager", ("host", "llm")),
 ]
+# runtime.mode "in_process": every agent in one runtime, no gRPC host or Chainlit UI.
+IN_PROCESS_SCRIPTS = [(["run_in_process.py"], "in_process", ("llm",))]
 
-def launch_agent(script_name: str, core_id: int):
-    process = psutil.Process()
-    process.cpu_affinity([core_id])  # Pin this process to one core
-    print(f"Launching {script_name} on CPU core {core_id}...")
-    subprocess.run(["python3", script_name])
 
-if __name__ == "__main__":
-    processes = []
+def agent_scripts(config: AppConfig) -> List[Tuple[List[str], str, Tuple[str, ...]]]:
+    return IN_PROCESS_SCRIPTS if config.runtime.mode == "in_process" else AGENT_SCRIPTS
+
+
+def place_agents(config: AppConfig, log_dir: str = LOG_DIR) -> Placement:
+    """Plans the CPUs of the LLM server and the agents, prints the plan and writes `<log_dir>/placement.json`."""
+    names = [name for _, name, _ in agent_scripts(config)]
+    return plan_and_report(names, config.placement, os.path.join(log_dir, "placement.json"))
+
 
-    for script, core in AGENT_SCRIPTS:
-        p = multiprocessing.Process(target=launch_agent, args=(script, core))
-        p.start()
-        time.sleep(2)  # Stagger start time slightly to avoid race conditions
-        processes.append(p)
+def is_ready(name: str, config: AppConfig, log_dir: str = LOG_DIR) -> bool:
+    if name == "host":
+        return host_listening(config.host.address)
+    if name == "llm":
+        return llm_ready(config.client_config["base_url"])
+    if name == "ui_agent":
+        return True
+    return has_mark(log_dir, name, "subscriptions_ready")
 
-    for p in processes:
-        p.join()
-    print("All agents launched successfully.")
\ No newline at end of file
+
+def agent_specs(config: AppConfig, placement: Placement, log_dir: str = LOG_DIR) -> List[ProcessSpec]:
+    """The entry points of `config.runtime.mode`, pinned to their CPUs in `placement`."""
+    specs = []
+    for command, name, prerequisites in agent_scripts(config):
+        specs.append(ProcessSpec(
+            name=name,
+            command=[sys.executable] + command,
+            requires=prerequisites,
+            ready=lambda name=name: is_ready(name, config, log_dir),
+            cpus=placement.cpus(name),
+            log_path=os.path.join(log_dir, f"{name}.log"),
+            stale_paths=(os.path.join(log_dir, f"startup_{name}.json"),),
+        ))
+    return specs
+
+
+def supervise(
+    specs: List[ProcessSpec], config: AppConfig, log_dir: str = LOG_DIR, external: Optional[Dict] = None
+) -> None:
+    """Starts `specs` under a supervisor and keeps them running until SIGINT or SIGTERM, then drains them."""
+    supervisor = Supervisor(
+        specs, config.supervisor, config.readiness, external, os.path.join(log_dir, "supervisor.json")
+    )
+    supervisor.install_signal_handlers()
+    launched_at = time.time()
+    try:
+        supervisor.start()
+        manager = "in_process" if config.runtime.mode == "in_process" else "group_chat_manager"
+        if config.group_chat_manager.initial_message is not None:
+            deadline = time.time() + config.readiness.timeout_seconds
+            supervisor.run(until=lambda: mark_time(log_dir, manager, "first_turn") is not None or time.time() > deadline)
+            first_turn = mark_time(log_dir, manager, "first_turn")
+            if first_turn is not None:
+                print(f"[launcher] Launch to first turn: {first_turn - launched_at:.2f}s")
+        print("[launcher] All agents running; Ctrl-C stops and drains them.")
+        supervisor.run()
+    finally:
+        supervisor.stop()
+        print_report(supervisor.report())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Launches the group chat under a process supervisor.")
+    parser.add_argument("--config", help="Defaults to the config.yaml next to this file.")
+    args = parser.parse_args()
+    config = load_config(args.config) if args.config else load_config()
+    os.makedirs(LOG_DIR, exist_ok=True)
+    # The LLM server runs elsewhere (e.g. phoenix_launcher.py); its reserved cores stay free anyway.
+    placement = place_agents(config)
+    supervise(agent_specs(config, placement), config, external={"llm": lambda: is_ready("llm", config)})
@@ -0,0 +1,112 @@
+"""
+Compares the handler latency of the `_gc_tuning` modes on a synthetic agent workload.
+
+Every turn appends pydantic messages to long-lived histories (like `_chat_history` and the
+state history), renders a transcript and drops some cyclic garbage, on top of a large startup
+heap. Each mode runs in its own interpreter, since `gc.freeze` cannot be undone, with the pause
+monitor on, and the idle time between turns is where "between_turns" collects.
+
+    python bench_gc.py --turns 2000 --startup-objects 500000
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import subprocess
+import sys
+import time
+
+from autogen_core.models import AssistantMessage, UserMessage
+
+from _gc_tuning import GC_MODES, after_startup, after_turn, configure_gc, gc_pause_totals
+
+
+class _Agent:
+    def __init__(self) -> None:
+        self.chat_history: list = []
+        self.state_history: list = []
+
+    async def handle(self, turn: int, size: int) -> int:
+        for i in range(size):
+            self.chat_history.append(UserMessage(content=f"turn {turn} line {i}", source="bench"))
+        self.state_history.append(AssistantMessage(content=json.dumps({"turn": turn}), source="bench"))
+        transcript = "\n".join(f"{m.source}: {m.content}" for m in self.chat_history[-200:])
+        # Short-lived reference cycles, like parsed responses pointing back at their parents.
+        for _ in range(size * 20):
+            node: dict = {"text": transcript[:16]}
+            node["self"] = node
+        await asyncio.sleep(0)
+        return len(transcript)
+
+
+async def _run(turns: int, size: int, idle: float) -> list:
+    agent = _Agent()
+    latencies = []
+    for turn in range(turns):
+        start = time.perf_counter()
+        await agent.handle(turn, size)
+        latencies.append(time.perf_counter() - start)
+        after_turn()
+        await asyncio.sleep(idle)
+    return latencies
+
+
+def _child(args: argparse.Namespace) -> None:
+    # The startup heap: long-lived objects every full collection has to traverse.
+    startup_heap = [{"id": i, "tags": [i]} for i in range(args.startup_objects)]
+    thresholds = args.thresholds if args.mode == "thresholds" else None
+    configure_gc(args.mode, thresholds, monitor=True)
+    after_startup()
+    latencies = asyncio.run(_run(args.turns, args.size, args.idle))
+    pause_sec, collections = gc_pause_totals() or (0.0, 0)
+    latencies.sort()
+    print(
+        json.dumps(
+            {
+                "mode": args.mode,
+                "p50_ms": statistics.median(latencies) * 1000,
+                "p99_ms": latencies[int(0.99 * (len(latencies) - 1))] * 1000,
+                "max_ms": latencies[-1] * 1000,
+                "gc_collections": collections,
+                "gc_pause_ms": pause_sec * 1000,
+                "heap": len(startup_heap),
+            }
+        )
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=2000)
+    parser.add_argument("--size", type=int, default=20, help="Messages appended per turn.")
+    parser.add_argument("--startup-objects", type=int, default=500000)
+    parser.add_argument("--idle", type=float, default=0.001, help="Seconds between turns.")
+    parser.add_argument("--thresholds", nargs=3, type=int, default=[10000, 20, 20], help='For the "thresholds" mode.')
+    parser.add_argument("--modes", nargs="+", choices=GC_MODES, default=list(GC_MODES))
+    parser.add_argument("--mode", choices=GC_MODES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.mode:
+        _child(args)
+        return
+
+    print(f"{'mode':<15}{'p50 ms':>9}{'p99 ms':>9}{'max ms':>9}{'p99 vs default':>16}{'GCs':>7}{'GC ms':>9}")
+    baseline = None
+    for mode in args.modes:
+        command = [sys.executable, __file__, "--mode", mode] + [
+            f"--turns={args.turns}",
+            f"--size={args.size}",
+            f"--startup-objects={args.startup_objects}",
+            f"--idle={args.idle}",
+            "--thresholds",
+            *map(str, args.thresholds),
+        ]
+        result = json.loads(subprocess.run(command, check=True, capture_output=True, text=True).stdout)
+        baseline = result["p99_ms"] if baseline is None else baseline
+        print(
+            f"{mode:<15}{result['p50_ms']:>9.3f}{result['p99_ms']:>9.3f}{result['max_ms']:>9.2f}"
+            f"{(result['p99_ms'] / baseline - 1) * 100:>15.1f}%{result['gc_collections']:>7}{result['gc_pause_ms']:>9.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Measures the overhead of each `track_time_and_memory` mode on a synthetic handler.
+
+The handler builds and drops a list of pydantic messages (like the agents' histories) and yields
+to the event loop, so both the allocation slowdown of tracemalloc and the bookkeeping of the
+tracker show up. `--concurrency` runs several handlers at once to exercise the attribution logic.
+
+    python bench_tracking.py --calls 2000 --concurrency 1 4
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from autogen_core.models import UserMessage
+
+import agent_timeslices
+from agent_timeslices import TRACKING_MODES, agent_metrics, configure_tracking, track_time_and_memory
+
+
+class _Handler:
+    @track_time_and_memory(get_label=lambda self: "bench")
+    async def handle(self, size: int) -> int:
+        history = [UserMessage(content=f"message {i}", source="bench") for i in range(size)]
+        await asyncio.sleep(0)
+        return len(history)
+
+
+async def _run(calls: int, concurrency: int, size: int) -> float:
+    handler = _Handler()
+    start = time.perf_counter()
+    for _ in range(calls // concurrency):
+        await asyncio.gather(*(handler.handle(size) for _ in range(concurrency)))
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=2000)
+    parser.add_argument("--size", type=int, default=200, help="Messages allocated per call.")
+    parser.add_argument("--sample-every", type=int, default=10)
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 4])
+    args = parser.parse_args()
+
+    # Warm up imports and pydantic validators so the first mode is not penalized.
+    configure_tracking("off")
+    asyncio.run(_run(args.calls // 10 or 1, 1, args.size))
+
+    print(f"{'mode':<12}{'conc':>6}{'us/call':>10}{'vs off':>10}{'tracker us':>12}{'traced':>8}")
+    for concurrency in args.concurrency:
+        baseline = None
+        for mode in TRACKING_MODES:
+            configure_tracking(mode, args.sample_every)
+            agent_metrics.clear()
+            elapsed = asyncio.run(_run(args.calls, concurrency, args.size))
+            per_call = elapsed / args.calls * 1e6
+            baseline = per_call if baseline is None else baseline
+            overhead = [m["tracker_overhead_sec"] for m in agent_metrics]
+            traced = sum(1 for m in agent_metrics if m.get("peak_memory_bytes") is not None)
+            tracker_us = statistics.mean(overhead) * 1e6 if overhead else 0.0
+            print(
+                f"{mode:<12}{concurrency:>6}{per_call:>10.1f}{(per_call / baseline - 1) * 100:>9.1f}%"
+                f"{tracker_us:>12.2f}{traced:>8}"
+            )
+    configure_tracking("off")
+    assert not agent_timeslices._active_calls
+
+
+if __name__ == "__main__":
+    main()
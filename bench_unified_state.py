@@ -0,0 +1,125 @@
+"""
+Microbenchmark for the UnifiedState backends.
+
+Runs get / set / update loops in 1..N processes against the Manager-backed and the shared memory
+backed state and reports throughput and latency percentiles per operation. For the shared memory
+backend, set and update runs also check that the version grew by exactly the number of writes, so
+writers that failed to exclude each other show up as lost writes.
+
+    python bench_unified_state.py --processes 1 2 4 8 16 --duration 2
+"""
+import argparse
+import json
+import multiprocessing
+import time
+from array import array
+from typing import Any, Dict, List
+
+from unified_state import create_unified_state
+from unified_state_config import PREDEFINED_STATE
+
+OPERATIONS = ["get", "set", "update"]
+
+
+def _worker(state: Any, op: str, duration: float, worker_id: int, results: "multiprocessing.Queue[Any]") -> None:
+    latencies = array("d")
+    updates = {
+        "writer_topic": f"topic-{worker_id}",
+        "writer_total_lines_written": worker_id,
+        "editor_feedback_addressed": bool(worker_id % 2),
+        "editor_num_lines_edited": worker_id,
+    }
+    deadline = time.perf_counter() + duration
+    i = 0
+    while True:
+        start = time.perf_counter()
+        if start >= deadline:
+            break
+        if op == "get":
+            state.get("writer_total_lines_written")
+        elif op == "set":
+            state.set("writer_total_lines_written", i)
+        else:
+            state.update(updates)
+        latencies.append(time.perf_counter() - start)
+        i += 1
+    results.put(latencies.tobytes())
+
+
+def _percentile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(q * len(sorted_values)))
+    return sorted_values[index]
+
+
+def run(backend: str, op: str, processes: int, duration: float) -> Dict[str, Any]:
+    state = create_unified_state(PREDEFINED_STATE, backend=backend)
+    # Seed the manager backend, which starts empty.
+    state.update(PREDEFINED_STATE)
+    # Every completed set/update bumps the shared memory version once; a lost or torn write shows as a gap.
+    version_before = state.version if backend == "shared_memory" else None  # type: ignore[union-attr]
+    results: "multiprocessing.Queue[Any]" = multiprocessing.Queue()
+    workers = [
+        multiprocessing.Process(target=_worker, args=(state, op, duration, i, results)) for i in range(processes)
+    ]
+    for w in workers:
+        w.start()
+    latencies = array("d")
+    for _ in workers:
+        latencies.frombytes(results.get())
+    for w in workers:
+        w.join()
+    lost_writes = None
+    if version_before is not None and op != "get":
+        lost_writes = version_before + len(latencies) - state.version  # type: ignore[union-attr]
+        if lost_writes:
+            print(f"[bench_unified_state] {backend} {op} x{processes}: {lost_writes} writes lost; results are invalid")
+    if backend == "shared_memory":
+        state.close()  # type: ignore[union-attr]
+        state.unlink()  # type: ignore[union-attr]
+    else:
+        state.manager.shutdown()  # type: ignore[union-attr]
+
+    ordered = sorted(latencies)
+    return {
+        "backend": backend,
+        "op": op,
+        "processes": processes,
+        "ops": len(ordered),
+        "ops_per_sec": len(ordered) / duration,
+        "p50_us": _percentile(ordered, 0.50) * 1e6,
+        "p99_us": _percentile(ordered, 0.99) * 1e6,
+        "max_us": (ordered[-1] if ordered else 0.0) * 1e6,
+        "lost_writes": lost_writes,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backends", nargs="+", default=["manager", "shared_memory"])
+    parser.add_argument("--ops", nargs="+", default=OPERATIONS, choices=OPERATIONS)
+    parser.add_argument("--processes", nargs="+", type=int, default=[1, 2, 4, 8, 16])
+    parser.add_argument("--duration", type=float, default=2.0, help="Seconds per measurement.")
+    parser.add_argument("--json", help="Optional path to write the results as JSON.")
+    args = parser.parse_args()
+
+    rows = []
+    print(f"{'backend':<14}{'op':<8}{'procs':>6}{'ops/s':>14}{'p50 us':>10}{'p99 us':>10}{'max us':>12}")
+    for backend in args.backends:
+        for op in args.ops:
+            for processes in args.processes:
+                row = run(backend, op, processes, args.duration)
+                rows.append(row)
+                print(
+                    f"{backend:<14}{op:<8}{processes:>6}{row['ops_per_sec']:>14,.0f}"
+                    f"{row['p50_us']:>10.1f}{row['p99_us']:>10.1f}{row['max_us']:>12.1f}"
+                )
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(rows, f, indent=2)
+        print(f"[bench_unified_state] Saved results: {args.json}")
+
+
+if __name__ == "__main__":
+    main()
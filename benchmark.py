@@ -0,0 +1,759 @@
+"""
+End-to-end throughput and latency benchmark of the distributed group chat.
+
+    python benchmark.py run --conversations 4 --rounds 6 --out results/baseline.json
+    python benchmark.py compare results/baseline.json results/candidate.json --threshold 0.1
+    python benchmark.py sweep --sessions 1 10 100 300 --rounds 4 --out results/sessions.json
+    python benchmark.py placement --policies none compact cores spread --out results/placement.json
+
+`run` starts the fake LLM server (or uses `--llm-url`), the host and the writer, editor and
+manager through the `main` of their `run_*.py` entry points, each in its own process. It then
+starts `--conversations` group chats at once, each on its own topic source, and lets each run
+`--rounds` speaker turns. An observer in the benchmark process subscribes to every topic and
+timestamps each reply. The result JSON has:
+
+- the startup time from launching the first process until all are ready, and the whole cycle
+  (startup, run, shutdown until every process has drained and exited) with any processes that had
+  to be killed as leaked; see `supervisor.Supervisor`;
+- turns per second;
+- per-turn latency percentiles (time between consecutive messages of a conversation);
+- the host message rate (every message routed through the host, counted by the observer);
+- per-process CPU time and utilization, and peak/final RSS;
+- the CPU placement of every process (`--placement` overrides `placement.policy`, see `_placement`)
+  and the handler latency percentiles of each agent from its handler records;
+- the manager's handler latency per turn and the selector LLM calls it made and saved per turn
+  (`--speaker-selection` overrides `group_chat_manager.speaker_selection.mode`);
+- prompt tokens sent to the LLM server and the prefill tokens its prefix cache saved per turn, from
+  the fake LLM's `/health` or vLLM's `/metrics` (vLLM needs `--enable-prefix-caching`).
+
+With `--runtime in_process` (or `runtime.mode: "in_process"`) the writer, editor, manager and
+observer share one runtime in a single process instead of talking through the gRPC host, so
+comparing a run in each mode separates the transport overhead from the agent and LLM cost.
+
+`compare` prints the relative change of every figure between two result files and exits with
+status 1 if any of them regressed by more than `--threshold`.
+
+`sweep` repeats `run` with a fresh set of processes for every `--sessions` count and writes the
+runs together with a table of throughput, latency, agent memory and cycle time against the
+number of concurrent sessions.
+
+`placement` repeats `run` once per `--policies` placement policy and prints the handler latency of
+each agent under each of them.
+"""
+import argparse
+import asyncio
+import glob
+import importlib
+import json
+import logging
+import multiprocessing
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import psutil
+
+from _metrics_sink import read_metrics_csv
+from _placement import plan, read_topology
+from _readiness import has_mark, llm_ready
+from _speaker_selection import SELECTION_MODES
+from _types import AppConfig, GroupChatMessage, MessageChunk, RequestToSpeak
+from _utils import get_serializers, load_config, set_all_log_levels
+from autogen_core import MessageContext, RoutedAgent, TopicId, TypeSubscription, message_handler
+from autogen_core.models import UserMessage
+from supervisor import ProcessSpec, Supervisor, print_report
+
+# Entry points started for a run: (process name, module, startup mark that means "ready", prerequisites).
+ENTRY_POINTS = (
+    ("host", "run_host", "host_started", ()),
+    ("writer_agent", "run_writer_agent", "subscriptions_ready", ("host",)),
+    ("editor_agent", "run_editor_agent", "subscriptions_ready", ("host",)),
+    ("group_chat_manager", "run_group_chat_manager", "subscriptions_ready", ("host",)),
+)
+# Process name of `--runtime in_process`, which runs every agent and the observer in one runtime.
+IN_PROCESS_NAME = "in_process"
+MANAGER_AGENT_TYPE = "group_chat_manager"
+PLACEMENT_POLICIES = ("none", "compact", "cores", "spread")
+USER_MESSAGE = "Please write a short story about the gingerbread in halloween!"
+
+# Figures compared by `compare`: (path in the result, True if higher is better).
+COMPARED_FIGURES = (
+    (("turns_per_sec",), True),
+    (("host_messages_per_sec",), True),
+    (("turn_latency_sec", "p50"), False),
+    (("turn_latency_sec", "p95"), False),
+    (("turn_latency_sec", "p99"), False),
+    (("conversation_sec", "p50"), False),
+    (("manager", "turn_sec", "p50"), False),
+    (("manager", "selector_llm_calls_per_turn"), False),
+    (("prefill", "prefill_tokens_per_turn"), False),
+)
+
+
+def _redirect_output(log_path: str) -> None:
+    log = open(log_path, "w")
+    os.dup2(log.fileno(), 1)
+    os.dup2(log.fileno(), 2)
+
+
+def _run_entry_point(name: str, module_name: str, config: AppConfig, log_dir: str) -> None:
+    """Child process: runs an entry point's `main` with the benchmark config."""
+    _redirect_output(os.path.join(log_dir, f"{name}.log"))
+    from _startup import StartupProfile
+
+    module = importlib.import_module(module_name)
+    asyncio.run(module.main(config, StartupProfile(name, log_dir)))
+
+
+def _run_fake_llm(config: AppConfig, log_dir: str) -> None:
+    _redirect_output(os.path.join(log_dir, "fake_llm.log"))
+    from aiohttp import web
+
+    from fake_llm_server import create_app
+
+    fake = config.fake_llm
+    web.run_app(create_app(fake), host=fake.hostname, port=fake.port, print=None)
+
+
+# Prefix cache counters of vLLM's /metrics, in tokens (names of recent and older v1 releases).
+_VLLM_PROMPT_COUNTERS = ("vllm:prompt_tokens_total",)
+_VLLM_CACHED_COUNTERS = ("vllm:prefix_cache_hits_total", "vllm:gpu_prefix_cache_hits_total")
+
+
+def _prefill_counters(base_url: str, fake: bool) -> Optional[Tuple[float, float]]:
+    """`(prompt_tokens, cached_tokens)` served so far by the LLM server, or None if it does not say."""
+    import urllib.request
+
+    root = base_url.rstrip("/").removesuffix("/v1")
+    try:
+        with urllib.request.urlopen(f"{root}/{'health' if fake else 'metrics'}", timeout=5) as response:
+            text = response.read().decode()
+    except OSError:
+        return None
+    if fake:
+        health = json.loads(text)
+        return float(health["prompt_tokens"]), float(health["cached_tokens"])
+    totals: Dict[str, float] = {}
+    for line in text.splitlines():
+        if line.startswith("#") or " " not in line:
+            continue
+        sample, value = line.rsplit(" ", 1)
+        name = sample.split("{", 1)[0]
+        if name in _VLLM_PROMPT_COUNTERS + _VLLM_CACHED_COUNTERS:
+            totals[name] = totals.get(name, 0.0) + float(value)
+    prompt = next((totals[name] for name in _VLLM_PROMPT_COUNTERS if name in totals), None)
+    cached = next((totals[name] for name in _VLLM_CACHED_COUNTERS if name in totals), None)
+    if prompt is None or cached is None:
+        return None
+    return prompt, cached
+
+
+def _prefill_figures(
+    before: Optional[Tuple[float, float]], after: Optional[Tuple[float, float]], turns: int
+) -> Optional[Dict[str, Any]]:
+    """Prompt tokens sent during the run and how many of them the server's prefix cache served."""
+    if before is None or after is None:
+        return None
+    prompt_tokens, cached_tokens = after[0] - before[0], after[1] - before[1]
+    return {
+        "prompt_tokens": prompt_tokens,
+        "cached_tokens": cached_tokens,
+        "cached_fraction": cached_tokens / prompt_tokens if prompt_tokens else None,
+        "prefill_tokens_per_turn": (prompt_tokens - cached_tokens) / turns if turns else None,
+        "prefill_tokens_saved_per_turn": cached_tokens / turns if turns else None,
+    }
+
+
+class _ProcessSampler:
+    """Samples CPU time and RSS of the benchmark's processes from a background thread."""
+
+    def __init__(self, pids: Dict[str, int], interval: float = 0.25) -> None:
+        self._processes = {name: psutil.Process(pid) for name, pid in pids.items()}
+        self._interval = interval
+        self._cpu_start: Dict[str, float] = {}
+        self._cpu_end: Dict[str, float] = {}
+        self._rss_peak: Dict[str, int] = dict.fromkeys(pids, 0)
+        self._rss_end: Dict[str, int] = dict.fromkeys(pids, 0)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _cpu(self, process: psutil.Process) -> float:
+        times = process.cpu_times()
+        return times.user + times.system
+
+    def _sample(self) -> None:
+        for name, process in self._processes.items():
+            try:
+                rss = process.memory_info().rss
+                self._cpu_end[name] = self._cpu(process)
+            except psutil.NoSuchProcess:
+                continue
+            self._rss_end[name] = rss
+            self._rss_peak[name] = max(self._rss_peak[name], rss)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self._interval):
+            self._sample()
+
+    def start(self) -> None:
+        self._started = time.perf_counter()
+        self._cpu_start = {name: self._cpu(process) for name, process in self._processes.items()}
+        self._thread.start()
+
+    def stop(self) -> Dict[str, Dict[str, float]]:
+        self._sample()
+        self._stop.set()
+        self._thread.join()
+        elapsed = time.perf_counter() - self._started
+        report = {}
+        for name in self._processes:
+            cpu_sec = self._cpu_end.get(name, self._cpu_start[name]) - self._cpu_start[name]
+            report[name] = {
+                "cpu_sec": cpu_sec,
+                "cpu_percent": 100 * cpu_sec / elapsed,
+                "rss_peak_bytes": self._rss_peak[name],
+                "rss_end_bytes": self._rss_end[name],
+            }
+        return report
+
+
+class _RunStats:
+    def __init__(self, conversations: List[str]) -> None:
+        self.started: Dict[str, float] = {}
+        self.last_message: Dict[str, float] = {}
+        self.turn_latencies: List[float] = []
+        self.finished: Dict[str, float] = {}
+        self.messages = 0
+        self.all_finished = asyncio.Event()
+        self.conversations = conversations
+        self._conversations = set(conversations)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "conversations": self.conversations,
+            "started": self.started,
+            "finished": self.finished,
+            "turn_latencies": self.turn_latencies,
+            "messages": self.messages,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "_RunStats":
+        stats = cls(data["conversations"])
+        stats.started, stats.finished = data["started"], data["finished"]
+        stats.turn_latencies, stats.messages = data["turn_latencies"], data["messages"]
+        return stats
+
+    def on_message(self) -> None:
+        self.messages += 1
+
+    def on_reply(self, conversation: str, message: GroupChatMessage) -> None:
+        now = time.perf_counter()
+        source = getattr(message.body, "source", "")
+        if source != "User" and conversation in self.last_message:
+            self.turn_latencies.append(now - self.last_message[conversation])
+        self.last_message[conversation] = now
+
+    def on_finish(self, conversation: str) -> None:
+        if conversation in self._conversations and conversation not in self.finished:
+            self.finished[conversation] = time.perf_counter()
+            if len(self.finished) == len(self._conversations):
+                self.all_finished.set()
+
+
+class _Observer(RoutedAgent):
+    """Sees every message of one conversation (its agent key is the conversation's topic source)."""
+
+    def __init__(self, stats: _RunStats) -> None:
+        super().__init__("Benchmark observer")
+        self._stats = stats
+
+    @message_handler
+    async def handle_group_chat_message(self, message: GroupChatMessage, ctx: MessageContext) -> None:
+        self._stats.on_message()
+        assert ctx.topic_id is not None
+        self._stats.on_reply(ctx.topic_id.source, message)
+
+    @message_handler
+    async def handle_request_to_speak(self, message: RequestToSpeak, ctx: MessageContext) -> None:
+        self._stats.on_message()
+
+    @message_handler
+    async def handle_message_chunk(self, message: MessageChunk, ctx: MessageContext) -> None:
+        self._stats.on_message()
+        if message.finished and message.author == MANAGER_AGENT_TYPE:
+            assert ctx.topic_id is not None
+            self._stats.on_finish(ctx.topic_id.source)
+
+
+def _percentiles(values: List[float]) -> Dict[str, Optional[float]]:
+    if not values:
+        return dict.fromkeys(("p50", "p90", "p95", "p99", "max", "mean"))
+    ordered = sorted(values)
+
+    def at(q: float) -> float:
+        return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+    return {
+        "p50": at(0.50),
+        "p90": at(0.90),
+        "p95": at(0.95),
+        "p99": at(0.99),
+        "max": ordered[-1],
+        "mean": statistics.fmean(ordered),
+    }
+
+
+async def _attach_observer(runtime: Any, config: AppConfig, stats: _RunStats) -> None:
+    await _Observer.register(runtime, "bench_observer", lambda: _Observer(stats))
+    for topic_type in (
+        config.group_chat_manager.topic_type,
+        config.writer_agent.topic_type,
+        config.editor_agent.topic_type,
+        config.ui_agent.topic_type,
+    ):
+        await runtime.add_subscription(TypeSubscription(topic_type=topic_type, agent_type="bench_observer"))
+
+
+async def _converse(runtime: Any, config: AppConfig, stats: _RunStats, timeout: float) -> float:
+    """Starts every conversation of `stats` and waits for them to finish; returns the wall time."""
+    start = time.perf_counter()
+    for conversation in stats.conversations:
+        stats.started[conversation] = time.perf_counter()
+        await runtime.publish_message(
+            GroupChatMessage(body=UserMessage(content=USER_MESSAGE, source="User")),
+            TopicId(type=config.group_chat_manager.topic_type, source=conversation),
+        )
+    try:
+        await asyncio.wait_for(stats.all_finished.wait(), timeout)
+    except asyncio.TimeoutError:
+        print(f"[benchmark] Timed out with {len(stats.finished)}/{len(stats.conversations)} conversations finished.")
+    return time.perf_counter() - start
+
+
+async def _drive(config: AppConfig, conversations: int, timeout: float) -> Tuple[_RunStats, float]:
+    from autogen_ext.runtimes.grpc import GrpcWorkerAgentRuntime
+
+    stats = _RunStats([f"bench-{i}" for i in range(conversations)])
+    runtime = GrpcWorkerAgentRuntime(host_address=config.host.address)
+    runtime.add_message_serializer(get_serializers([RequestToSpeak, GroupChatMessage, MessageChunk]))  # type: ignore[arg-type]
+    await runtime.start()
+    await _attach_observer(runtime, config, stats)
+    wall = await _converse(runtime, config, stats, timeout)
+    await runtime.stop()
+    return stats, wall
+
+
+async def _drive_in_process(
+    config: AppConfig, conversations: int, timeout: float, startup: Any, go: Any
+) -> Tuple[_RunStats, float]:
+    import run_in_process
+    from agent_timeslices import stop_metrics_sink
+
+    run_in_process.init_process(config)
+    chat = run_in_process.InProcessChat(config)
+    await chat.start()
+    stats = _RunStats([f"bench-{i}" for i in range(conversations)])
+    await _attach_observer(chat.runtime, config, stats)
+    startup.mark("subscriptions_ready")
+    # The parent starts its process sampler before it lets the conversations begin.
+    await asyncio.to_thread(go.wait)
+    wall = await _converse(chat.runtime, config, stats, timeout)
+    await chat.runtime.stop()
+    await chat.close()
+    stop_metrics_sink()
+    return stats, wall
+
+
+def _run_in_process_chat(
+    config: AppConfig, log_dir: str, conversations: int, timeout: float, go: Any, result_path: str
+) -> None:
+    """Child process of `--runtime in_process`: the agents and the observer share one runtime."""
+    _redirect_output(os.path.join(log_dir, f"{IN_PROCESS_NAME}.log"))
+    from _startup import StartupProfile
+
+    startup = StartupProfile(IN_PROCESS_NAME, log_dir)
+    stats, wall = asyncio.run(_drive_in_process(config, conversations, timeout, startup, go))
+    with open(result_path, "w") as f:
+        json.dump({"stats": stats.to_dict(), "wall": wall}, f)
+
+
+def _benchmark_config(args: argparse.Namespace) -> AppConfig:
+    config = (load_config(args.config) if args.config else load_config()).model_copy(deep=True)
+    config.group_chat_manager.initial_message = None
+    config.group_chat_manager.max_rounds = args.rounds
+    config.ui_agent.benchmark_mode = True
+    config.fake_llm.finish_after = args.rounds
+    # Handler records of every process land next to the benchmark logs.
+    config.metrics.out_dir = os.path.abspath(args.log_dir)
+    if args.speaker_selection is not None:
+        config.group_chat_manager.speaker_selection.mode = args.speaker_selection
+    if args.runtime is not None:
+        config.runtime.mode = args.runtime
+    if args.placement is not None:
+        config.placement.policy = args.placement
+    if args.host_port is not None:
+        config.host.port = args.host_port
+    if args.llm_url is None:
+        config.client_config["base_url"] = f"http://{config.fake_llm.hostname}:{config.fake_llm.port}/v1"
+    else:
+        config.client_config["base_url"] = args.llm_url
+    return config
+
+
+def _manager_figures(log_dir: str) -> Optional[Dict[str, Any]]:
+    """Manager turn latency and selector LLM calls from the manager's handler records."""
+    path = os.path.join(log_dir, f"metrics_{MANAGER_AGENT_TYPE}.csv")
+    if not os.path.exists(path):
+        return None
+    turns = [
+        record
+        for record in read_metrics_csv(path)
+        if record["function"] == "handle_message" and "selector_llm_calls" in record
+    ]
+    calls = sum(record["selector_llm_calls"] for record in turns)
+    return {
+        "speaker_selection": turns[0]["selector_mode"] if turns else None,
+        "turns": len(turns),
+        "turn_sec": _percentiles([record["duration_sec"] for record in turns]),
+        "selector_llm_calls": calls,
+        "selector_llm_calls_per_turn": calls / len(turns) if turns else None,
+        # The "llm" mode makes one selector call per manager turn.
+        "selector_llm_calls_saved_per_turn": 1 - calls / len(turns) if turns else None,
+    }
+
+
+def _handler_figures(log_dir: str) -> Dict[str, Any]:
+    """Handler latency per agent from the handler records of every process."""
+    figures = {}
+    for path in sorted(glob.glob(os.path.join(log_dir, "metrics_*.csv"))):
+        agent = os.path.basename(path)[len("metrics_") : -len(".csv")]
+        durations = [record["duration_sec"] for record in read_metrics_csv(path) if record["duration_sec"] is not None]
+        figures[agent] = {"records": len(durations), "duration_sec": _percentiles(durations)}
+    return figures
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    config = _benchmark_config(args)
+    log_dir = os.path.abspath(args.log_dir)
+    os.makedirs(log_dir, exist_ok=True)
+    for stale_records in glob.glob(os.path.join(log_dir, "metrics_*.csv")):
+        os.remove(stale_records)
+    base_url = config.client_config["base_url"]
+    in_process = config.runtime.mode == "in_process"
+    go = multiprocessing.get_context("spawn").Event()
+    result_path = os.path.join(log_dir, f"{IN_PROCESS_NAME}_result.json")
+    if os.path.exists(result_path):
+        os.remove(result_path)
+
+    # The fake LLM is supervised like the agents; an endpoint given with --llm-url is only checked.
+    llm = "fake_llm" if args.llm_url is None else "llm"
+    names = [IN_PROCESS_NAME] if in_process else [name for name, *_ in ENTRY_POINTS]
+    topology = read_topology()
+    placement = plan(topology, names, config.placement)
+    print(placement.describe(topology))
+    specs: List[ProcessSpec] = []
+    if args.llm_url is None:
+        fake_ready = lambda: llm_ready(base_url)
+        specs.append(
+            ProcessSpec("fake_llm", target=_run_fake_llm, args=(config, log_dir), ready=fake_ready, cpus=placement.llm)
+        )
+    if in_process:
+        chat_args = (config, log_dir, args.conversations, args.timeout, go, result_path)
+        entries = [(IN_PROCESS_NAME, _run_in_process_chat, chat_args, "subscriptions_ready", (llm,))]
+    else:
+        entries = [
+            (name, _run_entry_point, (name, module_name, config, log_dir), ready_mark, requires)
+            for name, module_name, ready_mark, requires in ENTRY_POINTS
+        ]
+    for name, target, target_args, ready_mark, requires in entries:
+        ready = lambda name=name, ready_mark=ready_mark: has_mark(log_dir, name, ready_mark)
+        specs.append(
+            ProcessSpec(
+                name,
+                target=target,
+                args=target_args,
+                requires=requires,
+                ready=ready,
+                cpus=placement.cpus(name),
+                stale_paths=(os.path.join(log_dir, f"startup_{name}.json"),),
+            )
+        )
+    # A crashed process fails the run instead of being restarted.
+    supervisor = Supervisor(
+        specs,
+        config.supervisor.model_copy(update={"restart": False}),
+        config.readiness.model_copy(
+            update={"timeout_seconds": args.startup_timeout, "llm_timeout_seconds": args.startup_timeout}
+        ),
+        external={"llm": lambda: llm_ready(base_url)} if args.llm_url is not None else None,
+        state_path=os.path.join(log_dir, "supervisor.json"),
+    )
+    try:
+        supervisor.start()
+        sampler = _ProcessSampler(supervisor.pids())
+        prefill_before = _prefill_counters(base_url, args.llm_url is None)
+        sampler.start()
+        if in_process:
+            go.set()
+            supervisor.wait(IN_PROCESS_NAME, args.timeout + args.startup_timeout)
+            if not os.path.exists(result_path):
+                raise RuntimeError(f"{IN_PROCESS_NAME} exited without a result; see {log_dir}/{IN_PROCESS_NAME}.log")
+            with open(result_path) as f:
+                result = json.load(f)
+            stats, wall = _RunStats.from_dict(result["stats"]), result["wall"]
+        else:
+            stats, wall = asyncio.run(_drive(config, args.conversations, args.timeout))
+        process_report = sampler.stop()
+        prefill_after = _prefill_counters(base_url, args.llm_url is None)
+    finally:
+        # Agents first, so they can still reach the host while they drain.
+        supervisor.stop()
+    cycle = supervisor.report()
+
+    turns = len(stats.turn_latencies)
+    conversation_times = [stats.finished[c] - stats.started[c] for c in stats.finished]
+    return {
+        "benchmark": {
+            "conversations": args.conversations,
+            "rounds": args.rounds,
+            "speaker_selection": config.group_chat_manager.speaker_selection.mode,
+            "runtime": config.runtime.mode,
+            "placement": config.placement.policy,
+            "llm": "fake" if args.llm_url is None else args.llm_url,
+            "fake_llm": config.fake_llm.model_dump() if args.llm_url is None else None,
+            "git_commit": _git_commit(),
+            "timestamp": time.time(),
+        },
+        "startup_sec": cycle["startup_sec"],
+        "cycle": cycle,
+        "wall_sec": wall,
+        "conversations_finished": len(stats.finished),
+        "turns": turns,
+        "turns_per_sec": turns / wall if wall > 0 else 0.0,
+        "turn_latency_sec": _percentiles(stats.turn_latencies),
+        "conversation_sec": _percentiles(conversation_times),
+        "host_messages": stats.messages,
+        "host_messages_per_sec": stats.messages / wall if wall > 0 else 0.0,
+        "processes": process_report,
+        "placement": placement.report(topology),
+        "handlers": _handler_figures(log_dir),
+        "manager": _manager_figures(log_dir),
+        "prefill": _prefill_figures(prefill_before, prefill_after, turns),
+    }
+
+
+def sweep(args: argparse.Namespace) -> Dict[str, Any]:
+    runs = []
+    for sessions in args.sessions:
+        point_args = argparse.Namespace(**vars(args))
+        point_args.conversations = sessions
+        point_args.log_dir = os.path.join(args.log_dir, f"sessions_{sessions}")
+        print(f"[benchmark] {sessions} concurrent sessions...")
+        runs.append(run(point_args))
+    table = [
+        {
+            "sessions": result["benchmark"]["conversations"],
+            "finished": result["conversations_finished"],
+            "turns_per_sec": result["turns_per_sec"],
+            "turn_latency_p50_sec": result["turn_latency_sec"]["p50"],
+            "turn_latency_p99_sec": result["turn_latency_sec"]["p99"],
+            "host_messages_per_sec": result["host_messages_per_sec"],
+            "rss_peak_bytes": {
+                name: figures["rss_peak_bytes"] for name, figures in result["processes"].items() if name != "fake_llm"
+            },
+            "cycle_sec": result["cycle"]["total_sec"],
+            "leaked_processes": len(result["cycle"]["leaked_processes"]),
+        }
+        for result in runs
+    ]
+    return {"sweep": table, "runs": runs}
+
+
+def compare_placements(args: argparse.Namespace) -> Dict[str, Any]:
+    """Runs the benchmark once per placement policy and tabulates handler latency per agent."""
+    runs = []
+    for policy in args.policies:
+        point_args = argparse.Namespace(**vars(args))
+        point_args.placement = policy
+        point_args.log_dir = os.path.join(args.log_dir, f"placement_{policy}")
+        print(f"[benchmark] Placement policy {policy}...")
+        runs.append(run(point_args))
+    table = [
+        {
+            "policy": result["benchmark"]["placement"],
+            "turns_per_sec": result["turns_per_sec"],
+            "turn_latency_p50_sec": result["turn_latency_sec"]["p50"],
+            "handler_p50_sec": {agent: figures["duration_sec"]["p50"] for agent, figures in result["handlers"].items()},
+            "handler_p99_sec": {agent: figures["duration_sec"]["p99"] for agent, figures in result["handlers"].items()},
+            "warnings": result["placement"]["warnings"],
+        }
+        for result in runs
+    ]
+    return {"placement": table, "runs": runs}
+
+
+def _print_placements(table: List[Dict[str, Any]]) -> None:
+    agents = sorted({agent for row in table for agent in row["handler_p50_sec"]})
+    print(f"{'policy':>9}{'turns/s':>10}{'turn p50 s':>12}" + "".join(f"{agent + ' p50/p99 ms':>36}" for agent in agents))
+    for row in table:
+        cells = []
+        for agent in agents:
+            p50, p99 = row["handler_p50_sec"].get(agent), row["handler_p99_sec"].get(agent)
+            cells.append(f"{'-' if p50 is None else f'{p50 * 1000:.2f}'}/{'-' if p99 is None else f'{p99 * 1000:.2f}'}")
+        turn = row["turn_latency_p50_sec"]
+        print(
+            f"{row['policy']:>9}{row['turns_per_sec']:>10.2f}{turn if turn is not None else float('nan'):>12.3f}"
+            + "".join(f"{cell:>36}" for cell in cells)
+        )
+        for warning in row["warnings"]:
+            print(f"{'':>9}  {warning}")
+
+
+def _print_sweep(table: List[Dict[str, Any]]) -> None:
+    print(f"{'sessions':>9}{'finished':>10}{'turns/s':>10}{'p50 s':>9}{'p99 s':>9}{'host msg/s':>12}{'max agent RSS MB':>18}{'cycle s':>9}{'leaked':>8}")
+    for row in table:
+        p50, p99 = row["turn_latency_p50_sec"], row["turn_latency_p99_sec"]
+        print(
+            f"{row['sessions']:>9}{row['finished']:>10}{row['turns_per_sec']:>10.2f}"
+            f"{p50 if p50 is not None else float('nan'):>9.3f}{p99 if p99 is not None else float('nan'):>9.3f}"
+            f"{row['host_messages_per_sec']:>12.1f}{max(row['rss_peak_bytes'].values()) / 2**20:>18.1f}"
+            f"{row['cycle_sec']:>9.2f}{row['leaked_processes']:>8}"
+        )
+
+
+def _lookup(result: Dict[str, Any], path: Tuple[str, ...]) -> Optional[float]:
+    value: Any = result
+    for key in path:
+        if not isinstance(value, dict) or key not in value:
+            return None
+        value = value[key]
+    return value
+
+
+def compare(baseline_path: str, candidate_path: str, threshold: float) -> bool:
+    """Prints the change of every figure; returns True if any regressed by more than `threshold`."""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    with open(candidate_path) as f:
+        candidate = json.load(f)
+    figures = list(COMPARED_FIGURES)
+    for name in sorted(set(baseline.get("processes", {})) & set(candidate.get("processes", {}))):
+        figures.append((("processes", name, "cpu_sec"), False))
+        figures.append((("processes", name, "rss_peak_bytes"), False))
+    for agent in sorted(set(baseline.get("handlers", {})) & set(candidate.get("handlers", {}))):
+        figures.append((("handlers", agent, "duration_sec", "p50"), False))
+        figures.append((("handlers", agent, "duration_sec", "p99"), False))
+
+    regressed = False
+    print(f"{'figure':<44}{'baseline':>14}{'candidate':>14}{'change':>10}")
+    for path, higher_is_better in figures:
+        before, after = _lookup(baseline, path), _lookup(candidate, path)
+        if before is None or after is None:
+            continue
+        change = (after - before) / before if before else 0.0
+        worse = -change if higher_is_better else change
+        flag = ""
+        if worse > threshold:
+            flag = "  REGRESSION"
+            regressed = True
+        elif -worse > threshold:
+            flag = "  improved"
+        print(f"{'.'.join(path):<44}{before:>14.4g}{after:>14.4g}{change * 100:>9.1f}%{flag}")
+    return regressed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    run_parser = commands.add_parser("run", help="Run the benchmark and write a result file.")
+    run_parser.add_argument("--conversations", type=int, default=4, help="Concurrent conversations (M).")
+    sweep_parser = commands.add_parser("sweep", help="Run the benchmark for several session counts.")
+    sweep_parser.add_argument("--sessions", type=int, nargs="+", default=[1, 10, 100], help="Concurrent sessions per run.")
+    placement_parser = commands.add_parser("placement", help="Compare handler latency across CPU placement policies.")
+    placement_parser.add_argument("--conversations", type=int, default=4, help="Concurrent conversations (M).")
+    placement_parser.add_argument(
+        "--policies", nargs="+", choices=PLACEMENT_POLICIES, default=list(PLACEMENT_POLICIES), help="Policies to run."
+    )
+    for command_parser in (run_parser, sweep_parser, placement_parser):
+        command_parser.add_argument("--rounds", type=int, default=6, help="Speaker turns per conversation (R).")
+        command_parser.add_argument("--config", help="Defaults to the config.yaml next to this file.")
+        command_parser.add_argument("--llm-url", help="Use this OpenAI-compatible endpoint instead of the fake LLM.")
+        command_parser.add_argument("--host-port", type=int, help="Overrides host.port.")
+        command_parser.add_argument("--log-dir", default="logs/benchmark")
+        command_parser.add_argument("--startup-timeout", type=float, default=120.0)
+        command_parser.add_argument("--timeout", type=float, default=600.0, help="Limit for the conversations to finish.")
+        command_parser.add_argument("--out", help="Result JSON path (printed to stdout if omitted).")
+        command_parser.add_argument(
+            "--runtime", choices=("distributed", "in_process"), help="Overrides runtime.mode."
+        )
+        command_parser.add_argument("--placement", choices=PLACEMENT_POLICIES, help="Overrides placement.policy.")
+        command_parser.add_argument(
+            "--speaker-selection", choices=SELECTION_MODES, help="Overrides group_chat_manager.speaker_selection.mode."
+        )
+    compare_parser = commands.add_parser("compare", help="Compare two result files.")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("candidate")
+    compare_parser.add_argument("--threshold", type=float, default=0.1, help="Relative change counted as regression.")
+    args = parser.parse_args()
+
+    if args.command == "compare":
+        sys.exit(1 if compare(args.baseline, args.candidate, args.threshold) else 0)
+
+    set_all_log_levels(logging.ERROR)
+    if args.command == "sweep":
+        result = sweep(args)
+    elif args.command == "placement":
+        result = compare_placements(args)
+    else:
+        result = run(args)
+    text = json.dumps(result, indent=2)
+    if args.out:
+        os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+        with open(args.out, "w") as f:
+            f.write(text + "\n")
+        print(f"[benchmark] Wrote {args.out}")
+    else:
+        print(text)
+    if args.command == "sweep":
+        _print_sweep(result["sweep"])
+        return
+    if args.command == "placement":
+        _print_placements(result["placement"])
+        return
+    print_report(result["cycle"])
+    latency = result["turn_latency_sec"]
+    if latency["p50"] is not None:
+        print(
+            f"[benchmark] {result['turns']} turns in {result['wall_sec']:.1f}s: {result['turns_per_sec']:.2f} turns/s, "
+            f"p50 {latency['p50']:.3f}s, p99 {latency['p99']:.3f}s, {result['host_messages_per_sec']:.1f} host msgs/s"
+        )
+    manager = result["manager"]
+    if manager and manager["turns"]:
+        print(
+            f"[benchmark] Manager ({manager['speaker_selection']}): p50 {manager['turn_sec']['p50'] * 1000:.1f} ms per turn, "
+            f"{manager['selector_llm_calls_per_turn']:.2f} selector LLM calls per turn "
+            f"({manager['selector_llm_calls_saved_per_turn']:.2f} saved)"
+        )
+    prefill = result["prefill"]
+    if prefill and prefill["prefill_tokens_per_turn"] is not None:
+        print(
+            f"[benchmark] Prefill: {prefill['prefill_tokens_per_turn']:.0f} tokens per turn, "
+            f"{prefill['prefill_tokens_saved_per_turn']:.0f} saved by the prefix cache "
+            f"({(prefill['cached_fraction'] or 0) * 100:.0f}% of prompt tokens)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,10 @@
+import glob
+import json
 import os
 import signal
 import subprocess
-import time
+
+import psutil
 
 # Keywords to look for in running agent processes
 AGENT_KEYWORDS = [
@@ -10,6 +13,8 @@ AGENT_KEYWORDS = [
     "run_editor_agent.py",
     "run_group_chat_manager.py",
     "run_ui.py",
+    "run_in_process.py",
+    "fake_llm_server.py",
     "openai.api_server",  # vLLM server
 ]
 
@@ -20,18 +25,48 @@ SOCKET_PATHS = [
     "/tmp/host.sock",
 ]
 
+# Process groups recorded by supervisor.py while its children run
+SUPERVISOR_STATE_FILES = "logs/**/supervisor.json"
+
+# Seconds processes get to drain after SIGTERM before they are killed
+DRAIN_TIMEOUT = 10.0
+
+def kill_supervised_groups():
+    """Stops the process groups of supervisors that did not stop their children themselves."""
+    for path in glob.glob(SUPERVISOR_STATE_FILES, recursive=True):
+        with open(path) as f:
+            state = json.load(f)
+        print(f"🛑 Stopping the process groups in {path}...")
+        for name, pgid in state["groups"].items():
+            try:
+                os.killpg(pgid, signal.SIGTERM)
+                print(f"  → Sent SIGTERM to {name} (group {pgid})")
+            except (ProcessLookupError, PermissionError):
+                pass
+        os.remove(path)
+
 def kill_matching_processes():
     print("🛑 Killing agent-related processes...")
     try:
         # Use `ps` to find candidate processes
         ps_output = subprocess.check_output(["ps", "aux"], text=True)
 
+        processes = []
         for line in ps_output.splitlines():
-            if any(keyword in line for keyword in AGENT_KEYWORDS):
+            if any(keyword in line for keyword in AGENT_KEYWORDS) and "cleanup_processes" not in line:
                 pid = int(line.split()[1])
-                print(f"  → Killing PID {pid}: {line.strip()}")
-                os.kill(pid, signal.SIGTERM)
-                time.sleep(0.1)  # give it a moment
+                print(f"  → Stopping PID {pid}: {line.strip()}")
+                try:
+                    process = psutil.Process(pid)
+                    process.terminate()
+                    processes.append(process)
+                except psutil.NoSuchProcess:
+                    pass
+        # Wait for all of them at once so each can drain and save its metrics, then kill the rest.
+        _, alive = psutil.wait_procs(processes, timeout=DRAIN_TIMEOUT)
+        for process in alive:
+            print(f"  → Killing PID {process.pid}, still running after {DRAIN_TIMEOUT}s")
+            process.kill()
     except Exception as e:
         print(f"Error during process kill: {e}")
 
@@ -55,6 +90,7 @@ def clear_logs():
     pass
 
 if __name__ == "__main__":
+    kill_supervised_groups()
     kill_matching_processes()
     remove_sockets()
     clear_logs()
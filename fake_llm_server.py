@@ -0,0 +1,264 @@
+"""
+Local OpenAI-compatible stand-in for the vLLM server, for benchmarking the agents without GPUs.
+
+    python fake_llm_server.py [--config config.yaml] [--port 8000]
+
+Serves `GET /v1/models`, `GET /health` and `POST /v1/chat/completions` (JSON and SSE streaming)
+with the latency model of the `fake_llm` config section:
+
+- time to first token, per-token latency and response length are drawn from the configured
+  distributions, seeded by the prompt, so the same prompt gets the same answer and timings;
+- at most `max_concurrency` requests decode at once and later ones queue, like vLLM's running
+  batch, and each extra running sequence slows decoding down by `batch_slowdown`;
+- prompts are split into blocks of `PREFIX_BLOCK_TOKENS` and kept in an LRU prefix cache of
+  `prefix_cache_blocks` blocks, like vLLM's automatic prefix caching: the cached prefix is reported
+  as `usage.prompt_tokens_details.cached_tokens`, only the rest is charged
+  `prefill_seconds_per_token`, and `/health` returns the running totals;
+- speaker selection prompts of `GroupChatManager` get a role it can parse (`role_sequence`, or
+  the first offered participant) and `FINISH` after `finish_after` turns, and prompts asking for
+  JSON get a JSON object.
+"""
+import argparse
+import ast
+import asyncio
+import hashlib
+import json
+import math
+import random
+import re
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, List, Tuple
+
+from _transcript import estimate_tokens
+from _types import DistributionConfig, FakeLLMConfig
+from _utils import load_config
+from aiohttp import web
+
+_SELECTOR = re.compile(r"select the next role from (\[.*?\]) to play", re.DOTALL)
+_SPEAKER_LINE = re.compile(r"^([\w\-]+): ", re.MULTILINE)
+# Tokens per prefix cache block (vLLM's default block size), at the ~4 characters per token of estimate_tokens.
+PREFIX_BLOCK_TOKENS = 16
+_BLOCK_CHARS = PREFIX_BLOCK_TOKENS * 4
+_WORDS = (
+    "the gingerbread crept through the pumpkin patch while lanterns flickered and the wind carried "
+    "a story of sugar spice and shadows across the quiet town at midnight"
+).split()
+
+
+def sample(distribution: DistributionConfig, rng: random.Random) -> float:
+    mean, stddev = distribution.mean, distribution.stddev
+    if distribution.kind == "constant" or stddev <= 0:
+        value = mean
+    elif distribution.kind == "uniform":
+        half_width = math.sqrt(3) * stddev
+        value = rng.uniform(mean - half_width, mean + half_width)
+    elif distribution.kind == "normal":
+        value = rng.gauss(mean, stddev)
+    else:
+        sigma2 = math.log(1 + (stddev / mean) ** 2) if mean > 0 else 0.0
+        value = rng.lognormvariate(math.log(mean) - sigma2 / 2, math.sqrt(sigma2)) if mean > 0 else 0.0
+    return max(0.0, value)
+
+
+class PrefixCache:
+    """LRU set of prompt blocks, each identified by the hash of its text and of every block before it."""
+
+    def __init__(self, capacity_blocks: int) -> None:
+        self._capacity = capacity_blocks
+        self._blocks: "OrderedDict[bytes, None]" = OrderedDict()
+
+    def lookup_and_insert(self, messages: List[Dict[str, Any]]) -> int:
+        """Returns the number of prompt tokens already cached and caches the prompt's full blocks."""
+        if self._capacity <= 0:
+            return 0
+        text = "".join(f"<|{message.get('role', '')}|>\n{message.get('content', '')}\n" for message in messages)
+        digest = b""
+        hit = True
+        cached_chars = 0
+        for start in range(0, len(text) - _BLOCK_CHARS + 1, _BLOCK_CHARS):
+            digest = hashlib.sha256(digest + text[start : start + _BLOCK_CHARS].encode()).digest()
+            if hit and digest in self._blocks:
+                cached_chars += _BLOCK_CHARS
+                self._blocks.move_to_end(digest)
+                continue
+            hit = False
+            self._blocks[digest] = None
+            if len(self._blocks) > self._capacity:
+                self._blocks.popitem(last=False)
+        return cached_chars // 4
+
+
+class FakeLLM:
+    def __init__(self, config: FakeLLMConfig) -> None:
+        self.config = config
+        self._slots = asyncio.Semaphore(config.max_concurrency)
+        self._prefix_cache = PrefixCache(config.prefix_cache_blocks)
+        self.running = 0
+        self.requests = 0
+        self.prompt_tokens = 0
+        self.cached_tokens = 0
+
+    def _rng(self, messages: List[Dict[str, Any]]) -> random.Random:
+        digest = hashlib.sha256(json.dumps(messages, sort_keys=True).encode()).digest()
+        return random.Random(int.from_bytes(digest[:8], "big") ^ self.config.seed)
+
+    def answer(self, messages: List[Dict[str, Any]], rng: random.Random) -> List[str]:
+        """The reply as a list of tokens (words with their leading space)."""
+        prompt = "\n".join(str(message.get("content", "")) for message in messages)
+        selector = _SELECTOR.search(prompt)
+        if selector is not None:
+            # The role catalog is in the system message; the conversation comes after it.
+            conversation = "\n".join(
+                str(message.get("content", "")) for message in messages if message.get("role") != "system"
+            )
+            return [self._select_role(conversation, selector.group(1))]
+        if "JSON" in prompt:
+            return ["{}"]
+        length = max(1, round(sample(self.config.response_tokens, rng)))
+        words = [rng.choice(_WORDS) for _ in range(length)]
+        return [words[0]] + [" " + word for word in words[1:]]
+
+    def _select_role(self, conversation: str, offered: str) -> str:
+        participants: List[str] = ast.literal_eval(offered)
+        # The closing instruction follows the conversation.
+        history = conversation.split("Read the above conversation", 1)[0]
+        turns = sum(1 for name in _SPEAKER_LINE.findall(history) if name.lower() not in ("user", "system"))
+        if turns >= self.config.finish_after:
+            return "FINISH"
+        if self.config.role_sequence:
+            return self.config.role_sequence[turns % len(self.config.role_sequence)]
+        return participants[0] if participants else "FINISH"
+
+    def _token_delay(self, rng: random.Random) -> float:
+        slowdown = 1 + self.config.batch_slowdown * max(0, self.running - 1)
+        return sample(self.config.per_token_seconds, rng) * slowdown
+
+    def prefill(self, messages: List[Dict[str, Any]]) -> Tuple[int, int]:
+        """Returns `(prompt_tokens, cached_tokens)` and records the prompt in the prefix cache."""
+        prompt_tokens = sum(estimate_tokens(str(message.get("content", ""))) for message in messages)
+        cached_tokens = min(prompt_tokens, self._prefix_cache.lookup_and_insert(messages))
+        self.prompt_tokens += prompt_tokens
+        self.cached_tokens += cached_tokens
+        return prompt_tokens, cached_tokens
+
+    async def generate(self, messages: List[Dict[str, Any]], uncached_tokens: int = 0):
+        """Yields the reply token by token with the configured timing."""
+        rng = self._rng(messages)
+        tokens = self.answer(messages, rng)
+        async with self._slots:
+            self.running += 1
+            self.requests += 1
+            try:
+                prefill = uncached_tokens * self.config.prefill_seconds_per_token
+                await asyncio.sleep(sample(self.config.ttft_seconds, rng) + prefill)
+                for index, token in enumerate(tokens):
+                    if index:
+                        await asyncio.sleep(self._token_delay(rng))
+                    yield token
+            finally:
+                self.running -= 1
+
+
+def _usage(prompt_tokens: int, cached_tokens: int, completion_tokens: int) -> Dict[str, Any]:
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens,
+        "prompt_tokens_details": {"cached_tokens": cached_tokens},
+    }
+
+
+def create_app(config: FakeLLMConfig) -> web.Application:
+    llm = FakeLLM(config)
+
+    async def models(request: web.Request) -> web.Response:
+        return web.json_response(
+            {"object": "list", "data": [{"id": config.model, "object": "model", "owned_by": "fake_llm_server"}]}
+        )
+
+    async def health(request: web.Request) -> web.Response:
+        return web.json_response(
+            {
+                "status": "ok",
+                "running": llm.running,
+                "requests": llm.requests,
+                "prompt_tokens": llm.prompt_tokens,
+                "cached_tokens": llm.cached_tokens,
+            }
+        )
+
+    async def chat_completions(request: web.Request) -> web.StreamResponse:
+        body = await request.json()
+        messages = body.get("messages", [])
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        created = int(time.time())
+        model = body.get("model", config.model)
+        prompt_tokens, cached_tokens = llm.prefill(messages)
+        uncached_tokens = prompt_tokens - cached_tokens
+
+        if not body.get("stream"):
+            tokens = [token async for token in llm.generate(messages, uncached_tokens)]
+            return web.json_response(
+                {
+                    "id": completion_id,
+                    "object": "chat.completion",
+                    "created": created,
+                    "model": model,
+                    "choices": [
+                        {
+                            "index": 0,
+                            "message": {"role": "assistant", "content": "".join(tokens)},
+                            "finish_reason": "stop",
+                        }
+                    ],
+                    "usage": _usage(prompt_tokens, cached_tokens, len(tokens)),
+                }
+            )
+
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream", "Cache-Control": "no-cache"})
+        await response.prepare(request)
+
+        async def send(choices: List[Dict[str, Any]], **extra: Any) -> None:
+            chunk = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": choices,
+                **extra,
+            }
+            await response.write(f"data: {json.dumps(chunk)}\n\n".encode())
+
+        count = 0
+        async for token in llm.generate(messages, uncached_tokens):
+            delta: Dict[str, Any] = {"content": token}
+            if count == 0:
+                delta["role"] = "assistant"
+            await send([{"index": 0, "delta": delta, "finish_reason": None}])
+            count += 1
+        await send([{"index": 0, "delta": {}, "finish_reason": "stop"}])
+        if (body.get("stream_options") or {}).get("include_usage"):
+            await send([], usage=_usage(prompt_tokens, cached_tokens, count))
+        await response.write(b"data: [DONE]\n\n")
+        await response.write_eof()
+        return response
+
+    app = web.Application()
+    app.router.add_get("/v1/models", models)
+    app.router.add_get("/health", health)
+    app.router.add_post("/v1/chat/completions", chat_completions)
+    return app
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--config", help="Defaults to the config.yaml next to this file.")
+    parser.add_argument("--port", type=int, help="Overrides fake_llm.port.")
+    args = parser.parse_args()
+    fake_config = (load_config(args.config) if args.config else load_config()).fake_llm
+    if args.port is not None:
+        fake_config.port = args.port
+    print(f"Fake LLM serving {fake_config.model} on http://{fake_config.hostname}:{fake_config.port}/v1")
+    web.run_app(create_app(fake_config), host=fake_config.hostname, port=fake_config.port, print=None)
@@ -0,0 +1,281 @@
+"""
+Offline report generation for the metrics the agents stream to disk.
+
+    python metrics_report.py writer_metrics [--out reports/writer]
+    python metrics_report.py --startup logs
+    python metrics_report.py --traces logs
+    python metrics_report.py writer_metrics --timeline logs/timeline_writer_agent.csv
+
+The first form writes one CSV and two CDF plots (duration, memory) per agent from the
+`metrics_<agent>.csv` files in a folder, which also works on the partial files of a killed run.
+The second prints the cold-start profiles (`startup_<name>.json`) written by the entry points.
+The third merges the `traces_<service>.jsonl` span files of all processes and writes the
+critical path of every chat turn to `critical_path.jsonl`, split into LLM, gRPC and Python time.
+With `--timeline`, every handler record is also joined with the process resource timeline of
+agent_metrics.ResourceSampler (`handler_resources_<agent>.csv`).
+"""
+import argparse
+import bisect
+import csv
+import glob
+import json
+import os
+import shutil
+from collections import defaultdict
+from typing import Any, Dict, List
+
+import matplotlib.pyplot as plt
+import numpy as np
+
+from _metrics_sink import read_metrics_csv
+
+# Use Gruvbox dark theme style
+plt.style.use("dark_background")
+
+
+def generate_report(in_dir: str, out_dir: str | None = None):
+    """
+    Builds the per-agent CSV and CDF report from files flushed by the metrics sink.
+    """
+    out_dir = out_dir or in_dir
+    paths = sorted(glob.glob(os.path.join(in_dir, "metrics_*.csv")))
+    if not paths:
+        print("[agent_metrics] No data to save.")
+        return
+
+    os.makedirs(out_dir, exist_ok=True)
+
+    for path in paths:
+        agent = os.path.basename(path)[len("metrics_") : -len(".csv")]
+        records = read_metrics_csv(path)
+        if not records:
+            continue
+
+        # CSV
+        csv_path = os.path.join(out_dir, f"metrics_{agent}.csv")
+        if os.path.abspath(csv_path) != os.path.abspath(path):
+            shutil.copyfile(path, csv_path)
+            print(f"[agent_metrics] Saved CSV for {agent}: {csv_path}")
+
+        # CDF: Duration
+        durations = np.array([r["duration_sec"] for r in records])
+        if len(durations) > 1:
+            _plot_cdf(
+                durations,
+                xlabel="Duration (seconds)",
+                title=f"Active Time CDF: {agent}",
+                filename=os.path.join(out_dir, f"cdf_{agent}_duration.png"),
+            )
+
+        # CDF: Memory
+        # Calls that were not traced (or shared the tracer with others) have no peak.
+        memories = np.array([r["peak_memory_bytes"] for r in records if r.get("peak_memory_bytes") is not None])
+        if len(memories) > 1:
+            _plot_cdf(
+                memories,
+                xlabel="Peak Memory (bytes)",
+                title=f"Peak Memory CDF: {agent}",
+                filename=os.path.join(out_dir, f"cdf_{agent}_memory.png"),
+            )
+
+
+def _plot_cdf(data: np.ndarray, xlabel: str, title: str, filename: str):
+    data_sorted = np.sort(data)
+    cdf = np.arange(1, len(data_sorted) + 1) / len(data_sorted)
+
+    plt.figure(figsize=(8, 5))
+    plt.plot(data_sorted, cdf, marker=".", linestyle="none")
+    plt.xlabel(xlabel)
+    plt.ylabel("Cumulative Probability")
+    plt.title(title)
+    plt.grid(True)
+    plt.tight_layout()
+    plt.savefig(filename)
+    plt.close()
+    print(f"[agent_metrics] Saved CDF plot: {filename}")
+
+
+def read_timeline(path: str) -> Dict[str, List[float]]:
+    """Reads a resource timeline CSV into columns; missing values become NaN."""
+    with open(path, newline="") as f:
+        rows = list(csv.DictReader(f))
+    columns: Dict[str, List[float]] = {name: [] for name in (rows[0].keys() if rows else [])}
+    for row in rows:
+        for name, value in row.items():
+            columns[name].append(float(value) if value else float("nan"))
+    return columns
+
+
+def align_with_timeline(in_dir: str, timeline_path: str, out_dir: str | None = None):
+    """
+    Joins each handler record with the resource samples taken while it ran: RSS at start and end,
+    the highest RSS sampled in between and the mean CPU percent. Handlers shorter than the
+    sampling interval get the nearest samples on either side.
+    """
+    out_dir = out_dir or in_dir
+    timeline = read_timeline(timeline_path)
+    times = timeline.get("timestamp", [])
+    if not times:
+        print(f"[agent_metrics] No samples in {timeline_path}.")
+        return
+    os.makedirs(out_dir, exist_ok=True)
+    for path in sorted(glob.glob(os.path.join(in_dir, "metrics_*.csv"))):
+        agent = os.path.basename(path)[len("metrics_") : -len(".csv")]
+        out_path = os.path.join(out_dir, f"handler_resources_{agent}.csv")
+        with open(out_path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(
+                ["timestamp", "function", "duration_sec", "rss_start_bytes", "rss_end_bytes", "rss_max_bytes", "cpu_percent"]
+            )
+            for record in read_metrics_csv(path):
+                end = record["timestamp"]
+                start = end - record["duration_sec"]
+                first = max(bisect.bisect_right(times, start) - 1, 0)
+                last = min(bisect.bisect_left(times, end), len(times) - 1)
+                rss = timeline["rss_bytes"][first : last + 1]
+                cpu = [c for c in timeline["cpu_percent"][first + 1 : last + 1] if c == c]
+                writer.writerow(
+                    [
+                        end,
+                        record["function"],
+                        record["duration_sec"],
+                        int(rss[0]),
+                        int(rss[-1]),
+                        int(max(rss)),
+                        f"{sum(cpu) / len(cpu):.1f}" if cpu else "",
+                    ]
+                )
+        print(f"[agent_metrics] Saved handler resources for {agent}: {out_path}")
+
+
+def print_startup_profiles(log_dir: str = "logs"):
+    """Prints the startup milestones of every entry point, in seconds since process creation."""
+    paths = sorted(glob.glob(os.path.join(log_dir, "startup_*.json")))
+    if not paths:
+        print(f"[startup] No startup profiles in {log_dir}.")
+        return
+    for path in paths:
+        with open(path) as f:
+            profile = json.load(f)
+        marks = ", ".join(f"{event}={t:.3f}s" for event, t in profile["marks"].items())
+        print(f"{profile['name']:<24}{marks}")
+
+
+def span_category(name: str) -> str:
+    """LLM calls, message hops through the runtime, or our own Python."""
+    if name.startswith("llm."):
+        return "llm"
+    if name.startswith("grpc."):
+        return "grpc"
+    return "python"
+
+
+def critical_path(spans: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Walks one turn's trace backwards from its end, always following the child that finished last,
+    and returns the spans on the path with the time each contributed on its own. The turn ends
+    when the manager receives the reply (`manager.receive`); spans still running after that, such
+    as background state reports, are off the critical path. Time between a parent's end and a
+    child's start that no span covers is reported as `untracked`.
+    """
+    by_id = {s["span_id"]: s for s in spans}
+    children: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+    for s in spans:
+        if s["parent_id"] in by_id:
+            children[s["parent_id"]].append(s)
+    ends = [s for s in spans if s["name"] == "manager.receive"]
+    current = ends[0] if ends else max(spans, key=lambda s: s["end_ns"])
+    cursor = current["end_ns"]
+    visited = {current["span_id"]}
+    segments: List[Dict[str, Any]] = []
+
+    def add(name: str, category: str, service: str, start: int, end: int) -> None:
+        if end > start:
+            segments.append({"name": name, "category": category, "service": service, "sec": (end - start) / 1e9})
+
+    while True:
+        candidates = [
+            c for c in children[current["span_id"]] if c["span_id"] not in visited and c["end_ns"] <= cursor
+        ]
+        if candidates:
+            child = max(candidates, key=lambda c: c["end_ns"])
+            visited.add(child["span_id"])
+            add(current["name"], span_category(current["name"]), current["service"], child["end_ns"], cursor)
+            current, cursor = child, child["end_ns"]
+            continue
+        add(current["name"], span_category(current["name"]), current["service"], current["start_ns"], cursor)
+        cursor = min(cursor, current["start_ns"])
+        parent = by_id.get(current["parent_id"])
+        if parent is None:
+            break
+        if parent["end_ns"] < cursor:
+            add(f"after {parent['name']}", "untracked", parent["service"], parent["end_ns"], cursor)
+            cursor = parent["end_ns"]
+        current = parent
+    segments.reverse()
+    return segments
+
+
+def print_critical_paths(log_dir: str = "logs"):
+    """Writes and prints the per-turn critical-path breakdown from the exported span files."""
+    traces: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+    for path in sorted(glob.glob(os.path.join(log_dir, "traces_*.jsonl"))):
+        with open(path) as f:
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    traces[record["trace_id"]].append(record)
+    turns = [spans for spans in traces.values() if any(s["name"] == "chat.turn" for s in spans)]
+    if not turns:
+        print(f"[traces] No chat turns in {log_dir}.")
+        return
+    turns.sort(key=lambda spans: min(s["start_ns"] for s in spans))
+
+    out_path = os.path.join(log_dir, "critical_path.jsonl")
+    categories = ("llm", "grpc", "python", "untracked")
+    totals = dict.fromkeys(categories, 0.0)
+    print(f"{'turn':<6}{'speaker':<20}{'total':>9}" + "".join(f"{c:>11}" for c in categories))
+    with open(out_path, "w") as out:
+        for index, spans in enumerate(turns):
+            segments = critical_path(spans)
+            root = next(s for s in spans if s["name"] == "chat.turn")
+            by_category = dict.fromkeys(categories, 0.0)
+            for segment in segments:
+                by_category[segment["category"]] += segment["sec"]
+            total = sum(by_category.values())
+            for category in categories:
+                totals[category] += by_category[category]
+            speaker = root["attributes"].get("next_speaker", "FINISH")
+            record = {
+                "turn": index,
+                "trace_id": root["trace_id"],
+                "speaker": speaker,
+                "total_sec": total,
+                **{f"{c}_sec": by_category[c] for c in categories},
+                "path": segments,
+            }
+            out.write(json.dumps(record) + "\n")
+            print(f"{index:<6}{speaker:<20}{total:>8.3f}s" + "".join(f"{by_category[c]:>10.3f}s" for c in categories))
+    grand_total = sum(totals.values()) or 1.0
+    print("share " + " " * 29 + "".join(f"{100 * totals[c] / grand_total:>10.1f}%" for c in categories))
+    print(f"[traces] Wrote {out_path}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("in_dir", nargs="?", help="Folder with metrics_<agent>.csv files.")
+    parser.add_argument("--out", help="Output folder for the report (defaults to the input folder).")
+    parser.add_argument("--startup", metavar="LOG_DIR", help="Print startup profiles from this folder.")
+    parser.add_argument("--timeline", help="Resource timeline CSV to join with the handler records of in_dir.")
+    parser.add_argument("--traces", metavar="LOG_DIR", help="Print per-turn critical paths from span files in this folder.")
+    args = parser.parse_args()
+    if args.startup:
+        print_startup_profiles(args.startup)
+    if args.traces:
+        print_critical_paths(args.traces)
+    if args.in_dir:
+        generate_report(args.in_dir, args.out)
+        if args.timeline:
+            align_with_timeline(args.in_dir, args.timeline, args.out)
+    elif not args.startup and not args.traces:
+        parser.print_help()
@@ -1,89 +1,48 @@
-import subprocess
-import time
 import os
+import sys
 
-# Create log directory if not exists
-os.makedirs("logs", exist_ok=True)
+from _readiness import llm_ready
+from agents_launcher import LOG_DIR, agent_specs, place_agents, supervise
+from _utils import load_config
+from supervisor import ProcessSpec
 
-# Track all launched processes
-processes = []
+# Create log directory if not exists
+os.makedirs(LOG_DIR, exist_ok=True)
 
-def run_command(command, log_file, env=None, cores=None):
-    cmd = command
-    if cores is not None:
-        cmd = ["taskset", "-c", cores] + command
-    with open(log_file, "w") as out:
-        proc = subprocess.Popen(cmd, stdout=out, stderr=subprocess.STDOUT, env=env)
-    return proc
+config = load_config()
+base_url = config.client_config["base_url"]
+# The LLM server gets the cores `placement` reserves for it; the agents never share them.
+placement = place_agents(config)
 
 # ---------------------------
-# Launch vLLM (GPUs 0,1)
+# vLLM (GPUs 0,1), or the CPU-only stand-in with --fake-llm
 # ---------------------------
 
-print("Starting Qwen-14B-Instruct on vLLM with GPUs 0,1...")
-
-vllm_env = os.environ.copy()
-vllm_env["CUDA_VISIBLE_DEVICES"] = "0,1"
-
-processes.append(run_command(
-    [
-        "python", "-m", "vllm.entrypoints.openai.api_server",
-        "--model", "Qwen/Qwen2.5-14B-Instruct",
-        "--tensor-parallel-size", "2",
-        "--dtype", "half"
-    ],
-    "logs/vllm.log",
-    env=vllm_env,
-    cores="0-11"
-))
-
-# Wait for vLLM API to be ready
-print("Waiting for vLLM to become available...")
-ready = False
-for i in range(30):
-    try:
-        out = subprocess.check_output(["curl", "-s", "http://localhost:8000/v1/models"])
-        if b'"id"' in out:
-            ready = True
-            break
-    except subprocess.CalledProcessError:
-        pass
-    print("  ...still waiting for vLLM...")
-    time.sleep(10)
-
-if ready:
-    print("Qwen LLM API is online!")
+if "--fake-llm" in sys.argv:
+    print("Starting the fake LLM server (fake_llm section of config.yaml)...")
+    llm = ProcessSpec(
+        name="llm", command=[sys.executable, "fake_llm_server.py"], cpus=placement.llm, log_path="logs/fake_llm.log"
+    )
 else:
-    print("Failed to detect vLLM API. Continuing anyway...")
+    print("Starting Qwen-14B-Instruct on vLLM with GPUs 0,1...")
+    llm = ProcessSpec(
+        name="llm",
+        command=[
+            sys.executable, "-m", "vllm.entrypoints.openai.api_server",
+            "--model", "Qwen/Qwen2.5-14B-Instruct",
+            "--tensor-parallel-size", "2",
+            "--dtype", "half",
+        ],
+        cpus=placement.llm,
+        env={"CUDA_VISIBLE_DEVICES": "0,1"},
+        log_path="logs/vllm.log",
+    )
+llm.ready = lambda: llm_ready(base_url)
 
 # ---------------------------
-# Launch the Agents
+# The agents start once the host (and, for the manager, the LLM) is ready; the supervisor
+# restarts them if they crash and drains all of them, vLLM last, on Ctrl-C.
 # ---------------------------
 
-print("Launching Host Runtime")
-processes.append(run_command(["python", "run_host.py"], "logs/host.log"))
-time.sleep(2)
-
-print("Launching Writer Agent")
-processes.append(run_command(["python", "run_writer_agent.py"], "logs/writer.log", cores="0"))
-time.sleep(1)
-
-print("Launching Editor Agent")
-processes.append(run_command(["python", "run_editor_agent.py"], "logs/editor.log", cores="1"))
-time.sleep(1)
-
-print("Launching Group Chat Manager")
-processes.append(run_command(["python", "run_group_chat_manager.py"], "logs/manager.log", cores="2"))
-time.sleep(1)
-
-print("Launching UI Agent")
-processes.append(run_command(["python", "run_ui.py"], "logs/ui.log", cores="3"))
-time.sleep(1)
-
-print("All agents launched. Waiting for them to finish...")
-
-# Wait for all processes to complete
-for proc in processes:
-    proc.wait()
-
+supervise([llm] + agent_specs(config, placement), config)
 print("All agents have exited.")
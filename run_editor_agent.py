@@ -1,30 +1,42 @@
+from _startup import StartupProfile  # Imported first so the startup profile covers the imports below.
+
 import asyncio
 import logging
 import warnings
+from typing import Any
 
 from _agents import BaseGroupChatAgent
-from _types import AppConfig, GroupChatMessage, MessageChunk, RequestToSpeak
+from _types import AppConfig, GroupChatMessage, MessageChunk, ReadinessProbe, RequestToSpeak
 from _utils import get_serializers, load_config, set_all_log_levels
 from autogen_core import (
+    AgentRuntime,
     TypeSubscription,
 )
-from autogen_ext.models.openai import OpenAIChatCompletionClient
-from autogen_ext.runtimes.grpc import GrpcWorkerAgentRuntime
+from autogen_core.models import ChatCompletionClient
 from rich.console import Console
 from rich.markdown import Markdown
-from agent_timeslices import save_metrics_to_csv_and_cdfs
+from _state_report import drain_state_reports
+from _context import drain_context_windows
+from agent_timeslices import configure_tracking, save_metrics_to_csv_and_cdfs, start_metrics_sink
+from state_service import connect_state_store
+from _telemetry import init_telemetry, shutdown_telemetry
+from _model_clients import build_model_client
+from agent_metrics import init_metrics
+from _gc_tuning import after_startup, configure_gc, stop_gc_monitor
+from _sessions import start_session_reaper, stop_session_reaper
+from _readiness import mark_agent_ready, wait_for_host_async
 
 
-async def main(config: AppConfig):
-    set_all_log_levels(logging.ERROR)
-    editor_agent_runtime = GrpcWorkerAgentRuntime(host_address=config.host.address)
-    editor_agent_runtime.add_message_serializer(get_serializers([RequestToSpeak, GroupChatMessage, MessageChunk]))  # type: ignore[arg-type]
-    await asyncio.sleep(4)
-    Console().print(Markdown("Starting **`Editor Agent`**"))
-    await editor_agent_runtime.start()
-    model_client = OpenAIChatCompletionClient(**config.client_config)
+async def register(
+    runtime: AgentRuntime,
+    config: AppConfig,
+    model_client: ChatCompletionClient,
+    state_store: Any = None,
+    startup: StartupProfile | None = None,
+) -> None:
+    """Registers the Editor agent and its subscriptions in `runtime`."""
     editor_agent_type = await BaseGroupChatAgent.register(
-        editor_agent_runtime,
+        runtime,
         config.editor_agent.topic_type,
         lambda: BaseGroupChatAgent(
             description=config.editor_agent.description,
@@ -32,21 +44,76 @@ async def main(config: AppConfig):
             system_message=config.editor_agent.system_message,
             model_client=model_client,
             ui_config=config.ui_agent,
+            context_policy=config.editor_agent.context,
+            state_report=config.editor_agent.state_report,
+            stream_from_model=config.editor_agent.stream_from_model,
+            state_store=state_store,
         ),
     )
-    await editor_agent_runtime.add_subscription(
+    await runtime.add_subscription(
         TypeSubscription(topic_type=config.editor_agent.topic_type, agent_type=editor_agent_type.type)
     )
-    await editor_agent_runtime.add_subscription(
+    if startup is not None:
+        startup.mark("first_subscription")
+    await runtime.add_subscription(
         TypeSubscription(topic_type=config.group_chat_manager.topic_type, agent_type=editor_agent_type.type)
     )
+    mark_agent_ready(config.editor_agent.topic_type)
+    if startup is not None:
+        startup.mark("subscriptions_ready")
+
+
+async def main(config: AppConfig, startup: StartupProfile | None = None):
+    set_all_log_levels(logging.ERROR)
+    configure_tracking(config.tracking.mode, config.tracking.sample_every)
+    init_telemetry("editor_agent", config.telemetry)
+    init_metrics(
+        "editor_agent",
+        sample_interval_seconds=config.resources.interval_seconds if config.resources.enabled else None,
+        uss_every=config.resources.uss_every,
+        max_overhead=config.resources.max_overhead,
+        flush_interval_seconds=config.metrics.flush_interval_seconds,
+    )
+    configure_gc(config.gc.mode, config.gc.thresholds, config.gc.monitor)
+    start_metrics_sink(
+        config.metrics.out_dir or "editor_metrics", config.metrics.flush_interval_seconds, config.metrics.capacity
+    )
+    # Imported here so run_in_process.py can reuse `register` without loading gRPC.
+    from autogen_ext.runtimes.grpc import GrpcWorkerAgentRuntime
+
+    editor_agent_runtime = GrpcWorkerAgentRuntime(host_address=config.host.address)
+    editor_agent_runtime.add_message_serializer(get_serializers([RequestToSpeak, GroupChatMessage, MessageChunk, ReadinessProbe]))  # type: ignore[arg-type]
+    # The worker runtime needs the host to accept connections before it starts.
+    await wait_for_host_async(config.host.address, config.readiness.timeout_seconds, config.readiness.poll_interval_seconds)
+    if startup is not None:
+        startup.mark("host_ready")
+    Console().print(Markdown("Starting **`Editor Agent`**"))
+    await editor_agent_runtime.start()
+    if startup is not None:
+        startup.mark("runtime_started")
+    state_store = await connect_state_store(config.state_service)
+    model_client = build_model_client(config, "editor_agent")
+    await register(editor_agent_runtime, config, model_client, state_store, startup)
+    if startup is not None:
+        print(startup.summary())
+    after_startup()
+    start_session_reaper(editor_agent_runtime, config.sessions)
 
     await editor_agent_runtime.stop_when_signal()
+    await stop_session_reaper("editor_agent")
+    # Finish background state reports before the model client is closed.
+    await drain_state_reports()
+    await drain_context_windows()
+    if state_store is not None:
+        await state_store.close()
     await model_client.close()
-    save_metrics_to_csv_and_cdfs("editor_metrics")
+    save_metrics_to_csv_and_cdfs(config.metrics.out_dir or "editor_metrics")
+    stop_gc_monitor("editor_agent")
+    shutdown_telemetry()
 
 
 if __name__ == "__main__":
     set_all_log_levels(logging.ERROR)
     warnings.filterwarnings("ignore", category=UserWarning, message="Resolved model mismatch.*")
-    asyncio.run(main(load_config()))
\ No newline at end of file
+    startup = StartupProfile("editor_agent")
+    asyncio.run(main(load_config(), startup))
\ No newline at end of file
@@ -1,37 +1,40 @@
+from _startup import StartupProfile  # Imported first so the startup profile covers the imports below.
+
 import asyncio
 import logging
 import warnings
 
 from _agents import GroupChatManager, publish_message_to_ui, publish_message_to_ui_and_backend
-from _types import AppConfig, GroupChatMessage, MessageChunk, RequestToSpeak
+from _types import AppConfig, GroupChatMessage, MessageChunk, ReadinessProbe, RequestToSpeak
 from _utils import get_serializers, load_config, set_all_log_levels
 from autogen_core import (
+    AgentRuntime,
     TypeSubscription,
 )
-from autogen_ext.models.openai import OpenAIChatCompletionClient
-from autogen_ext.runtimes.grpc import GrpcWorkerAgentRuntime
+from autogen_core.models import ChatCompletionClient
 from rich.console import Console
 from rich.markdown import Markdown
-from agent_timeslices import save_metrics_to_csv_and_cdfs
+from agent_timeslices import configure_tracking, save_metrics_to_csv_and_cdfs, start_metrics_sink
+from _telemetry import init_telemetry, shutdown_telemetry
+from _model_clients import build_model_client
+from agent_metrics import init_metrics
+from _gc_tuning import after_startup, configure_gc, stop_gc_monitor
+from _sessions import start_session_reaper, stop_session_reaper
+from _readiness import wait_for_host_async, wait_for_participants
 
 
 set_all_log_levels(logging.ERROR)
 
 
-async def main(config: AppConfig):
-    set_all_log_levels(logging.ERROR)
-    group_chat_manager_runtime = GrpcWorkerAgentRuntime(host_address=config.host.address)
-
-    group_chat_manager_runtime.add_message_serializer(get_serializers([RequestToSpeak, GroupChatMessage, MessageChunk]))  # type: ignore[arg-type]
-    await asyncio.sleep(1)
-    Console().print(Markdown("Starting **`Group Chat Manager`**"))
-    await group_chat_manager_runtime.start()
-    set_all_log_levels(logging.ERROR)
-
-    model_client = OpenAIChatCompletionClient(**config.client_config)
-
+async def register(
+    runtime: AgentRuntime,
+    config: AppConfig,
+    model_client: ChatCompletionClient,
+    startup: StartupProfile | None = None,
+) -> None:
+    """Registers the group chat manager and its subscription in `runtime`."""
     group_chat_manager_type = await GroupChatManager.register(
-        group_chat_manager_runtime,
+        runtime,
         "group_chat_manager",
         lambda: GroupChatManager(
             model_client=model_client,
@@ -39,37 +42,100 @@ async def main(config: AppConfig):
             participant_descriptions=[config.writer_agent.description, config.editor_agent.description],
             max_rounds=config.group_chat_manager.max_rounds,
             ui_config=config.ui_agent,
+            transcript_max_chars=config.group_chat_manager.transcript_max_chars,
+            transcript_max_tokens=config.group_chat_manager.transcript_max_tokens,
+            speaker_selection=config.group_chat_manager.speaker_selection,
         ),
     )
 
-    await group_chat_manager_runtime.add_subscription(
+    await runtime.add_subscription(
         TypeSubscription(topic_type=config.group_chat_manager.topic_type, agent_type=group_chat_manager_type.type)
     )
-
-    await asyncio.sleep(5)
+    if startup is not None:
+        startup.mark("first_subscription")
+        startup.mark("subscriptions_ready")
+
+
+async def send_initial_message(runtime: AgentRuntime, config: AppConfig, startup: StartupProfile | None = None) -> None:
+    """Posts `group_chat_manager.initial_message` on behalf of the user once every participant has subscribed."""
+    assert config.group_chat_manager.initial_message is not None
+    await wait_for_participants(
+        runtime,
+        [config.writer_agent.topic_type, config.editor_agent.topic_type],
+        config.readiness.timeout_seconds,
+        config.readiness.poll_interval_seconds,
+    )
+    if startup is not None:
+        startup.mark("participants_ready")
 
     await publish_message_to_ui(
-        runtime=group_chat_manager_runtime,
+        runtime=runtime,
         source="System",
         user_message="[ **Due to responsible AI considerations of this sample, group chat manager is sending an initiator message on behalf of user** ]",
         ui_config=config.ui_agent,
     )
-    await asyncio.sleep(3)
 
-    user_message: str = "Please write a short story about the gingerbread in halloween!"
+    user_message: str = config.group_chat_manager.initial_message
     Console().print(f"Simulating User input in group chat topic:\n\t'{user_message}'")
 
     await publish_message_to_ui_and_backend(
-        runtime=group_chat_manager_runtime,
+        runtime=runtime,
         source="User",
         user_message=user_message,
         ui_config=config.ui_agent,
         group_chat_topic_type=config.group_chat_manager.topic_type,
     )
 
+
+async def main(config: AppConfig, startup: StartupProfile | None = None):
+    set_all_log_levels(logging.ERROR)
+    configure_tracking(config.tracking.mode, config.tracking.sample_every)
+    init_telemetry("group_chat_manager", config.telemetry)
+    init_metrics(
+        "group_chat_manager",
+        sample_interval_seconds=config.resources.interval_seconds if config.resources.enabled else None,
+        uss_every=config.resources.uss_every,
+        max_overhead=config.resources.max_overhead,
+        flush_interval_seconds=config.metrics.flush_interval_seconds,
+    )
+    configure_gc(config.gc.mode, config.gc.thresholds, config.gc.monitor)
+    start_metrics_sink(
+        config.metrics.out_dir or "group_chat_manager_metrics", config.metrics.flush_interval_seconds, config.metrics.capacity
+    )
+    # Imported here so run_in_process.py can reuse `register` without loading gRPC.
+    from autogen_ext.runtimes.grpc import GrpcWorkerAgentRuntime
+
+    group_chat_manager_runtime = GrpcWorkerAgentRuntime(host_address=config.host.address)
+
+    group_chat_manager_runtime.add_message_serializer(get_serializers([RequestToSpeak, GroupChatMessage, MessageChunk, ReadinessProbe]))  # type: ignore[arg-type]
+    # The worker runtime needs the host to accept connections before it starts.
+    await wait_for_host_async(config.host.address, config.readiness.timeout_seconds, config.readiness.poll_interval_seconds)
+    if startup is not None:
+        startup.mark("host_ready")
+    Console().print(Markdown("Starting **`Group Chat Manager`**"))
+    await group_chat_manager_runtime.start()
+    if startup is not None:
+        startup.mark("runtime_started")
+    set_all_log_levels(logging.ERROR)
+
+    model_client = build_model_client(config, "group_chat_manager")
+
+    await register(group_chat_manager_runtime, config, model_client, startup)
+    after_startup()
+    start_session_reaper(group_chat_manager_runtime, config.sessions)
+
+    if config.group_chat_manager.initial_message is not None:
+        await send_initial_message(group_chat_manager_runtime, config, startup)
+        if startup is not None:
+            startup.mark("first_message_sent")
+            print(startup.summary())
+
     await group_chat_manager_runtime.stop_when_signal()
+    await stop_session_reaper("group_chat_manager")
     await model_client.close()
-    save_metrics_to_csv_and_cdfs("group_chat_manager_metrics")
+    save_metrics_to_csv_and_cdfs(config.metrics.out_dir or "group_chat_manager_metrics")
+    stop_gc_monitor("group_chat_manager")
+    shutdown_telemetry()
     Console().print("Manager left the chat!")
     
 
@@ -77,5 +143,6 @@ async def main(config: AppConfig):
 if __name__ == "__main__":
     set_all_log_levels(logging.ERROR)
     warnings.filterwarnings("ignore", category=UserWarning, message="Resolved model mismatch.*")
-    asyncio.run(main(load_config()))
+    startup = StartupProfile("group_chat_manager")
+    asyncio.run(main(load_config(), startup))
 
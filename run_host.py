@@ -1,22 +1,41 @@
+from _startup import StartupProfile  # Imported first so the startup profile covers the imports below.
+
 import asyncio
 
-from _types import HostConfig
+from _types import AppConfig
 from _utils import load_config
 from autogen_ext.runtimes.grpc import GrpcWorkerAgentRuntimeHost
 from rich.console import Console
 from rich.markdown import Markdown
+from state_service import serve
 
 
-async def main(host_config: HostConfig):
+async def main(config: AppConfig, startup: StartupProfile | None = None):
+    host_config = config.host
     host = GrpcWorkerAgentRuntimeHost(address=host_config.address)
     host.start()
+    if startup is not None:
+        startup.mark("host_started")
 
     console = Console()
     console.print(
         Markdown(f"**`Distributed Host`** is now running and listening for connection at **`{host_config.address}`**")
     )
+    state_service = None
+    if config.state_service.enabled and config.state_service.cohost:
+        state_service = await serve(config.state_service.hostname, config.state_service.port)
+        console.print(
+            Markdown(
+                f"**`State Service`** is listening at **`{config.state_service.hostname}:{config.state_service.port}`**"
+            )
+        )
+    if startup is not None:
+        print(startup.summary())
     await host.stop_when_signal()
+    if state_service is not None:
+        await state_service.stop()
 
 
 if __name__ == "__main__":
-    asyncio.run(main(load_config().host))
\ No newline at end of file
+    startup = StartupProfile("host")
+    asyncio.run(main(load_config(), startup))
@@ -0,0 +1,144 @@
+"""
+Runs the whole group chat in one process: the writer, editor, manager and a console UI agent are
+registered in a single `SingleThreadedAgentRuntime`, so messages are handed over in memory
+instead of being serialized through the gRPC host. Selected with `runtime.mode: "in_process"`;
+the agents, their configuration and the per-process instrumentation are the same as in the
+distributed entry points.
+
+    python run_in_process.py
+"""
+from _startup import StartupProfile  # Imported first so the startup profile covers the imports below.
+
+import asyncio
+import logging
+import warnings
+from typing import Any, Dict, List, Optional
+
+import run_editor_agent
+import run_group_chat_manager
+import run_writer_agent
+from _agents import UIAgent
+from _types import AppConfig, MessageChunk
+from _utils import load_config, set_all_log_levels
+from autogen_core import SingleThreadedAgentRuntime, TypeSubscription
+from autogen_core.models import ChatCompletionClient
+from rich.console import Console
+from rich.markdown import Markdown
+from _state_report import drain_state_reports
+from _context import drain_context_windows
+from agent_timeslices import configure_tracking, save_metrics_to_csv_and_cdfs, start_metrics_sink
+from state_service import connect_state_store
+from _telemetry import init_telemetry, shutdown_telemetry
+from _model_clients import build_model_client
+from agent_metrics import init_metrics
+from _gc_tuning import after_startup, configure_gc, stop_gc_monitor
+from _sessions import start_session_reaper, stop_session_reaper
+
+AGENT_NAME = "in_process"
+
+
+def init_process(config: AppConfig, metrics_dir: str = "in_process_metrics") -> None:
+    """Sets up tracking, telemetry, resource sampling, GC tuning and the metrics sink of this process."""
+    configure_tracking(config.tracking.mode, config.tracking.sample_every)
+    init_telemetry(AGENT_NAME, config.telemetry)
+    init_metrics(
+        AGENT_NAME,
+        sample_interval_seconds=config.resources.interval_seconds if config.resources.enabled else None,
+        uss_every=config.resources.uss_every,
+        max_overhead=config.resources.max_overhead,
+        flush_interval_seconds=config.metrics.flush_interval_seconds,
+    )
+    configure_gc(config.gc.mode, config.gc.thresholds, config.gc.monitor)
+    start_metrics_sink(config.metrics.out_dir or metrics_dir, config.metrics.flush_interval_seconds, config.metrics.capacity)
+
+
+class ConsoleUI:
+    """Prints each UI message once its last chunk arrives; stands in for the Chainlit UI of run_ui.py."""
+
+    def __init__(self, enabled: bool = True) -> None:
+        self._enabled = enabled
+        self._pending: Dict[str, List[str]] = {}
+
+    async def on_message_chunk(self, chunk: MessageChunk) -> None:
+        if not self._enabled:
+            return
+        self._pending.setdefault(chunk.message_id, []).append(chunk.text)
+        if chunk.finished:
+            text = "".join(self._pending.pop(chunk.message_id))
+            Console().print(Markdown(f"**UI** {chunk.author}: {text}"))
+
+
+class InProcessChat:
+    """The agents of the group chat registered in one single-threaded runtime."""
+
+    def __init__(self, config: AppConfig) -> None:
+        self.config = config
+        self.runtime = SingleThreadedAgentRuntime()
+        self._model_clients: List[ChatCompletionClient] = []
+        self._state_store: Optional[Any] = None
+
+    async def start(self, startup: StartupProfile | None = None) -> None:
+        config = self.config
+        self.runtime.start()
+        if startup is not None:
+            startup.mark("runtime_started")
+        self._state_store = await connect_state_store(config.state_service)
+        # One client per agent type, so LLM metrics and cache records keep their agent label.
+        writer_client = build_model_client(config, "writer_agent")
+        editor_client = build_model_client(config, "editor_agent")
+        manager_client = build_model_client(config, "group_chat_manager")
+        self._model_clients = [writer_client, editor_client, manager_client]
+
+        await run_writer_agent.register(self.runtime, config, writer_client, self._state_store)
+        await run_editor_agent.register(self.runtime, config, editor_client, self._state_store)
+        await run_group_chat_manager.register(self.runtime, config, manager_client)
+        ui = ConsoleUI(enabled=not config.ui_agent.benchmark_mode)
+        ui_agent_type = await UIAgent.register(
+            self.runtime, "ui_agent", lambda: UIAgent(on_message_chunk_func=ui.on_message_chunk)
+        )
+        await self.runtime.add_subscription(
+            TypeSubscription(topic_type=config.ui_agent.topic_type, agent_type=ui_agent_type.type)
+        )
+        if startup is not None:
+            startup.mark("subscriptions_ready")
+
+    async def close(self) -> None:
+        """Releases what `start` acquired; call once the runtime has stopped."""
+        await drain_state_reports()
+        await drain_context_windows()
+        if self._state_store is not None:
+            await self._state_store.close()
+        for model_client in self._model_clients:
+            await model_client.close()
+
+
+async def main(config: AppConfig, startup: StartupProfile | None = None) -> None:
+    set_all_log_levels(logging.ERROR)
+    init_process(config)
+    Console().print(Markdown("Starting **`Group Chat`** in a single runtime"))
+    chat = InProcessChat(config)
+    await chat.start(startup)
+    if startup is not None:
+        print(startup.summary())
+    after_startup()
+    start_session_reaper(chat.runtime, config.sessions)
+
+    if config.group_chat_manager.initial_message is not None:
+        await run_group_chat_manager.send_initial_message(chat.runtime, config, startup)
+        if startup is not None:
+            startup.mark("first_message_sent")
+
+    await chat.runtime.stop_when_signal()
+    await stop_session_reaper(AGENT_NAME)
+    await chat.close()
+    save_metrics_to_csv_and_cdfs(config.metrics.out_dir or "in_process_metrics")
+    stop_gc_monitor(AGENT_NAME)
+    shutdown_telemetry()
+    Console().print("Group chat stopped!")
+
+
+if __name__ == "__main__":
+    set_all_log_levels(logging.ERROR)
+    warnings.filterwarnings("ignore", category=UserWarning, message="Resolved model mismatch.*")
+    startup = StartupProfile(AGENT_NAME)
+    asyncio.run(main(load_config(), startup))
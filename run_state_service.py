@@ -0,0 +1,25 @@
+import asyncio
+import signal
+
+from _types import StateServiceConfig
+from _utils import load_config
+from rich.console import Console
+from rich.markdown import Markdown
+from state_service import serve
+
+
+async def main(state_config: StateServiceConfig):
+    service = await serve(state_config.hostname, state_config.port)
+    Console().print(
+        Markdown(f"**`State Service`** is listening at **`{state_config.hostname}:{state_config.port}`**")
+    )
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    await stop.wait()
+    await service.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(load_config().state_service))
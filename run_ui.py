@@ -1,3 +1,5 @@
+from _startup import StartupProfile  # Imported first so the startup profile covers the imports below.
+
 import asyncio
 import logging
 import warnings
@@ -34,7 +36,7 @@ async def send_cl_stream(msg: MessageChunk) -> None:
         await cl_msg.send()  # type: ignore [reportUnknownMemberType]
 
 
-async def main(config: AppConfig):
+async def main(config: AppConfig, startup: StartupProfile | None = None):
     set_all_log_levels(logging.ERROR)
     ui_agent_runtime = GrpcWorkerAgentRuntime(host_address=config.host.address)
 
@@ -42,6 +44,8 @@ async def main(config: AppConfig):
 
     Console().print(Markdown("Starting **`UI Agent`**"))
     await ui_agent_runtime.start()
+    if startup is not None:
+        startup.mark("runtime_started")
     set_all_log_levels(logging.ERROR)
 
     ui_agent_type = await UIAgent.register(
@@ -55,6 +59,10 @@ async def main(config: AppConfig):
     await ui_agent_runtime.add_subscription(
         TypeSubscription(topic_type=config.ui_agent.topic_type, agent_type=ui_agent_type.type)
     )  # TODO: This could be a great example of using agent_id to route to sepecific element in the ui. Can replace MessageChunk.message_id
+    if startup is not None:
+        startup.mark("first_subscription")
+        startup.mark("subscriptions_ready")
+        print(startup.summary())
 
     await ui_agent_runtime.stop_when_signal()
     Console().print("UI Agent left the chat!")
@@ -64,4 +72,4 @@ async def main(config: AppConfig):
 async def start_chat():
     set_all_log_levels(logging.ERROR)
     warnings.filterwarnings("ignore", category=UserWarning, message="Resolved model mismatch.*")
-    asyncio.run(main(load_config()))
\ No newline at end of file
+    asyncio.run(main(load_config(), StartupProfile("ui_agent")))
\ No newline at end of file
@@ -1,52 +1,120 @@
+from _startup import StartupProfile  # Imported first so the startup profile covers the imports below.
+
 import asyncio
 import logging
 import warnings
+from typing import Any
 
 from _agents import BaseGroupChatAgent
-from _types import AppConfig, GroupChatMessage, MessageChunk, RequestToSpeak
+from _types import AppConfig, GroupChatMessage, MessageChunk, ReadinessProbe, RequestToSpeak
 from _utils import get_serializers, load_config, set_all_log_levels
 from autogen_core import (
+    AgentRuntime,
     TypeSubscription,
 )
-from autogen_ext.models.openai import OpenAIChatCompletionClient
-from autogen_ext.runtimes.grpc import GrpcWorkerAgentRuntime
+from autogen_core.models import ChatCompletionClient
 from rich.console import Console
 from rich.markdown import Markdown
-from agent_timeslices import save_metrics_to_csv_and_cdfs
-
+from _state_report import drain_state_reports
+from _context import drain_context_windows
+from agent_timeslices import configure_tracking, save_metrics_to_csv_and_cdfs, start_metrics_sink
+from state_service import connect_state_store
+from _telemetry import init_telemetry, shutdown_telemetry
+from _model_clients import build_model_client
+from agent_metrics import init_metrics
+from _gc_tuning import after_startup, configure_gc, stop_gc_monitor
+from _sessions import start_session_reaper, stop_session_reaper
+from _readiness import mark_agent_ready, wait_for_host_async
 
 
-async def main(config: AppConfig) -> None:
-    set_all_log_levels(logging.ERROR)
-    writer_agent_runtime = GrpcWorkerAgentRuntime(host_address=config.host.address)
-    writer_agent_runtime.add_message_serializer(get_serializers([RequestToSpeak, GroupChatMessage, MessageChunk]))  # type: ignore[arg-type]
-    await asyncio.sleep(3)
-    Console().print(Markdown("Starting **`Writer Agent`**"))
-
-    await writer_agent_runtime.start()
+async def register(
+    runtime: AgentRuntime,
+    config: AppConfig,
+    model_client: ChatCompletionClient,
+    state_store: Any = None,
+    startup: StartupProfile | None = None,
+) -> None:
+    """Registers the Writer agent and its subscriptions in `runtime`."""
     writer_agent_type = await BaseGroupChatAgent.register(
-        writer_agent_runtime,
+        runtime,
         config.writer_agent.topic_type,
         lambda: BaseGroupChatAgent(
             description=config.writer_agent.description,
             group_chat_topic_type=config.group_chat_manager.topic_type,
             system_message=config.writer_agent.system_message,
-            model_client=OpenAIChatCompletionClient(**config.client_config),
+            model_client=model_client,
             ui_config=config.ui_agent,
+            context_policy=config.writer_agent.context,
+            state_report=config.writer_agent.state_report,
+            stream_from_model=config.writer_agent.stream_from_model,
+            state_store=state_store,
         ),
     )
-    await writer_agent_runtime.add_subscription(
+    await runtime.add_subscription(
         TypeSubscription(topic_type=config.writer_agent.topic_type, agent_type=writer_agent_type.type)
     )
-    await writer_agent_runtime.add_subscription(
+    if startup is not None:
+        startup.mark("first_subscription")
+    await runtime.add_subscription(
         TypeSubscription(topic_type=config.group_chat_manager.topic_type, agent_type=config.writer_agent.topic_type)
     )
+    mark_agent_ready(config.writer_agent.topic_type)
+    if startup is not None:
+        startup.mark("subscriptions_ready")
+
+
+async def main(config: AppConfig, startup: StartupProfile | None = None) -> None:
+    set_all_log_levels(logging.ERROR)
+    configure_tracking(config.tracking.mode, config.tracking.sample_every)
+    init_telemetry("writer_agent", config.telemetry)
+    init_metrics(
+        "writer_agent",
+        sample_interval_seconds=config.resources.interval_seconds if config.resources.enabled else None,
+        uss_every=config.resources.uss_every,
+        max_overhead=config.resources.max_overhead,
+        flush_interval_seconds=config.metrics.flush_interval_seconds,
+    )
+    configure_gc(config.gc.mode, config.gc.thresholds, config.gc.monitor)
+    start_metrics_sink(
+        config.metrics.out_dir or "writer_metrics", config.metrics.flush_interval_seconds, config.metrics.capacity
+    )
+    # Imported here so run_in_process.py can reuse `register` without loading gRPC.
+    from autogen_ext.runtimes.grpc import GrpcWorkerAgentRuntime
+
+    writer_agent_runtime = GrpcWorkerAgentRuntime(host_address=config.host.address)
+    writer_agent_runtime.add_message_serializer(get_serializers([RequestToSpeak, GroupChatMessage, MessageChunk, ReadinessProbe]))  # type: ignore[arg-type]
+    # The worker runtime needs the host to accept connections before it starts.
+    await wait_for_host_async(config.host.address, config.readiness.timeout_seconds, config.readiness.poll_interval_seconds)
+    if startup is not None:
+        startup.mark("host_ready")
+    Console().print(Markdown("Starting **`Writer Agent`**"))
+
+    await writer_agent_runtime.start()
+    if startup is not None:
+        startup.mark("runtime_started")
+    state_store = await connect_state_store(config.state_service)
+    # One client for all session instances, so the connection pool is shared across conversations.
+    model_client = build_model_client(config, "writer_agent")
+    await register(writer_agent_runtime, config, model_client, state_store, startup)
+    if startup is not None:
+        print(startup.summary())
+    after_startup()
+    start_session_reaper(writer_agent_runtime, config.sessions)
 
     await writer_agent_runtime.stop_when_signal()
-    save_metrics_to_csv_and_cdfs("writer_metrics")
+    await stop_session_reaper("writer_agent")
+    await drain_state_reports()
+    await drain_context_windows()
+    if state_store is not None:
+        await state_store.close()
+    await model_client.close()
+    save_metrics_to_csv_and_cdfs(config.metrics.out_dir or "writer_metrics")
+    stop_gc_monitor("writer_agent")
+    shutdown_telemetry()
 
 
 if __name__ == "__main__":
     set_all_log_levels(logging.ERROR)
     warnings.filterwarnings("ignore", category=UserWarning, message="Resolved model mismatch.*")
-    asyncio.run(main(load_config()))
\ No newline at end of file
+    startup = StartupProfile("writer_agent")
+    asyncio.run(main(load_config(), startup))
\ No newline at end of file
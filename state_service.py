@@ -0,0 +1,293 @@
+"""
+Networked, versioned UnifiedState service.
+
+The service keeps every schema key with a per-key version and speaks newline-delimited JSON over TCP,
+so agents in different processes or on different nodes share one state. Clients subscribe to deltas:
+every change is pushed to all connections as the changed keys only. `RemoteUnifiedState` keeps a
+local cache fed by that stream, so reads are served from memory and only writes cost a round trip.
+
+Requests carry an `id` that is echoed in the response:
+    {"id": 1, "op": "snapshot"}
+    {"id": 2, "op": "set", "key": k, "value": v}
+    {"id": 3, "op": "update", "updates": {k: v, ...}}
+    {"id": 4, "op": "cas", "key": k, "expected_version": n, "value": v}
+Pushed deltas have no `id`:
+    {"event": "delta", "version": n, "changes": {k: [value, key_version], ...}}
+
+A malformed request line is answered with `{"id": null, "error": ...}`. A subscriber whose unsent
+deltas exceed `max_buffer_bytes` is disconnected rather than buffered without bound; its client
+drops its cache, reconnects and takes a fresh snapshot.
+"""
+import asyncio
+import itertools
+import json
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from _types import StateServiceConfig
+from unified_state_config import PREDEFINED_STATE
+
+ChangeCallback = Callable[[Dict[str, Any]], None]
+
+
+class StateService:
+    """Authoritative state store; see the module docstring for the protocol."""
+
+    def __init__(self, schema: Dict[str, Any] = PREDEFINED_STATE, max_buffer_bytes: int = 1 << 20) -> None:
+        self.schema = schema
+        self._max_buffer_bytes = max_buffer_bytes
+        self._values: Dict[str, Any] = dict(schema)
+        self._versions: Dict[str, int] = {key: 0 for key in schema}
+        self._version = 0
+        self._writers: Set[asyncio.StreamWriter] = set()
+        self._server: Optional[asyncio.base_events.Server] = None
+
+    async def start(self, hostname: str, port: int) -> None:
+        self._server = await asyncio.start_server(self._handle_connection, hostname, port)
+
+    async def stop(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            for writer in list(self._writers):
+                writer.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    def _check_key(self, key: Any) -> str:
+        if not isinstance(key, str):
+            raise ValueError(f"A key must be a string, not {type(key).__name__}.")
+        if key not in self.schema:
+            raise KeyError(f"Key '{key}' not in schema.")
+        return key
+
+    def _apply(self, updates: Any) -> Dict[str, List[Any]]:
+        # Validated before anything changes, so a bad request leaves the version alone.
+        if not isinstance(updates, dict):
+            raise ValueError(f"`updates` must be an object, not {type(updates).__name__}.")
+        for key in updates:
+            self._check_key(key)
+        self._version += 1
+        changes: Dict[str, List[Any]] = {}
+        for key, value in updates.items():
+            self._values[key] = value
+            self._versions[key] += 1
+            changes[key] = [value, self._versions[key]]
+        self._broadcast({"event": "delta", "version": self._version, "changes": changes})
+        return changes
+
+    def _broadcast(self, event: Dict[str, Any]) -> None:
+        line = (json.dumps(event) + "\n").encode()
+        for writer in list(self._writers):
+            if writer.is_closing():
+                self._writers.discard(writer)
+            elif writer.transport.get_write_buffer_size() + len(line) > self._max_buffer_bytes:
+                # A subscriber that cannot keep up is dropped; its client resnapshots on reconnect.
+                self._writers.discard(writer)
+                writer.close()
+            else:
+                writer.write(line)
+
+    def _handle_request(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        op = request.get("op")
+        if op == "snapshot":
+            return {
+                "version": self._version,
+                "values": {key: [self._values[key], self._versions[key]] for key in self.schema},
+            }
+        if op == "set":
+            key = self._check_key(request["key"])
+            return {"version": self._version + 1, "changes": self._apply({key: request["value"]})}
+        if op == "update":
+            return {"version": self._version + 1, "changes": self._apply(request["updates"])}
+        if op == "cas":
+            key = self._check_key(request["key"])
+            if self._versions[key] != request["expected_version"]:
+                return {"ok": False, "value": self._values[key], "key_version": self._versions[key]}
+            changes = self._apply({key: request["value"]})
+            return {"ok": True, "value": request["value"], "key_version": changes[key][1]}
+        raise ValueError(f"Unknown op: {op}")
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self._writers.add(writer)
+        try:
+            while line := await reader.readline():
+                request_id = None
+                try:
+                    request = json.loads(line)
+                    if not isinstance(request, dict):
+                        raise ValueError("A request must be a JSON object.")
+                    request_id = request.get("id")
+                    response = self._handle_request(request)
+                except (KeyError, TypeError, ValueError) as e:
+                    response = {"error": str(e)}
+                response["id"] = request_id
+                writer.write((json.dumps(response) + "\n").encode())
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self._writers.discard(writer)
+            writer.close()
+
+
+class RemoteUnifiedState:
+    """
+    Client of `StateService` with a local read cache.
+
+    `get` never touches the network: the cache is seeded from a snapshot on `connect` and kept
+    current by the delta stream. Writes go to the service and return once it has applied them.
+    When the connection drops, the cache is invalidated, so reads and writes raise
+    `ConnectionError` until a background task has reconnected and taken a new snapshot.
+    """
+
+    def __init__(
+        self, hostname: str, port: int, reconnect_backoff_seconds: float = 0.5, max_backoff_seconds: float = 10.0
+    ) -> None:
+        self._address = (hostname, port)
+        self._reconnect_backoff = reconnect_backoff_seconds
+        self._max_backoff = max_backoff_seconds
+        self._connected = False
+        self._closed = False
+        self._reconnect_task: Optional[asyncio.Task[None]] = None
+        self._values: Dict[str, Any] = {}
+        self._versions: Dict[str, int] = {}
+        self._ids = itertools.count(1)
+        self._waiters: Dict[int, asyncio.Future[Dict[str, Any]]] = {}
+        self._callbacks: List[ChangeCallback] = []
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._read_task: Optional[asyncio.Task[None]] = None
+
+    async def connect(self) -> "RemoteUnifiedState":
+        self._reader, self._writer = await asyncio.open_connection(*self._address)
+        self._read_task = asyncio.create_task(self._read_loop())
+        snapshot = await self._request({"op": "snapshot"})
+        # A restarted service counts versions from zero again, so the snapshot replaces the cache.
+        self._values.clear()
+        self._versions.clear()
+        self._apply_changes(snapshot["values"])
+        self._connected = True
+        return self
+
+    async def close(self) -> None:
+        self._closed = True
+        self._connected = False
+        if self._reconnect_task is not None:
+            self._reconnect_task.cancel()
+            await asyncio.gather(self._reconnect_task, return_exceptions=True)
+        if self._writer is not None:
+            self._writer.close()
+        if self._read_task is not None:
+            self._read_task.cancel()
+            await asyncio.gather(self._read_task, return_exceptions=True)
+
+    def _check_connected(self) -> None:
+        if not self._connected:
+            raise ConnectionError("State service connection lost; the cache is invalid until it reconnects.")
+
+    async def _reconnect(self) -> None:
+        backoff = self._reconnect_backoff
+        while not self._closed:
+            await asyncio.sleep(backoff)
+            try:
+                await self.connect()
+                print(f"[state_service] Reconnected to {self._address[0]}:{self._address[1]}")
+                return
+            except OSError:
+                if self._writer is not None:
+                    self._writer.close()
+                backoff = min(backoff * 2, self._max_backoff)
+
+    def on_change(self, callback: ChangeCallback) -> None:
+        """Registers a callback receiving `{key: value}` for every change seen by this client."""
+        self._callbacks.append(callback)
+
+    def get(self, key: str) -> Any:
+        self._check_connected()
+        if key not in self._values:
+            raise KeyError(f"Key '{key}' not found in memory.")
+        return self._values[key]
+
+    def version(self, key: str) -> int:
+        self._check_connected()
+        return self._versions.get(key, 0)
+
+    def snapshot(self) -> Dict[str, Any]:
+        self._check_connected()
+        return dict(self._values)
+
+    async def set(self, key: str, value: Any) -> None:
+        self._check_connected()
+        response = await self._request({"op": "set", "key": key, "value": value})
+        self._apply_changes(response["changes"])
+
+    async def update(self, updates: Dict[str, Any]) -> None:
+        self._check_connected()
+        response = await self._request({"op": "update", "updates": updates})
+        self._apply_changes(response["changes"])
+
+    async def compare_and_set(self, key: str, expected_version: int, value: Any) -> Tuple[bool, Any]:
+        """Sets `key` only if its version is still `expected_version`; returns `(ok, current value)`."""
+        self._check_connected()
+        response = await self._request({"op": "cas", "key": key, "expected_version": expected_version, "value": value})
+        self._apply_changes({key: [response["value"], response["key_version"]]})
+        return response["ok"], response["value"]
+
+    def _apply_changes(self, changes: Dict[str, List[Any]]) -> None:
+        changed: Dict[str, Any] = {}
+        for key, (value, version) in changes.items():
+            # Responses and pushed deltas can arrive in either order; keep the newest.
+            if version >= self._versions.get(key, -1):
+                if self._versions.get(key) != version:
+                    changed[key] = value
+                self._values[key] = value
+                self._versions[key] = version
+        if changed:
+            for callback in self._callbacks:
+                callback(changed)
+
+    async def _request(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        if self._writer is None or self._writer.is_closing():
+            raise ConnectionError("State service connection closed.")
+        request_id = next(self._ids)
+        future: asyncio.Future[Dict[str, Any]] = asyncio.get_running_loop().create_future()
+        self._waiters[request_id] = future
+        self._writer.write((json.dumps({**request, "id": request_id}) + "\n").encode())
+        await self._writer.drain()
+        response = await future
+        if "error" in response:
+            raise KeyError(response["error"])
+        return response
+
+    async def _read_loop(self) -> None:
+        assert self._reader is not None
+        try:
+            while line := await self._reader.readline():
+                message = json.loads(line)
+                if message.get("event") == "delta":
+                    self._apply_changes(message["changes"])
+                elif (future := self._waiters.pop(message.get("id"), None)) is not None:
+                    future.set_result(message)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self._connected = False
+            for future in self._waiters.values():
+                if not future.done():
+                    future.set_exception(ConnectionError("State service connection closed."))
+            self._waiters.clear()
+            if not self._closed and (self._reconnect_task is None or self._reconnect_task.done()):
+                print(f"[state_service] Lost the connection to {self._address[0]}:{self._address[1]}; reconnecting")
+                self._reconnect_task = asyncio.create_task(self._reconnect())
+
+
+async def serve(hostname: str, port: int, schema: Dict[str, Any] = PREDEFINED_STATE) -> StateService:
+    service = StateService(schema)
+    await service.start(hostname, port)
+    return service
+
+
+async def connect_state_store(config: StateServiceConfig) -> Optional[RemoteUnifiedState]:
+    """Connects to the configured state service, or returns None when it is disabled."""
+    if not config.enabled:
+        return None
+    return await RemoteUnifiedState(config.hostname, config.port).connect()
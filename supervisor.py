@@ -0,0 +1,364 @@
+"""
+Process supervisor used by agents_launcher.py, phoenix_launcher.py and benchmark.py.
+
+- Every child runs in its own process group (a new session), so a signal sent to the group reaches
+  whatever the child spawned as well, and a Ctrl-C on the terminal reaches only the supervisor.
+- Children start as soon as the children and external services they require are ready (see
+  `_readiness`); `start` returns once all of them are.
+- A child that exits while the supervisor is running is restarted after `restart_backoff_seconds`,
+  doubling up to `max_backoff_seconds`, at most `max_restarts` times; a child that stayed up for
+  `stable_seconds` starts again from the initial backoff.
+- SIGINT or SIGTERM to the supervisor stops the children in reverse start order: each process group
+  gets SIGTERM, which makes `stop_when_signal` of the entry point return so it drains its state
+  reports and saves its metrics, and is killed after `drain_timeout_seconds`. Processes still left
+  in a group afterwards are killed and reported as leaked.
+- The group of each running child is recorded in `<log_dir>/supervisor.json`, which
+  cleanup_processes.py uses to tear down a supervisor that could not stop its children.
+
+`report` gives the time of each phase of the cycle: startup (launch until every child is ready),
+run, shutdown (until every group is gone) and total.
+"""
+import json
+import multiprocessing
+import os
+import signal
+import subprocess
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import psutil
+
+from _types import ReadinessConfig, SupervisorConfig
+
+
+@dataclass
+class ProcessSpec:
+    """A supervised child: either a `command` run with Popen or a `target` run in a spawned process."""
+
+    name: str
+    command: Optional[List[str]] = None
+    target: Optional[Callable[..., Any]] = None
+    args: Tuple[Any, ...] = ()
+    # Names of children or external checks (see `Supervisor(external=...)`) that must be ready first.
+    requires: Tuple[str, ...] = ()
+    # Readiness check; None counts the child as ready once it is started.
+    ready: Optional[Callable[[], bool]] = None
+    # CPUs the child is pinned to; None leaves the affinity alone.
+    cpus: Optional[List[int]] = None
+    # Environment variables set for a `command` on top of the supervisor's own.
+    env: Optional[Dict[str, str]] = None
+    # stdout and stderr of a `command`; a `target` redirects its own output. A restart appends to it.
+    log_path: Optional[str] = None
+    # Files removed before every launch, such as the startup profile `ready` reads, so a restarted
+    # child is not taken as ready from what its previous run wrote.
+    stale_paths: Tuple[str, ...] = ()
+    restart: bool = True
+
+
+def _run_in_own_group(cpus: Optional[List[int]], target: Callable[..., Any], args: Tuple[Any, ...]) -> None:
+    """Spawned child: leaves the supervisor's process group, pins itself and runs `target`."""
+    os.setsid()
+    if cpus:
+        os.sched_setaffinity(0, cpus)
+    target(*args)
+
+
+class _Child:
+    def __init__(self, spec: ProcessSpec) -> None:
+        self.spec = spec
+        self.handle: Any = None
+        self.started_at = 0.0
+        self.restarts = 0
+        self.backoff: Optional[float] = None
+        self.restart_at: Optional[float] = None
+        self.ready = False
+        self.finished = False
+
+    @property
+    def pid(self) -> Optional[int]:
+        return None if self.handle is None else self.handle.pid
+
+    def alive(self) -> bool:
+        if self.handle is None:
+            return False
+        if isinstance(self.handle, subprocess.Popen):
+            return self.handle.poll() is None
+        return self.handle.is_alive()
+
+    def exitcode(self) -> Optional[int]:
+        if isinstance(self.handle, subprocess.Popen):
+            return self.handle.poll()
+        return None if self.handle is None else self.handle.exitcode
+
+
+def _group_members(pgid: int) -> List[psutil.Process]:
+    members = []
+    for process in psutil.process_iter():
+        try:
+            if os.getpgid(process.pid) == pgid:
+                members.append(process)
+        except (ProcessLookupError, PermissionError, psutil.Error):
+            continue
+    return members
+
+
+def _signal_child(child: _Child, signum: int) -> None:
+    """Signals the child's group; a child that has not left the supervisor's group yet gets the signal itself."""
+    try:
+        os.killpg(child.pid, signum)
+        return
+    except PermissionError:
+        return
+    except ProcessLookupError:
+        pass
+    # Only a child that was not reaped yet: a reaped pid may already belong to another process.
+    if child.alive():
+        try:
+            os.kill(child.pid, signum)
+        except ProcessLookupError:
+            pass
+
+
+def _wait_for_own_group(child: _Child, timeout: float) -> None:
+    """Waits until a spawned child has called `os.setsid`, so its group can be signalled."""
+    deadline = time.monotonic() + timeout
+    while child.alive() and time.monotonic() < deadline:
+        try:
+            if os.getpgid(child.pid) == child.pid:
+                return
+        except ProcessLookupError:
+            return
+        time.sleep(0.005)
+
+
+class Supervisor:
+    """Starts, restarts and stops a set of child processes, each in its own process group."""
+
+    def __init__(
+        self,
+        specs: List[ProcessSpec],
+        config: SupervisorConfig,
+        readiness: ReadinessConfig,
+        external: Optional[Dict[str, Callable[[], bool]]] = None,
+        state_path: Optional[str] = None,
+    ) -> None:
+        self._config = config
+        self._readiness = readiness
+        self._external = dict(external or {})
+        self._external_ready: Dict[str, bool] = {}
+        self._state_path = state_path
+        self._children: Dict[str, _Child] = {spec.name: _Child(spec) for spec in specs}
+        self._started: List[str] = []
+        self._spawn = multiprocessing.get_context("spawn")
+        self._stop_requested = threading.Event()
+        self._times: Dict[str, float] = {}
+        self.leaked: List[str] = []
+
+    # -- starting -----------------------------------------------------------------------------
+
+    def _launch(self, child: _Child) -> None:
+        spec = child.spec
+        for path in spec.stale_paths:
+            if os.path.exists(path):
+                os.remove(path)
+        if spec.command is not None:
+            log: Any = subprocess.DEVNULL
+            if spec.log_path:
+                # Keep the output of the run that crashed; `poll` points the operator to it.
+                log = open(spec.log_path, "a" if child.restarts else "w")
+                if child.restarts:
+                    log.write(f"\n[supervisor] Restart {child.restarts} of {spec.name} at {time.ctime()}\n")
+                    log.flush()
+            cpus = spec.cpus
+            child.handle = subprocess.Popen(
+                spec.command,
+                stdout=log,
+                stderr=subprocess.STDOUT,
+                env={**os.environ, **spec.env} if spec.env else None,
+                start_new_session=True,
+                preexec_fn=(lambda: os.sched_setaffinity(0, cpus)) if cpus else None,
+            )
+            if spec.log_path:
+                log.close()
+        else:
+            child.handle = self._spawn.Process(
+                target=_run_in_own_group, args=(spec.cpus, spec.target, spec.args), name=spec.name
+            )
+            child.handle.start()
+            # The target's arguments may hold multiprocessing primitives, so it cannot be started
+            # with Popen(start_new_session=True); the child calls setsid itself once it runs.
+            _wait_for_own_group(child, self._config.drain_timeout_seconds)
+        child.started_at = time.monotonic()
+        child.ready = False
+        if spec.name not in self._started:
+            self._started.append(spec.name)
+        placement = f" on CPUs {spec.cpus}" if spec.cpus else ""
+        print(f"[supervisor] Started {spec.name} (pid {child.pid}){placement}")
+        self._write_state()
+
+    def _is_ready(self, name: str) -> bool:
+        if name in self._external:
+            if not self._external_ready.get(name):
+                self._external_ready[name] = self._external[name]()
+            return self._external_ready[name]
+        child = self._children[name]
+        if not child.ready and child.alive():
+            child.ready = child.spec.ready is None or child.spec.ready()
+        return child.ready
+
+    def _required_ready(self, child: _Child) -> bool:
+        return all(self._is_ready(name) for name in child.spec.requires)
+
+    def start(self) -> float:
+        """Launches every child once its prerequisites are ready; returns the seconds until all are ready."""
+        self._times["launched"] = time.monotonic()
+        timeout = max(self._readiness.timeout_seconds, self._readiness.llm_timeout_seconds)
+        while not all(self._is_ready(name) for name in self._children):
+            if self._stop_requested.is_set():
+                raise RuntimeError("Stopped during startup")
+            for child in self._children.values():
+                if child.handle is None and self._required_ready(child):
+                    self._launch(child)
+            self.poll()
+            if time.monotonic() - self._times["launched"] > timeout:
+                waiting = [name for name in self._children if not self._is_ready(name)]
+                raise TimeoutError(f"{waiting} not ready within {timeout}s")
+            time.sleep(self._readiness.poll_interval_seconds)
+        self._times["ready"] = time.monotonic()
+        startup = self._times["ready"] - self._times["launched"]
+        print(f"[supervisor] All {len(self._children)} processes ready after {startup:.2f}s")
+        return startup
+
+    # -- running ------------------------------------------------------------------------------
+
+    def poll(self) -> None:
+        """Restarts children that exited, after their backoff; raises once a child may not restart."""
+        now = time.monotonic()
+        for child in self._children.values():
+            if child.handle is None or child.finished or child.alive():
+                continue
+            if child.restart_at is None:
+                spec = child.spec
+                if not (self._config.restart and spec.restart) or child.restarts >= self._config.max_restarts:
+                    raise RuntimeError(f"{spec.name} exited with {child.exitcode()}; see {spec.log_path or 'its log'}")
+                if child.backoff is None or now - child.started_at >= self._config.stable_seconds:
+                    child.backoff = self._config.restart_backoff_seconds
+                else:
+                    child.backoff = min(child.backoff * 2, self._config.max_backoff_seconds)
+                child.restart_at = now + child.backoff
+                print(f"[supervisor] {spec.name} exited with {child.exitcode()}; restarting in {child.backoff:.1f}s")
+            elif now >= child.restart_at:
+                child.restart_at = None
+                child.restarts += 1
+                # The group may still hold processes the child spawned.
+                _signal_child(child, signal.SIGKILL)
+                self._launch(child)
+
+    def wait(self, name: str, timeout: float) -> Optional[int]:
+        """Waits for a child that ends by itself (it is not restarted) and returns its exit code."""
+        child = self._children[name]
+        child.finished = True
+        if isinstance(child.handle, subprocess.Popen):
+            try:
+                child.handle.wait(timeout)
+            except subprocess.TimeoutExpired:
+                pass
+        else:
+            child.handle.join(timeout)
+        return child.exitcode()
+
+    def pids(self) -> Dict[str, int]:
+        return {name: child.pid for name, child in self._children.items() if child.alive()}
+
+    def request_stop(self) -> None:
+        self._stop_requested.set()
+
+    def install_signal_handlers(self) -> None:
+        """SIGINT and SIGTERM make `run` return, so the caller can `stop`."""
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, lambda *_: self.request_stop())
+
+    def run(self, until: Optional[Callable[[], bool]] = None) -> None:
+        """Restarts crashed children until a stop is requested or `until` returns True."""
+        while not self._stop_requested.is_set() and not (until is not None and until()):
+            self.poll()
+            self._stop_requested.wait(self._readiness.poll_interval_seconds)
+
+    # -- stopping -----------------------------------------------------------------------------
+
+    def _stop_child(self, child: _Child) -> None:
+        pgid = child.pid
+        if pgid is None:
+            return
+        if child.alive():
+            _signal_child(child, signal.SIGTERM)
+            deadline = time.monotonic() + self._config.drain_timeout_seconds
+            while child.alive() and time.monotonic() < deadline:
+                time.sleep(0.05)
+            if child.alive():
+                print(f"[supervisor] {child.spec.name} did not drain within {self._config.drain_timeout_seconds}s; killing it")
+        _signal_child(child, signal.SIGKILL)
+        if not isinstance(child.handle, subprocess.Popen):
+            child.handle.join(1)
+        else:
+            child.handle.wait()
+        for process in _group_members(pgid):
+            self.leaked.append(f"{child.spec.name}: {process.pid}")
+            process.kill()
+
+    def stop(self) -> float:
+        """Stops the children in reverse start order and returns the seconds it took."""
+        if "stopping" in self._times:
+            return self._times["stopped"] - self._times["stopping"]
+        self._times["stopping"] = time.monotonic()
+        for name in reversed(self._started):
+            self._stop_child(self._children[name])
+        self._times["stopped"] = time.monotonic()
+        if self.leaked:
+            print(f"[supervisor] Killed {len(self.leaked)} processes left behind: {self.leaked}")
+        if self._state_path and os.path.exists(self._state_path):
+            os.remove(self._state_path)
+        return self._times["stopped"] - self._times["stopping"]
+
+    def _write_state(self) -> None:
+        if not self._state_path:
+            return
+        os.makedirs(os.path.dirname(self._state_path) or ".", exist_ok=True)
+        groups = {name: child.pid for name, child in self._children.items() if child.pid is not None}
+        with open(self._state_path, "w") as f:
+            json.dump({"supervisor": os.getpid(), "groups": groups}, f)
+
+    def report(self) -> Dict[str, Any]:
+        """Seconds of each phase of the cycle, restarts per child and the processes killed as leaked."""
+        times = self._times
+
+        def between(first: str, last: str) -> Optional[float]:
+            return times[last] - times[first] if first in times and last in times else None
+
+        return {
+            "startup_sec": between("launched", "ready"),
+            "run_sec": between("ready", "stopping"),
+            "shutdown_sec": between("stopping", "stopped"),
+            "total_sec": between("launched", "stopped"),
+            "restarts": {name: child.restarts for name, child in self._children.items()},
+            "leaked_processes": list(self.leaked),
+        }
+
+    def __enter__(self) -> "Supervisor":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.stop()
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    phases = ", ".join(
+        f"{phase} {report[f'{phase}_sec']:.2f}s"
+        for phase in ("startup", "run", "shutdown", "total")
+        if report[f"{phase}_sec"] is not None
+    )
+    restarts = {name: count for name, count in report["restarts"].items() if count}
+    print(f"[supervisor] Cycle: {phases}; restarts {restarts or 'none'}; leaked processes {len(report['leaked_processes'])}")
+
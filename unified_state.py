@@ -1,10 +1,21 @@
 """
-We're going to create a shared memory object for the agents to update their state. We'll use locks so agents don't overwrite 
+We're going to create a shared memory object for the agents to update their state. We'll use locks so agents don't overwrite
 each other.
+
+Two backends are available:
+- `UnifiedState` keeps the state in a `multiprocessing.Manager().dict()`; every access is an IPC round trip.
+- `SharedMemoryUnifiedState` keeps the state in a `multiprocessing.shared_memory` block with a fixed binary
+  layout derived from the schema. Writers serialize on a file lock and readers never lock; they retry on a
+  sequence counter (seqlock) until they see a consistent snapshot.
 """
+import fcntl
+import os
+import struct
+import threading
+import time
 from dataclasses import dataclass, field
-from typing import Any, Dict
-from multiprocessing import Lock, Manager
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from multiprocessing import Lock, Manager, resource_tracker, shared_memory
 
 class UnifiedState:
     def __init__(self, schema: Dict[str, Any]):
@@ -12,21 +23,27 @@ class UnifiedState:
         self.memory = self.manager.dict()
         self.lock = Lock()
         self.schema = schema
-    
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # The manager process handle cannot be pickled; child processes only need the proxy and the lock.
+        state = self.__dict__.copy()
+        state["manager"] = None
+        return state
+
     def set(self, key: str, value: Any) -> None:
         with self.lock:
             if key in self.schema:
                 self.memory[key] = value
             else:
                 raise KeyError(f"Key '{key}' not in schema.")
-    
+
     def get(self, key: str) -> Any:
         with self.lock:
             if key in self.memory:
                 return self.memory[key]
             else:
                 raise KeyError(f"Key '{key}' not found in memory.")
-    
+
 
     def update(self, updates: Dict[str, Any]) -> None:
         with self.lock:
@@ -34,4 +51,212 @@ class UnifiedState:
                 if key in self.schema:
                     self.memory[key] = value
                 else:
-                    raise KeyError(f"Key '{key}' not in schema.")
\ No newline at end of file
+                    raise KeyError(f"Key '{key}' not in schema.")
+
+
+# Sequence counter at the start of the block; odd while a write is in progress.
+_SEQ = struct.Struct("<Q")
+
+
+@dataclass
+class _Field:
+    key: str
+    kind: type
+    offset: int
+    codec: struct.Struct
+
+
+@dataclass
+class StateLayout:
+    """Fixed binary layout of a state schema: one slot per key, in schema order, after the sequence counter."""
+
+    fields: Dict[str, _Field] = field(default_factory=dict)
+    defaults: Dict[str, Any] = field(default_factory=dict)
+    size: int = _SEQ.size
+
+    @classmethod
+    def from_schema(cls, schema: Dict[str, Any], str_capacity: int = 256) -> "StateLayout":
+        layout = cls()
+        offset = _SEQ.size
+        for key, default in schema.items():
+            # Schema values are defaults; a bare type means "default of that type".
+            kind = default if isinstance(default, type) else type(default)
+            if isinstance(default, type):
+                default = kind()
+            if kind is bool:
+                codec = struct.Struct("<?")
+            elif kind is int:
+                codec = struct.Struct("<q")
+            elif kind is float:
+                codec = struct.Struct("<d")
+            elif kind is str:
+                # Length prefix followed by fixed-capacity UTF-8 bytes.
+                codec = struct.Struct(f"<I{str_capacity}s")
+            else:
+                raise TypeError(f"Unsupported type {kind.__name__} for key '{key}'.")
+            layout.fields[key] = _Field(key=key, kind=kind, offset=offset, codec=codec)
+            layout.defaults[key] = default
+            offset += codec.size
+        layout.size = offset
+        return layout
+
+    def encode(self, key: str, value: Any) -> Tuple[Any, ...]:
+        """Validates `value` and converts it to the packing arguments of its slot."""
+        f = self.fields[key]
+        if f.kind is str:
+            data = str(value).encode("utf-8")
+            if len(data) > f.codec.size - 4:
+                raise ValueError(f"Value for '{key}' exceeds {f.codec.size - 4} bytes.")
+            return (len(data), data)
+        return (f.kind(value),)
+
+    def pack(self, buf: memoryview, key: str, args: Tuple[Any, ...]) -> None:
+        f = self.fields[key]
+        f.codec.pack_into(buf, f.offset, *args)
+
+    def decode(self, buf: memoryview | bytes, key: str) -> Any:
+        f = self.fields[key]
+        if f.kind is str:
+            length, data = f.codec.unpack_from(buf, f.offset)
+            return data[:length].decode("utf-8")
+        return f.codec.unpack_from(buf, f.offset)[0]
+
+
+class SharedMemoryUnifiedState:
+    """
+    `UnifiedState` backed by a named shared memory block.
+
+    Reads are lock-free: a reader copies the slots it needs and retries if the sequence counter
+    was odd or changed meanwhile. Writers take an exclusive `flock` on a lock file next to the
+    block, so unrelated processes can attach by name, and a thread lock within the process.
+    `flock` only excludes other open file descriptions, so every process, including forked
+    children that inherited this object, opens the lock file itself. `update` publishes all keys under a single
+    sequence bump, so readers see either none or all of them.
+    Stores on x86-64 are not reordered with other stores, which is what the seqlock relies on.
+    """
+
+    def __init__(
+        self,
+        schema: Dict[str, Any],
+        name: Optional[str] = None,
+        create: bool = True,
+        str_capacity: int = 256,
+    ):
+        self.schema = schema
+        self.layout = StateLayout.from_schema(schema, str_capacity=str_capacity)
+        self.shm = shared_memory.SharedMemory(name=name, create=create, size=self.layout.size if create else 0)
+        if not create:
+            # Only the creator owns the block; otherwise the resource tracker unlinks it when this process exits.
+            resource_tracker.unregister(self.shm._name, "shared_memory")  # type: ignore[attr-defined]
+        self.name = self.shm.name
+        self._buf = self.shm.buf
+        self._lock_path = os.path.join("/dev/shm" if os.path.isdir("/dev/shm") else "/tmp", f"{self.name}.lock")
+        self._lock_pid: Optional[int] = None
+        self._lock_fd = -1
+        self._thread_lock = threading.Lock()
+        if create:
+            self.update(self.layout.defaults)
+
+    @classmethod
+    def attach(cls, name: str, schema: Dict[str, Any], str_capacity: int = 256) -> "SharedMemoryUnifiedState":
+        return cls(schema, name=name, create=False, str_capacity=str_capacity)
+
+    def __reduce__(self) -> Tuple[Any, ...]:
+        # Pickling hands the receiver an attachment to the same block.
+        str_capacity = next((f.codec.size - 4 for f in self.layout.fields.values() if f.kind is str), 256)
+        return (SharedMemoryUnifiedState.attach, (self.name, self.schema, str_capacity))
+
+    def _process_lock(self) -> Tuple[int, threading.Lock]:
+        """The lock file descriptor and thread lock of the calling process, opened on first use."""
+        pid = os.getpid()
+        if self._lock_pid != pid:
+            if self._lock_pid is not None:
+                # Inherited through fork: shares the parent's open file description, so it cannot exclude the parent.
+                os.close(self._lock_fd)
+            self._lock_fd = os.open(self._lock_path, os.O_RDWR | os.O_CREAT, 0o600)
+            self._thread_lock = threading.Lock()
+            self._lock_pid = pid
+        return self._lock_fd, self._thread_lock
+
+    def _write(self, items: Iterable[Tuple[str, Any]]) -> None:
+        # Validate everything before taking the lock so a bad value never leaves a partial update.
+        encoded = []
+        for key, value in items:
+            if key not in self.layout.fields:
+                raise KeyError(f"Key '{key}' not in schema.")
+            encoded.append((key, self.layout.encode(key, value)))
+        buf = self._buf
+        lock_fd, thread_lock = self._process_lock()
+        with thread_lock:
+            fcntl.flock(lock_fd, fcntl.LOCK_EX)
+            try:
+                seq = _SEQ.unpack_from(buf, 0)[0]
+                _SEQ.pack_into(buf, 0, seq + 1)
+                for key, args in encoded:
+                    self.layout.pack(buf, key, args)
+                _SEQ.pack_into(buf, 0, seq + 2)
+            finally:
+                fcntl.flock(lock_fd, fcntl.LOCK_UN)
+
+    def set(self, key: str, value: Any) -> None:
+        self._write([(key, value)])
+
+    def update(self, updates: Dict[str, Any]) -> None:
+        self._write(updates.items())
+
+    def _read(self, keys: List[str]) -> Dict[str, Any]:
+        buf = self._buf
+        layout = self.layout
+        while True:
+            seq = _SEQ.unpack_from(buf, 0)[0]
+            if seq & 1:
+                # A write is in progress; yield so the writer can finish it.
+                time.sleep(0)
+                continue
+            try:
+                values = {key: layout.decode(buf, key) for key in keys}
+            except (UnicodeDecodeError, struct.error):
+                # A torn read of a string slot; retry unless the block really is corrupt.
+                if _SEQ.unpack_from(buf, 0)[0] == seq:
+                    raise
+                time.sleep(0)
+                continue
+            if _SEQ.unpack_from(buf, 0)[0] == seq:
+                return values
+
+    def get(self, key: str) -> Any:
+        if key not in self.layout.fields:
+            raise KeyError(f"Key '{key}' not found in memory.")
+        return self._read([key])[key]
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Returns a consistent copy of every key."""
+        return self._read(list(self.layout.fields))
+
+    @property
+    def version(self) -> int:
+        """Number of completed writes."""
+        return _SEQ.unpack_from(self._buf, 0)[0] // 2
+
+    def close(self) -> None:
+        self._buf = None  # type: ignore[assignment]
+        self.shm.close()
+        if self._lock_pid == os.getpid():
+            os.close(self._lock_fd)
+            self._lock_pid = None
+
+    def unlink(self) -> None:
+        """Removes the block and its lock file; call once, from the creating process."""
+        self.shm.unlink()
+        try:
+            os.remove(self._lock_path)
+        except FileNotFoundError:
+            pass
+
+
+def create_unified_state(schema: Dict[str, Any], backend: str = "manager", **kwargs: Any) -> UnifiedState | SharedMemoryUnifiedState:
+    if backend == "manager":
+        return UnifiedState(schema)
+    if backend == "shared_memory":
+        return SharedMemoryUnifiedState(schema, **kwargs)
+    raise ValueError(f"Unknown unified state backend: {backend}")